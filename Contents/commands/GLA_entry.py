@@ -1,12 +1,35 @@
 # Assuming you have not changed the general structure of the template no modification is needed in this file.
+import time
+
 from ..lib import fusionAddInUtils as futil
+from ..lib import schema_registry
 from .. import commands
+from .. import config
 
 
 def run(context):
     try:
-        # This will run the start function in each of your commands as defined in commands/__init__.py
-        commands.start()
+        start = time.perf_counter()
+
+        # Write log messages from a background thread from now on.
+        futil.start_log_flusher(config.LOG_FILE, config.LOG_FLUSH_INTERVAL)
+
+        if config.TRACE:
+            futil.enable_tracing()
+
+        # Parse the document parameter schemas once for all commands.
+        with futil.span("load_schemas", "startup"):
+            schema_registry.registry.load_all()
+        futil.log(f"Loaded schemas: {schema_registry.registry.stats()}")
+
+        # This will create the buttons of the commands declared in commands/__init__.py
+        with futil.span("start_commands", "startup"):
+            commands.start()
+
+        futil.log(
+            f"Add-in started in {(time.perf_counter() - start) * 1000:.1f} ms, "
+            f"{len(commands.registry.specs)} commands in "
+            f"{commands.registry.start_seconds * 1000:.1f} ms")
 
     except:
         futil.handle_error("run")
@@ -15,10 +38,21 @@ def run(context):
 def stop(context):
     try:
         # Remove all of the event handlers your app has created
+        futil.log(f"Event handlers: {futil.handler_stats()}")
         futil.clear_handlers()
 
-        # This will run the start function in each of your commands as defined in commands/__init__.py
+        # This will remove the command buttons and stop the loaded commands as defined in commands/__init__.py
         commands.stop()
+        futil.log(f"Commands: {commands.registry.stats()}")
+
+        if futil.is_tracing():
+            count = futil.write_chrome_trace(config.TRACE_FILE)
+            futil.log(f"Wrote {count} trace events to {config.TRACE_FILE}")
+            futil.log(f"Latencies: {futil.latency_stats()}")
+            futil.disable_tracing()
+
+        futil.log(f"Log statistics: {futil.log_stats()}")
+        futil.stop_log_flusher()
 
     except:
         futil.handle_error("stop")
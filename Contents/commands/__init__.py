@@ -1,24 +1,26 @@
 # Here you define the commands that will be added to your add-in.
 
-# TODO Import the modules corresponding to the commands you created.
-# If you want to add an additional command, duplicate one of the existing directories and import it here.
-# You need to use aliases (import "entry" as "my_module") assuming you have the default module named "entry".
-from .generateLabel import entry as generateLabel
+# Every command directory declares its button as `COMMAND` in its `__init__.py`.
+# Its module (by default "entry") is only imported when the button is first
+# clicked, see `command_registry`.
+# If you want to add an additional command, duplicate one of the existing
+# directories, update its declaration and add it here.
+from .command_registry import CommandRegistry
+from . import batchLabels
+from . import generateLabel
 
-# TODO add your imported modules to this list.
-# Fusion will automatically call the start() and stop() functions.
-commands = [generateLabel]
+registry = CommandRegistry([
+    generateLabel.COMMAND,
+    batchLabels.COMMAND,
+])
 
 
-# Assumes you defined a "start" function in each of your modules.
-# The start function will be run when the add-in is started.
+# Creates the buttons of all commands when the add-in is started.
 def start():
-    for command in commands:
-        command.start()
+    registry.start()
 
 
-# Assumes you defined a "stop" function in each of your modules.
-# The stop function will be run when the add-in is stopped.
+# Removes the buttons and runs the stop function of the loaded command modules
+# when the add-in is stopped.
 def stop():
-    for command in commands:
-        command.stop()
+    registry.stop()
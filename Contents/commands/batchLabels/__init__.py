@@ -0,0 +1,21 @@
+# Declaration of the command, read at add-in start without importing `entry`.
+import os
+
+from ..command_registry import CommandSpec
+from ... import config
+
+COMMAND = CommandSpec(
+    id=f"{config.COMPANY_NAME}_{config.ADDIN_NAME}_batchLabels",
+    name="Batch Labels",
+    description="Generate the labels of a manifest file in the background.",
+    module=f"{__name__}.entry",
+    # Resource location for command icons, a sub folder named "resources".
+    resource_folder=os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", ""),
+    workspace_id="FusionSolidEnvironment",
+    tab_id="SolidTab",
+    panel_id="AutogeneratePanel",
+    panel_name="Autogenerate",
+    panel_beside_id="SolidModifyPanel",
+    command_beside_id=f"{config.COMPANY_NAME}_{config.ADDIN_NAME}_generateLabel",
+    is_promoted=False,
+)
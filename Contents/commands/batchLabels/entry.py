@@ -0,0 +1,173 @@
+import json
+import os
+import pathlib
+
+from ...lib import batch
+from ...lib import batch_journal
+from ...lib import batch_runner
+from ...lib import batch_schedule
+from ...lib import design_parameters
+from ...lib import export_cache
+from ...lib import schema_registry
+import adsk.core
+import adsk.fusion
+from ...lib import fusionAddInUtils as futil
+from ... import config
+from . import COMMAND
+
+app = adsk.core.Application.get()
+ui = app.userInterface
+logger = futil.get_logger(__name__)
+
+
+# Command identity and button placement are declared in `__init__.py`.
+CMD_ID = COMMAND.id
+CMD_NAME = COMMAND.name
+
+# Custom event through which the batch worker hands design updates to the
+# main thread.
+BATCH_EVENT_ID = f"{CMD_ID}_batch_step"
+
+PALETTE_ID = config.sample_palette_id
+PALETTE_NAME = "Label Batch"
+PALETTE_URL = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "resources", "palette", "batch_progress.html")
+PALETTE_WIDTH = 320
+PALETTE_HEIGHT = 220
+
+# The batch in progress, at most one at a time.
+runner = None
+scheduler = None
+palette = None
+# Exported labels shared by all batches, opened by the first one.
+cache = None
+
+
+# Function that is called when a user clicks the corresponding button in the UI.
+# The command has no dialog, so its execute event follows immediately.
+def command_created(args: adsk.core.CommandCreatedEventArgs):
+    logger.debug("%s Command Created Event", CMD_NAME)
+    handlers = futil.handler_scope(CMD_ID)
+    futil.add_handler(args.command.execute, command_execute, scope=handlers)
+    futil.add_handler(args.command.destroy, command_destroy, scope=handlers)
+
+
+# This event handler asks for a manifest and an output folder and starts the
+# batch. It returns right away; the batch runs on while the user works on.
+def command_execute(args: adsk.core.CommandEventArgs):
+    logger.debug("%s Command Execute Event", CMD_NAME)
+
+    global runner, scheduler, cache
+    if runner is not None and runner.running:
+        show_palette()
+        ui.messageBox("A label batch is already running.")
+        return
+
+    _design = adsk.fusion.Design.cast(app.activeProduct)
+    if _design is None:
+        ui.messageBox("Please open an official GLA Fusion 360 Document.")
+        return
+    design_params = design_parameters.DesignParameters(_design)
+    dp_schema = schema_registry.registry.for_parameters(design_params.parameters)
+    if dp_schema is None:
+        logger.info("Currently open document is not a GLA document.")
+        ui.messageBox("Please open an official GLA Fusion 360 Document.")
+        return
+
+    file_dialog = ui.createFileDialog()
+    file_dialog.title = "Label Manifest"
+    file_dialog.filter = "Label manifests (*.csv;*.json)"
+    file_dialog.isMultiSelectEnabled = False
+    if file_dialog.showOpen() != adsk.core.DialogResults.DialogOK:
+        return
+    manifest = pathlib.Path(file_dialog.filename)
+
+    folder_dialog = ui.createFolderDialog()
+    folder_dialog.title = "Output Folder"
+    folder_dialog.initialDirectory = str(manifest.parent)
+    if folder_dialog.showDialog() != adsk.core.DialogResults.DialogOK:
+        return
+    output_dir = pathlib.Path(folder_dialog.folder)
+
+    scheduler = batch_schedule.BatchScheduler(
+        dp_schema, batch_schedule.CostModel.load(config.BATCH_COST_MODEL))
+    if cache is None:
+        cache = export_cache.ExportCache(config.BATCH_CACHE_DIR, config.BATCH_CACHE_MAX_BYTES)
+    engine = batch.BatchEngine(
+        design_params, dp_schema, output_dir,
+        cache=cache,
+        journal=batch_journal.BatchJournal(output_dir.joinpath(config.BATCH_JOURNAL_NAME)),
+        scheduler=scheduler,
+    )
+    runner = batch_runner.BackgroundBatch(
+        engine, manifest_rows(manifest), BATCH_EVENT_ID,
+        on_progress=show_progress, on_finished=batch_finished)
+    show_palette()
+    runner.start()
+    logger.info("Started batch of %s into %s", manifest.name, output_dir)
+
+
+def manifest_rows(fp: pathlib.Path):
+    """Rows of a manifest, read by the batch worker thread."""
+    yield from batch.read_manifest(fp)
+
+
+# This event handler is called when the command terminates, which happens
+# right after the batch has started.
+def command_destroy(args: adsk.core.CommandEventArgs):
+    logger.debug("%s Command Destroy Event", CMD_NAME)
+    futil.release_scope(CMD_ID)
+
+
+def show_palette() -> adsk.core.Palette:
+    """Show the progress palette, created on first use."""
+    global palette
+    palette = ui.palettes.itemById(PALETTE_ID)
+    if palette is None:
+        palette = ui.palettes.add(
+            PALETTE_ID, PALETTE_NAME, PALETTE_URL, True, True, True,
+            PALETTE_WIDTH, PALETTE_HEIGHT)
+        handlers = futil.handler_scope(PALETTE_ID)
+        futil.add_handler(palette.incomingFromHTML, palette_incoming, scope=handlers)
+        futil.add_handler(palette.closed, palette_closed, scope=handlers)
+    palette.isVisible = True
+    return palette
+
+
+def show_progress(progress: batch_runner.BatchProgress):
+    if palette is not None and palette.isVisible:
+        palette.sendInfoToHTML("progress", json.dumps(progress.to_dict()))
+
+
+# This event handler is called when the page of the palette sends data,
+# i.e. when the cancel button is clicked.
+def palette_incoming(args: adsk.core.HTMLEventArgs):
+    if args.action == "cancel" and runner is not None:
+        runner.cancel()
+    args.returnData = ""
+
+
+# Closing the palette only hides it, the batch goes on.
+def palette_closed(args: adsk.core.UserInterfaceGeneralEventArgs):
+    logger.debug("%s palette closed", CMD_NAME)
+
+
+def batch_finished(report: batch.BatchReport):
+    if scheduler is not None and report.design_updates:
+        scheduler.model.save(config.BATCH_COST_MODEL)
+    if runner is not None and runner.error is not None:
+        ui.messageBox(f"The label batch failed:\n{runner.error}")
+    futil.log(f"{CMD_NAME}: {report.summary()}")
+
+
+# Called by the command registry when the add-in stops.
+def stop():
+    global runner, palette
+    if runner is not None:
+        runner.stop()
+        runner = None
+    futil.release_scope(PALETTE_ID)
+    _palette = ui.palettes.itemById(PALETTE_ID)
+    if _palette:
+        _palette.deleteMe()
+    palette = None
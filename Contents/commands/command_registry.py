@@ -0,0 +1,149 @@
+"""Declarative command registry.
+
+Commands are declared as data (`CommandSpec`): identity, icon folder and
+where the button goes. When the add-in starts, the registry creates a button
+for every declaration. A command module is imported only when its
+`commandCreated` event first fires, i.e. when the user first clicks its
+button. Adding commands therefore barely adds to the add-in start time.
+
+A command module implements `command_created(args)` and may implement
+`stop()`, which is only called if the module was imported.
+"""
+
+import importlib
+import time
+
+import adsk.core
+from ..lib import fusionAddInUtils as futil
+
+logger = futil.get_logger(__name__)
+
+
+class CommandSpec:
+    """Declaration of a command button.
+
+    Args:
+        id (str): unique command id.
+        name (str): button name.
+        description (str): tooltip of the button.
+        module (str): absolute name of the module implementing the command.
+        resource_folder (str): folder with the button icons.
+        workspace_id (str): workspace the button is created in.
+        tab_id (str): toolbar tab of the workspace.
+        panel_id (str): panel of the tab, created if it does not exist.
+        panel_name (str): name of the panel if it is created.
+        panel_beside_id (str): panel the new panel is placed next to.
+        command_beside_id (str): control the button is placed after; empty
+            to add it at the end of the panel.
+        is_promoted (bool): show the button in the main toolbar.
+    """
+
+    __slots__ = ("id", "name", "description", "module", "resource_folder",
+                 "workspace_id", "tab_id", "panel_id", "panel_name",
+                 "panel_beside_id", "command_beside_id", "is_promoted")
+
+    def __init__(self, id: str, name: str, description: str, module: str,
+                 resource_folder: str = "", workspace_id: str = "FusionSolidEnvironment",
+                 tab_id: str = "SolidTab", panel_id: str = "AutogeneratePanel",
+                 panel_name: str = "Autogenerate", panel_beside_id: str = "SolidModifyPanel",
+                 command_beside_id: str = "", is_promoted: bool = True):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.module = module
+        self.resource_folder = resource_folder
+        self.workspace_id = workspace_id
+        self.tab_id = tab_id
+        self.panel_id = panel_id
+        self.panel_name = panel_name
+        self.panel_beside_id = panel_beside_id
+        self.command_beside_id = command_beside_id
+        self.is_promoted = is_promoted
+
+    def __repr__(self):
+        return f"CommandSpec({self.id!r}, module={self.module!r})"
+
+
+class CommandRegistry:
+    """Create command buttons and import command modules on first use.
+
+    Args:
+        specs (list): `CommandSpec` of every command of the add-in.
+    """
+
+    def __init__(self, specs: list):
+        self.specs = {spec.id: spec for spec in specs}
+        self.modules = {}
+        # Seconds spent importing each loaded command module.
+        self.import_seconds = {}
+        self.start_seconds = 0.0
+
+    def start(self):
+        """Create the buttons of all declared commands."""
+        start = time.perf_counter()
+        ui = adsk.core.Application.get().userInterface
+        for spec in self.specs.values():
+            with futil.span("add_button", "startup", command=spec.id):
+                self._add_button(ui, spec)
+        self.start_seconds = time.perf_counter() - start
+
+    def stop(self):
+        """Remove the buttons and stop the imported command modules."""
+        ui = adsk.core.Application.get().userInterface
+        for spec in self.specs.values():
+            module = self.modules.get(spec.id)
+            if module is not None and hasattr(module, "stop"):
+                module.stop()
+
+            workspace = ui.workspaces.itemById(spec.workspace_id)
+            panel = workspace.toolbarPanels.itemById(spec.panel_id)
+            command_control = panel.controls.itemById(spec.id) if panel else None
+            command_definition = ui.commandDefinitions.itemById(spec.id)
+            if command_control:
+                command_control.deleteMe()
+            if command_definition:
+                command_definition.deleteMe()
+
+    def load(self, command_id: str):
+        """Module of a command, imported on the first call."""
+        module = self.modules.get(command_id)
+        if module is None:
+            spec = self.specs[command_id]
+            start = time.perf_counter()
+            with futil.span("import", "startup", module=spec.module):
+                module = importlib.import_module(spec.module)
+            seconds = time.perf_counter() - start
+            self.modules[command_id] = module
+            self.import_seconds[command_id] = seconds
+            logger.info("Imported %s in %.1f ms", spec.module, seconds * 1000)
+        return module
+
+    def _add_button(self, ui: adsk.core.UserInterface, spec: CommandSpec):
+        cmd_def = ui.commandDefinitions.itemById(spec.id)
+        if not cmd_def:
+            cmd_def = ui.commandDefinitions.addButtonDefinition(
+                spec.id, spec.name, spec.description, spec.resource_folder)
+
+        command_id = spec.id
+
+        def command_created(args: adsk.core.CommandCreatedEventArgs):
+            self.load(command_id).command_created(args)
+
+        futil.add_handler(cmd_def.commandCreated, command_created, name=spec.id)
+
+        workspace = ui.workspaces.itemById(spec.workspace_id)
+        tab = workspace.toolbarTabs.itemById(spec.tab_id)
+        panel = tab.toolbarPanels.itemById(spec.panel_id)
+        if not panel:
+            panel = tab.toolbarPanels.add(
+                spec.panel_id, spec.panel_name, spec.panel_beside_id, False)
+        control = panel.controls.addCommand(cmd_def, spec.command_beside_id, False)
+        control.isPromoted = spec.is_promoted
+
+    def stats(self) -> dict:
+        return {
+            "commands": len(self.specs),
+            "loaded": sorted(self.modules),
+            "start_seconds": self.start_seconds,
+            "import_seconds": dict(self.import_seconds),
+        }
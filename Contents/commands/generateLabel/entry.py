@@ -1,160 +1,142 @@
 from ...lib import design_parameters
+from ...lib import label_catalog
+from ...lib import parameter_expressions
+from ...lib import preview_pipeline
+from ...lib import schema_registry
 import adsk.core
 import adsk.fusion
-import os
 from ...lib import fusionAddInUtils as futil
-from ... import config
-from ...lib import R
+from . import COMMAND
 
 app = adsk.core.Application.get()
 ui = app.userInterface
+logger = futil.get_logger(__name__)
 
 
-# TODO *** Specify the command identity information. ***
-CMD_ID = f"{config.COMPANY_NAME}_{config.ADDIN_NAME}_generateLabel"
-CMD_NAME = "Generate Label"
-CMD_Description = "Generate a label using parameters input by the user."
-futil.log(CMD_ID)
+# Command identity and button placement are declared in `__init__.py`.
+CMD_ID = COMMAND.id
+CMD_NAME = COMMAND.name
 
-# Specify that the command will be promoted to the panel.
-IS_PROMOTED = True
+# Previews of the open dialog.
+preview = None
 
-# TODO *** Define the location where the command button will be created. ***
-# This is done by specifying the workspace, the tab, and the panel, and the
-# command it will be inserted beside. Not providing the command to position it
-# will insert it at the end.
-WORKSPACE_ID = "FusionSolidEnvironment"
-TAB_ID = "SolidTab"
-PANEL_BESIDE_ID = "SolidModifyPanel"
-PANEL_ID = "AutogeneratePanel"
-COMMAND_BESIDE_ID = ""
-
-# Resource location for command icons, here we assume a sub folder in this directory named "resources".
-ICON_FOLDER = os.path.join(os.path.dirname(
-    os.path.abspath(__file__)), "resources", "")
-
-# Local list of event handlers used to maintain a reference so
-# they are not released and garbage collected.
-local_handlers = []
-
-
-# Executed when add-in is run.
-def start():
-    # Create a command Definition.
-    if not ui.commandDefinitions.itemById(CMD_ID):
-        cmd_def = ui.commandDefinitions.addButtonDefinition(
-            CMD_ID, CMD_NAME, CMD_Description, ICON_FOLDER
-        )
-    cmd_def = ui.commandDefinitions.itemById(CMD_ID)
-
-    # Define an event handler for the command created event. It will be called when the button is clicked.
-    futil.add_handler(cmd_def.commandCreated, command_created)
-
-    # ******** Add a button into the UI so the user can run the command. ********
-    # Get the target workspace the button will be created in.
-    workspace = ui.workspaces.itemById(WORKSPACE_ID)
-
-    # Get the tab the button will be created in.
-    tab = workspace.toolbarTabs.itemById(TAB_ID)
-
-    # Get the panel the button will be created in.
-    panel = tab.toolbarPanels.itemById(PANEL_ID)
-    if not panel:
-        panel = tab.toolbarPanels.add(
-            PANEL_ID, "Autogenerate", PANEL_BESIDE_ID, False)
-
-    # Create the button command control in the UI after the specified existing command.
-    control = panel.controls.addCommand(cmd_def, COMMAND_BESIDE_ID, False)
-
-    # Specify if the command is promoted to the main toolbar.
-    control.isPromoted = IS_PROMOTED
-
-
-# Executed when add-in is stopped.
-def stop():
-    # Get the various UI elements for this command
-    workspace = ui.workspaces.itemById(WORKSPACE_ID)
-    panel = workspace.toolbarPanels.itemById(PANEL_ID)
-    command_control = panel.controls.itemById(CMD_ID)
-    command_definition = ui.commandDefinitions.itemById(CMD_ID)
-
-    # Delete the button command control
-    if command_control:
-        command_control.deleteMe()
-
-    # Delete the command definition
-    if command_definition:
-        command_definition.deleteMe()
+# Label catalog searched from the dialog, the entries listed in the results
+# drop-down and the entry chosen from it.
+CATALOG_RESULTS = 25
+dp_schema = None
+catalog = None
+catalog_matches = []
+catalog_entry = None
 
 
+@futil.traced()
 def get_and_validate_design_parameters():
     """Get Fusion 360 design parameters,
     check if it has a parameter named `gla-id`,
     validate design parameters against schema.
+
+    Returns:
+        tuple: the `DesignParameters` and `DocumentSchema` of the open
+        document, or `(None, None)` if it is no valid GLA document.
     """
 
-    futil.log(f"Getting document design parameters...")
+    logger.debug("Getting document design parameters...")
     _app = adsk.core.Application.get()
     _design = adsk.fusion.Design.cast(_app.activeProduct)
 
     design_params = design_parameters.DesignParameters(_design)
 
-    # check if design has parameter named `gla_id`
+    # check if design has parameter named `gla_id` that a schema accepts
     # if not then display message to open a GLA document.
     # Otherwise Continue and valiudate design parameters.
-    if not design_params.parameters.get("gla_id"):
-        futil.log("Currently open document is not a GLA document.")
+    dp_schema = schema_registry.registry.for_parameters(design_params.parameters)
+    if dp_schema is None:
+        logger.info("Currently open document is not a GLA document.")
         ui.messageBox("Please open an official GLA Fusion 360 Document.")
-        return 0
+        return None, None
 
-    futil.log(f"Loading label design parameters schema...")
-    dp_schema = design_parameters.JSONSchema(
-        R.LABEL_DOCUMENT_PARAMETERS_SCHEMA)
-    dp_schema.load()
-    val_props = dp_schema.validate(design_params.parameters)
-    return design_params
+    logger.debug("Validating design parameters against %s schema...", dp_schema.title)
+    result = dp_schema.validate(design_params.parameters)
+    if not result.ok:
+        logger.warning("Invalid design parameters: %s", result)
+        errors = "\n".join(str(e) for e in result.errors)
+        ui.messageBox(f"The open GLA document has invalid parameters:\n{errors}")
+        return None, None
+
+    logger.debug("Design parameters read with %d API calls.", design_params.api_calls)
+    return design_params, dp_schema
 
 
 # Function that is called when a user clicks the corresponding button in the UI.
 # This defines the contents of the command dialog and connects to the command related events.
 def command_created(args: adsk.core.CommandCreatedEventArgs):
     # General logging for debug.
-    futil.log(f"{CMD_NAME} Command Created Event")
+    logger.debug("%s Command Created Event", CMD_NAME)
 
     global design_params
-    design_params = get_and_validate_design_parameters()
-    if design_params == 0:
+    global preview
+    global dp_schema, catalog, catalog_matches, catalog_entry
+    design_params, dp_schema = get_and_validate_design_parameters()
+    if design_params is None:
         return
 
+    catalog = None
+    catalog_matches = []
+    catalog_entry = None
+    # The label text and the catalog of labels need a schema with a
+    # `label_text`, which e.g. bin documents do not have.
+    has_label_text = "label_text" in dp_schema.fields
+    if has_label_text:
+        try:
+            catalog = label_catalog.load_catalog(schema=dp_schema)
+        except (OSError, ValueError) as e:
+            logger.warning("Label catalog unavailable: %s", e)
+    preview = preview_pipeline.PreviewPipeline(
+        lambda params: design_params.update_parameter_expressions(
+            params, preview=True))
+    # Handlers of this dialog, released when the command is destroyed.
+    handlers = futil.handler_scope(CMD_ID)
+
     # https://help.autodesk.com/view/fusion360/ENU/?contextId=CommandInputs
     inputs = args.command.commandInputs
 
     # TODO Define the dialog for your command by adding different inputs to the command.
     # TODO Define JSON schema and schema loader for commandInputs
 
-    # Create a simple text box input.
-    inputs.addTextBoxCommandInput(
-        "text_box", "Some Text", "Enter some text.", 1, False)
-    inputs.addIntegerSpinnerCommandInput(
-        id="bin_span_spinner", name="Bin Span", initialValue=1, min=1, max=100, spinStep=1)
+    # Label text, starting from the text of the design. It is applied as
+    # typed, also after a catalog entry filled it in.
+    if has_label_text:
+        label_text = dp_schema.design_values(design_params.parameters)["label_text"]
+        inputs.addTextBoxCommandInput(
+            "text_box", "Label Text", label_text, 1, False)
+    if "bin_span" in dp_schema.fields:
+        inputs.addIntegerSpinnerCommandInput(
+            id="bin_span_spinner", name="Bin Span", initialValue=1, min=1, max=100, spinStep=1)
+
+    # Search-as-you-type over the label catalog, a chosen entry fills all parameters.
+    if catalog is not None:
+        inputs.addStringValueInput("catalog_search", "Search Catalog", "")
+        inputs.addDropDownCommandInput(
+            "catalog_results", "Catalog Label", adsk.core.DropDownStyles.TextListDropDownStyle)
+        update_catalog_results(inputs, "")
 
     # TODO Connect to the events that are needed by this command.
     futil.add_handler(
-        args.command.execute, command_execute, local_handlers=local_handlers
+        args.command.execute, command_execute, scope=handlers
     )
     futil.add_handler(
-        args.command.inputChanged, command_input_changed, local_handlers=local_handlers
+        args.command.inputChanged, command_input_changed, scope=handlers
     )
     futil.add_handler(
-        args.command.executePreview, command_preview, local_handlers=local_handlers
+        args.command.executePreview, command_preview, scope=handlers
     )
     futil.add_handler(
         args.command.validateInputs,
         command_validate_input,
-        local_handlers=local_handlers,
+        scope=handlers,
     )
     futil.add_handler(
-        args.command.destroy, command_destroy, local_handlers=local_handlers
+        args.command.destroy, command_destroy, scope=handlers
     )
 
 
@@ -162,39 +144,81 @@ def command_created(args: adsk.core.CommandCreatedEventArgs):
 # is immediately called after the created event not command inputs were created for the dialog.
 def command_execute(args: adsk.core.CommandEventArgs):
     # General logging for debug.
-    futil.log(f"{CMD_NAME} Command Execute Event")
+    logger.debug("%s Command Execute Event", CMD_NAME)
 
     # TODO ******************************** Your code here ********************************
 
     # Get a reference to your command's inputs.
     inputs = args.command.commandInputs
-    text_box: adsk.core.TextBoxCommandInput = inputs.itemById("text_box")
-    bin_span_spinner: adsk.core.IntegerSpinnerCommandInput = inputs.itemById(
-        "bin_span_spinner")
 
-    # Update and save the variable bin_span to the new value.
-    text = text_box.text
-    new_bin_span_expression = bin_span_spinner.value
-    design_params.preview_parameter_expression(
-        "bin_span", str(new_bin_span_expression))
-    futil.log(
-        f'Execute changed Design Parameter \'bin_span\' to {new_bin_span_expression}')
+    # Only fired when no preview result could be kept, see `command_preview`.
+    # Write the parameters of the chosen catalog entry and the bin span.
+    params = get_preview_parameters(inputs)
+    preview.execute(params)
+    logger.info("Execute changed Design Parameters to %s", params)
 
 
 # This event handler is called when the command needs to compute a new preview in the graphics window.
 def command_preview(args: adsk.core.CommandEventArgs):
     # General logging for debug.
-    futil.log(f"{CMD_NAME} Command Preview Event")
+    logger.debug("%s Command Preview Event", CMD_NAME)
     inputs = args.command.commandInputs
+
+    # Fusion 360 has rolled back the previous preview, so the inputs are
+    # applied again every time; only parameters that differ from the design
+    # are written.
+    try:
+        params = get_preview_parameters(inputs)
+        if preview.preview(params):
+            logger.debug('Preview changed Design Parameters to %s', params)
+        # OK keeps this result instead of firing execute.
+        args.isValidResult = True
+    except parameter_expressions.ExpressionError as e:
+        # Rejected before the design was touched, nothing to preview.
+        logger.debug("Preview skipped: %s", e)
+
+
+def get_preview_parameters(inputs: adsk.core.CommandInputs) -> dict:
+    """Parameter expressions previewed for the current command inputs.
+
+    Only the inputs the dialog has for the schema of the document are read.
+    """
+    text_box: adsk.core.TextBoxCommandInput = inputs.itemById("text_box")
     bin_span_spinner: adsk.core.IntegerSpinnerCommandInput = inputs.itemById(
         "bin_span_spinner")
-
-    # Update the preview to show the label with the new bin_span value.
-    new_bin_span_expression = bin_span_spinner.value
-    design_params.preview_parameter_expression(
-        "bin_span", str(new_bin_span_expression))
-    futil.log(
-        f'Preview changed Design Parameter \'bin_span\' to {new_bin_span_expression}')
+    values = dict(catalog_entry.params) if catalog_entry is not None else {}
+    if text_box is not None:
+        values["label_text"] = text_box.text
+    if bin_span_spinner is not None:
+        values["bin_span"] = bin_span_spinner.value
+    return dp_schema.expressions(values)
+
+
+def update_catalog_results(inputs: adsk.core.CommandInputs, query: str):
+    """List the catalog entries matching `query` in the results drop-down."""
+    global catalog_matches
+    catalog_matches = catalog.search(query, CATALOG_RESULTS)
+    results: adsk.core.DropDownCommandInput = inputs.itemById("catalog_results")
+    results.listItems.clear()
+    for entry in catalog_matches:
+        results.listItems.add(entry.name, False)
+
+
+def select_catalog_entry(inputs: adsk.core.CommandInputs):
+    """Fill the inputs from the entry chosen in the results drop-down."""
+    global catalog_entry
+    results: adsk.core.DropDownCommandInput = inputs.itemById("catalog_results")
+    item = results.selectedItem
+    if item is None or item.index >= len(catalog_matches):
+        return
+    catalog_entry = catalog_matches[item.index]
+    logger.debug("Catalog entry %s chosen", catalog_entry.name)
+    text_box: adsk.core.TextBoxCommandInput = inputs.itemById("text_box")
+    text_box.text = str(catalog_entry.params.get("label_text", catalog_entry.name))
+    bin_span_spinner: adsk.core.IntegerSpinnerCommandInput = inputs.itemById(
+        "bin_span_spinner")
+    if bin_span_spinner is not None and "bin_span" in catalog_entry.params:
+        bin_span_spinner.value = round(catalog_entry.params["bin_span"])
 
 
 # This event handler is called when the user changes anything in the command dialog
@@ -204,31 +228,59 @@ def command_input_changed(args: adsk.core.InputChangedEventArgs):
     inputs = args.inputs
 
     # General logging for debug.
-    futil.log(
-        f"{CMD_NAME} Input Changed Event fired from a change to {changed_input.id}"
+    logger.debug(
+        "%s Input Changed Event fired from a change to %s", CMD_NAME, changed_input.id
     )
 
+    if changed_input.id == "catalog_search":
+        update_catalog_results(inputs, changed_input.value)
+        return
+    if changed_input.id == "catalog_results":
+        select_catalog_entry(inputs)
+
 
 # This event handler is called when the user interacts with any of the inputs in the dialog
 # which allows you to verify that all of the inputs are valid and enables the OK button.
 def command_validate_input(args: adsk.core.ValidateInputsEventArgs):
     # General logging for debug.
-    futil.log(f"{CMD_NAME} Validate Input Event")
+    logger.debug("%s Validate Input Event", CMD_NAME)
 
     inputs = args.inputs
 
     # Verify the validity of the input values. This controls if the OK button is enabled or not.
     binSpanSpinner = inputs.itemById("bin_span_spinner")
-    if binSpanSpinner.value >= 1:
-        args.areInputsValid = True
-    else:
+    if binSpanSpinner is not None and binSpanSpinner.value < 1:
         args.areInputsValid = False
+        return
+
+    # Expressions that Fusion 360 would reject, or that break a parameter
+    # depending on them, are found without a recompute.
+    try:
+        design_params.check_parameter_expressions(get_preview_parameters(inputs))
+    except parameter_expressions.ExpressionError as e:
+        logger.debug("Inputs rejected: %s", e)
+        args.areInputsValid = False
+        return
+    args.areInputsValid = True
 
 
 # This event handler is called when the command terminates.
 def command_destroy(args: adsk.core.CommandEventArgs):
     # General logging for debug.
-    futil.log(f"{CMD_NAME} Command Destroy Event")
-
-    global local_handlers
-    local_handlers = []
+    logger.debug("%s Command Destroy Event", CMD_NAME)
+
+    global preview
+    global catalog, catalog_matches, catalog_entry
+    if preview is not None:
+        preview.finish(
+            args.terminationReason == adsk.core.TerminationReasons.CompletedTerminationReason)
+        logger.info("%s previews: %s", CMD_NAME, preview.stats())
+    if catalog is not None:
+        logger.info("%s catalog searches: %s", CMD_NAME, catalog.stats())
+    # Remove this dialog's handlers from their events, this one included.
+    released = futil.release_scope(CMD_ID)
+    preview = None
+    catalog = None
+    catalog_matches = []
+    catalog_entry = None
+    logger.debug("Released %d handlers, %s", released, futil.handler_stats())
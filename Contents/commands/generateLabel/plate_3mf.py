@@ -0,0 +1,312 @@
+"""Package exported labels as 3MF build plates.
+
+Labels exported one STL per label repeat a lot of geometry: repeated manifest
+rows produce identical files, and every label of a batch shares its body. The
+packager reads each distinct mesh once, stores it as a single 3MF object and
+places every label as a build item referencing that object with a transform.
+
+Meshes are streamed: an STL is read, its vertices are merged and the object
+is written to the archive before the next STL is opened, so memory use is
+bounded by the largest single mesh, not by the size of the batch.
+"""
+
+import os
+import pathlib
+import struct
+import time
+import tracemalloc
+import zipfile
+
+from ...lib import export_cache
+from ...lib import fusionAddInUtils as futil
+
+logger = futil.get_logger(__name__)
+
+MODEL_PATH = "3D/3dmodel.model"
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+    '</Types>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    f'<Relationship Target="/{MODEL_PATH}" Id="rel0" '
+    'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+    '</Relationships>'
+)
+
+_MODEL_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<model unit="millimeter" xml:lang="en-US" '
+    'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+    '<resources>'
+)
+
+# Triangles read from a binary STL per chunk.
+_STL_CHUNK = 4096
+_STL_TRIANGLE = struct.Struct("<12x9f2x")
+
+# XML lines collected before they are encoded and written.
+_WRITE_BATCH = 8192
+
+
+def read_stl(fp: pathlib.Path):
+    """Yield the triangles of a binary or ASCII STL file as 9-tuples."""
+    size = os.path.getsize(fp)
+    with open(fp, "rb") as f:
+        header = f.read(84)
+        count = struct.unpack_from("<I", header, 80)[0] if len(header) == 84 else -1
+        if size == 84 + count * 50:
+            while count:
+                n = min(count, _STL_CHUNK)
+                yield from _STL_TRIANGLE.iter_unpack(f.read(n * 50))
+                count -= n
+            return
+    with open(fp, encoding="ascii", errors="replace") as f:
+        corners = []
+        for line in f:
+            words = line.split()
+            if words and words[0] == "vertex":
+                corners.extend(float(w) for w in words[1:4])
+                if len(corners) == 9:
+                    yield tuple(corners)
+                    corners = []
+
+
+# Upper 3 x 3 part of the 3MF build item transforms, row vectors.
+_IDENTITY = "1 0 0 0 1 0 0 0 1"
+_ROTATED = "0 1 0 -1 0 0 0 0 1"
+
+
+def _number(value: float) -> str:
+    return f"{value:.6g}"
+
+
+class MeshObject:
+    """A distinct mesh written to the package.
+
+    Attributes:
+        object_id (int): 3MF resource id.
+        name (str): object name shown by slicers.
+        origin (tuple): lower corner of the mesh bounding box, subtracted in
+            the transform of every build item so placements refer to it.
+        size (tuple): extent of the bounding box.
+        triangles (int): triangle count.
+    """
+
+    __slots__ = ("object_id", "name", "origin", "size", "triangles")
+
+    def __init__(self, object_id, name, origin, size, triangles):
+        self.object_id = object_id
+        self.name = name
+        self.origin = origin
+        self.size = size
+        self.triangles = triangles
+
+
+class PackageReport:
+    """Size and cost of writing a 3MF package."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.objects = 0
+        self.items = 0
+        self.triangles = 0
+        self.source_bytes = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.peak_memory = None
+
+    def summary(self) -> str:
+        text = (
+            f"{self.items} labels as {self.objects} meshes, "
+            f"{self.bytes / 1024:.1f} KiB from {self.source_bytes / 1024:.1f} KiB of STL "
+            f"in {self.seconds:.2f}s"
+        )
+        if self.peak_memory is not None:
+            text += f", peak memory {self.peak_memory / 1024:.1f} KiB"
+        return text
+
+    def to_dict(self) -> dict:
+        return {k: str(v) if k == "path" else v for k, v in vars(self).items()}
+
+
+class ThreeMFPackager:
+    """Write labels into a 3MF package, storing every distinct mesh once.
+
+    Args:
+        fp (pathlib.Path): path of the 3MF file to write.
+        compression (int): `zipfile` compression of the archive entries.
+
+    Use as a context manager; `add` places a label and `close` writes the
+    build section and finishes the archive.
+    """
+
+    def __init__(self, fp: pathlib.Path, compression: int = zipfile.ZIP_DEFLATED):
+        self.report = PackageReport(pathlib.Path(fp))
+        self._zip = zipfile.ZipFile(fp, "w", compression)
+        self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        self._zip.writestr("_rels/.rels", _RELS)
+        self._model = self._zip.open(MODEL_PATH, "w", force_zip64=True)
+        self._model.write(_MODEL_HEADER.encode())
+        # Mesh per source file digest, and per path to skip hashing repeats.
+        self._by_digest = {}
+        self._by_path = {}
+        self._items = []
+        self._start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._model.close()
+            self._zip.close()
+
+    def mesh(self, fp: pathlib.Path, name: str = None) -> MeshObject:
+        """Object of the mesh in `fp`, written to the package on first use."""
+        key = str(fp)
+        obj = self._by_path.get(key)
+        if obj is not None:
+            return obj
+        digest = export_cache.file_digest(fp)
+        obj = self._by_digest.get(digest)
+        if obj is None:
+            obj = self._by_digest[digest] = self._write_object(
+                fp, name or pathlib.Path(fp).stem)
+            self.report.source_bytes += os.path.getsize(fp)
+        self._by_path[key] = obj
+        return obj
+
+    def add(self, fp: pathlib.Path, x: float = 0.0, y: float = 0.0, z: float = 0.0,
+            name: str = None, rotated: bool = False) -> MeshObject:
+        """Place the mesh of `fp` with its bounding box corner at `(x, y, z)`.
+
+        A `rotated` mesh is turned by 90 degrees about Z, so its X extent
+        runs along Y.
+        """
+        obj = self.mesh(fp, name)
+        ox, oy, oz = obj.origin
+        if rotated:
+            # x' = -y + tx, y' = x + ty
+            self._items.append((obj.object_id, _ROTATED,
+                                x + oy + obj.size[1], y - ox, z - oz))
+        else:
+            self._items.append((obj.object_id, _IDENTITY, x - ox, y - oy, z - oz))
+        return obj
+
+    def _write_object(self, fp: pathlib.Path, name: str) -> MeshObject:
+        with futil.span("3mf_object", "export", path=str(fp)):
+            vertices = {}
+            triangles = []
+            index = vertices.setdefault
+            for t in read_stl(fp):
+                a = index(t[0:3], len(vertices))
+                b = index(t[3:6], len(vertices))
+                c = index(t[6:9], len(vertices))
+                if a != b and b != c and a != c:
+                    triangles.append((a, b, c))
+
+            object_id = len(self._by_digest) + 1
+            if vertices:
+                xs, ys, zs = zip(*vertices)
+                origin = (min(xs), min(ys), min(zs))
+                size = (max(xs) - origin[0], max(ys) - origin[1], max(zs) - origin[2])
+                del xs, ys, zs
+            else:
+                origin = size = (0.0, 0.0, 0.0)
+
+            name = name.replace("&", "&amp;").replace('"', "&quot;").replace("<", "&lt;")
+            lines = [f'<object id="{object_id}" name="{name}" type="model"><mesh><vertices>']
+            for vx, vy, vz in vertices:
+                lines.append(f'<vertex x="{_number(vx)}" y="{_number(vy)}" z="{_number(vz)}"/>')
+                if len(lines) >= _WRITE_BATCH:
+                    self._write_lines(lines)
+            del vertices
+            lines.append("</vertices><triangles>")
+            for a, b, c in triangles:
+                lines.append(f'<triangle v1="{a}" v2="{b}" v3="{c}"/>')
+                if len(lines) >= _WRITE_BATCH:
+                    self._write_lines(lines)
+            lines.append("</triangles></mesh></object>")
+            self._write_lines(lines)
+
+        self.report.objects += 1
+        self.report.triangles += len(triangles)
+        return MeshObject(object_id, name, origin, size, len(triangles))
+
+    def _write_lines(self, lines: list):
+        self._model.write("".join(lines).encode())
+        lines.clear()
+
+    def close(self) -> PackageReport:
+        if self._model.closed:
+            return self.report
+        lines = ["</resources><build>"]
+        for object_id, rotation, x, y, z in self._items:
+            lines.append(
+                f'<item objectid="{object_id}" '
+                f'transform="{rotation} {_number(x)} {_number(y)} {_number(z)}"/>')
+            if len(lines) >= _WRITE_BATCH:
+                self._write_lines(lines)
+        lines.append("</build></model>")
+        self._write_lines(lines)
+        self._model.close()
+        self._zip.close()
+
+        report = self.report
+        report.items = len(self._items)
+        report.bytes = os.path.getsize(report.path)
+        report.seconds = time.perf_counter() - self._start
+        return report
+
+
+def package_plates(output_dir: pathlib.Path, packing, mesh_paths: list,
+                   name_template: str = "plate_{plate:02d}.3mf",
+                   trace_memory: bool = True) -> list:
+    """Write one 3MF file per plate of a packing result.
+
+    Args:
+        output_dir (pathlib.Path): directory the packages are written to.
+        packing (PackingResult): placements from `plate_packing.pack_labels`.
+        mesh_paths (list): exported mesh of every packed label, indexed like
+            the labels passed to `pack_labels`.
+        name_template (str): file name of a package, formatted with the
+            1-based `plate` number.
+        trace_memory (bool): measure peak memory use with `tracemalloc`,
+            which slows writing down.
+
+    Returns:
+        list: a `PackageReport` per plate.
+    """
+    output_dir = pathlib.Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    reports = []
+    try:
+        for plate, placements in enumerate(packing.by_plate(), 1):
+            if trace_memory:
+                tracemalloc.reset_peak()
+            fp = output_dir.joinpath(name_template.format(plate=plate))
+            with futil.span("3mf_plate", "export", plate=plate):
+                with ThreeMFPackager(fp) as packager:
+                    for p in placements:
+                        packager.add(mesh_paths[p.label], p.x, p.y, rotated=p.rotated)
+            report = packager.report
+            if trace_memory:
+                report.peak_memory = tracemalloc.get_traced_memory()[1]
+            logger.info("Plate %d: %s", plate, report.summary())
+            reports.append(report)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+    return reports
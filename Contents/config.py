@@ -18,5 +18,35 @@ DEBUG = True
 ADDIN_NAME = os.path.basename(os.path.dirname(__file__))
 COMPANY_NAME = "jakefrommars64 and Anton Fritsch"
 
+# Logging
+# Level per logger name prefix, "" is the root. Modules log through
+# `futil.get_logger(__name__)`, so e.g. "GridfinityLabelAutogen.commands" covers
+# all commands. Without an entry the level is DEBUG in Debug mode, INFO otherwise.
+LOG_LEVELS = {}
+# Messages held in memory before the oldest are dropped.
+LOG_BUFFER_SIZE = 4096
+# Seconds between writes of buffered messages by the background thread.
+LOG_FLUSH_INTERVAL = 0.25
+# Optional path of a file that receives all log messages.
+LOG_FILE = None
+
+# Tracing
+# Time every event handler and the spans inside them. When the add-in stops the
+# spans are written to TRACE_FILE in Chrome trace-event format.
+TRACE = False
+TRACE_FILE = os.path.join(os.path.dirname(__file__), "gla_trace.json")
+
 # Palettes
+# Progress palette of background batches.
 sample_palette_id = f"{COMPANY_NAME}_{ADDIN_NAME}_palette_id"
+
+# Batches
+# Recompute costs learned from earlier batches, see `lib/batch_schedule.py`.
+BATCH_COST_MODEL = os.path.join(os.path.dirname(__file__), "batch_cost_model.json")
+# Journal in the output folder of a batch; a batch run again into the same
+# folder skips the labels that are already there.
+BATCH_JOURNAL_NAME = ".gla_batch_journal.jsonl"
+# Labels exported by earlier batches, reused when a design and parameter set
+# repeat. Least recently used labels are removed above the size limit.
+BATCH_CACHE_DIR = os.path.join(os.path.dirname(__file__), "export_cache")
+BATCH_CACHE_MAX_BYTES = 512 * 1024 * 1024
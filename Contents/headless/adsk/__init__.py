@@ -0,0 +1,9 @@
+"""Stand-in for the Fusion 360 `adsk` package.
+
+Only the small part of the API that the add-in touches is modelled here, so
+that library code can be imported and exercised outside of Fusion 360.
+It is never loaded by Fusion itself; see `headless/bootstrap.py`.
+"""
+
+from . import core
+from . import fusion
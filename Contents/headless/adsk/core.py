@@ -0,0 +1,622 @@
+"""Stand-in for `adsk.core`."""
+
+import queue
+import threading
+
+
+class LogLevels:
+    InfoLogLevel = 0
+    WarningLogLevel = 1
+    ErrorLogLevel = 2
+
+
+class LogTypes:
+    ConsoleLogType = 0
+    FileLogType = 1
+
+
+class TerminationReasons:
+    UnknownTerminationReason = 0
+    CompletedTerminationReason = 1
+    CancelledTerminationReason = 2
+    AbortedTerminationReason = 3
+    PreEmptedTerminationReason = 4
+
+
+class DialogResults:
+    DialogOK = 0
+    DialogCancel = 1
+    DialogError = 2
+
+
+class UserInterface:
+    def __init__(self):
+        self.messages = []
+        self.commandDefinitions = CommandDefinitions()
+        self.workspaces = Workspaces()
+        self.palettes = Palettes()
+        self.commandTerminated = ApplicationCommandEvent("commandTerminated")
+        # Paths the next file and folder dialogs return, None to cancel.
+        self.dialog_answers = []
+
+    def messageBox(self, text, *args):
+        self.messages.append(text)
+        return 0
+
+    def createFileDialog(self):
+        return FileDialog(self)
+
+    def createFolderDialog(self):
+        return FolderDialog(self)
+
+
+class _Dialog:
+    def __init__(self, ui):
+        self._ui = ui
+        self.title = ""
+        self.initialDirectory = ""
+
+    def _answer(self):
+        answer = self._ui.dialog_answers.pop(0) if self._ui.dialog_answers else None
+        return DialogResults.DialogCancel if answer is None else DialogResults.DialogOK, answer
+
+
+class FileDialog(_Dialog):
+    def __init__(self, ui):
+        super().__init__(ui)
+        self.filter = ""
+        self.isMultiSelectEnabled = False
+        self.filename = ""
+
+    def showOpen(self):
+        result, answer = self._answer()
+        self.filename = answer or ""
+        return result
+
+
+class FolderDialog(_Dialog):
+    def __init__(self, ui):
+        super().__init__(ui)
+        self.folder = ""
+
+    def showDialog(self):
+        result, answer = self._answer()
+        self.folder = answer or ""
+        return result
+
+
+class Application:
+    _instance = None
+
+    def __init__(self):
+        self.userInterface = UserInterface()
+        self.activeProduct = None
+        self.log_records = []
+        self.documentActivated = DocumentEvent("documentActivated")
+        self._custom_events = {}
+        self._event_queue = queue.Queue()
+
+    def registerCustomEvent(self, event_id):
+        event = self._custom_events.get(event_id)
+        if event is None:
+            event = self._custom_events[event_id] = CustomEvent(event_id)
+        return event
+
+    def unregisterCustomEvent(self, event_id):
+        return self._custom_events.pop(event_id, None) is not None
+
+    def fireCustomEvent(self, event_id, additionalInfo=""):
+        """Queue a custom event; safe to call from any thread, like the real API."""
+        if event_id not in self._custom_events:
+            return False
+        self._event_queue.put((event_id, additionalInfo))
+        return True
+
+    def process_events(self, timeout: float = 0.0) -> int:
+        """Stand-in for Fusion's main loop: dispatch queued custom events.
+
+        Waits up to `timeout` seconds for the first event, then dispatches
+        everything that is queued. Returns the number of events dispatched.
+        """
+        dispatched = 0
+        try:
+            item = self._event_queue.get(timeout=timeout) if timeout else \
+                self._event_queue.get_nowait()
+        except queue.Empty:
+            return 0
+        while True:
+            event_id, info = item
+            event = self._custom_events.get(event_id)
+            if event is not None:
+                event.fire(CustomEventArgs(id=event_id, additionalInfo=info))
+                dispatched += 1
+            try:
+                item = self._event_queue.get_nowait()
+            except queue.Empty:
+                return dispatched
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = Application()
+        return cls._instance
+
+    def log(self, message, level=LogLevels.InfoLogLevel, log_type=LogTypes.ConsoleLogType):
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("Application.log called off the main thread")
+        self.log_records.append((message, level, log_type))
+
+
+class ValueInput:
+    """A value given as an expression string or a real in internal units."""
+
+    def __init__(self, stringValue="", realValue=0.0):
+        self.stringValue = stringValue
+        self.realValue = realValue
+
+    @staticmethod
+    def createByString(stringValue):
+        return ValueInput(stringValue=stringValue)
+
+    @staticmethod
+    def createByReal(realValue):
+        return ValueInput(stringValue=repr(realValue), realValue=realValue)
+
+
+class Document:
+    """An unsaved document; a saved one has a `dataFile` with id and version."""
+
+    def __init__(self, name="Untitled"):
+        self.name = name
+        self.dataFile = None
+
+
+class EventArgs:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class CommandCreatedEventArgs(EventArgs):
+    pass
+
+
+class CommandEventArgs(EventArgs):
+    isValidResult = False
+    terminationReason = TerminationReasons.UnknownTerminationReason
+
+
+class InputChangedEventArgs(EventArgs):
+    pass
+
+
+class ValidateInputsEventArgs(EventArgs):
+    pass
+
+
+class CustomEventArgs(EventArgs):
+    pass
+
+
+class HTMLEventArgs(EventArgs):
+    pass
+
+
+class UserInterfaceGeneralEventArgs(EventArgs):
+    pass
+
+
+class ApplicationCommandEventArgs(EventArgs):
+    pass
+
+
+class DocumentEventArgs(EventArgs):
+    pass
+
+
+class EventHandler:
+    def notify(self, args):
+        pass
+
+
+class CommandCreatedEventHandler(EventHandler):
+    pass
+
+
+class CommandEventHandler(EventHandler):
+    pass
+
+
+class InputChangedEventHandler(EventHandler):
+    pass
+
+
+class ValidateInputsEventHandler(EventHandler):
+    pass
+
+
+class CustomEventHandler(EventHandler):
+    pass
+
+
+class HTMLEventHandler(EventHandler):
+    pass
+
+
+class UserInterfaceGeneralEventHandler(EventHandler):
+    pass
+
+
+class ApplicationCommandEventHandler(EventHandler):
+    pass
+
+
+class DocumentEventHandler(EventHandler):
+    pass
+
+
+class Event:
+    """Base event; like the real API, `add` is annotated with the handler type."""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._handlers = []
+
+    def add(self, handler: "EventHandler") -> bool:
+        self._handlers.append(handler)
+        return True
+
+    def remove(self, handler: "EventHandler") -> bool:
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+            return True
+        return False
+
+    def fire(self, args):
+        for handler in list(self._handlers):
+            handler.notify(args)
+
+
+class CommandCreatedEvent(Event):
+    def add(self, handler: "CommandCreatedEventHandler") -> bool:
+        return super().add(handler)
+
+
+class CommandEvent(Event):
+    def add(self, handler: "CommandEventHandler") -> bool:
+        return super().add(handler)
+
+
+class InputChangedEvent(Event):
+    def add(self, handler: "InputChangedEventHandler") -> bool:
+        return super().add(handler)
+
+
+class ValidateInputsEvent(Event):
+    def add(self, handler: "ValidateInputsEventHandler") -> bool:
+        return super().add(handler)
+
+
+class CustomEvent(Event):
+    def add(self, handler: "CustomEventHandler") -> bool:
+        return super().add(handler)
+
+
+class HTMLEvent(Event):
+    def add(self, handler: "HTMLEventHandler") -> bool:
+        return super().add(handler)
+
+
+class UserInterfaceGeneralEvent(Event):
+    def add(self, handler: "UserInterfaceGeneralEventHandler") -> bool:
+        return super().add(handler)
+
+
+class ApplicationCommandEvent(Event):
+    def add(self, handler: "ApplicationCommandEventHandler") -> bool:
+        return super().add(handler)
+
+
+class DocumentEvent(Event):
+    def add(self, handler: "DocumentEventHandler") -> bool:
+        return super().add(handler)
+
+
+class CommandInput:
+    def __init__(self, id, name=""):
+        self.id = id
+        self.name = name
+
+
+class TextBoxCommandInput(CommandInput):
+    def __init__(self, id, name, formattedText, numRows, isReadOnly):
+        super().__init__(id, name)
+        self.formattedText = formattedText
+        self.text = formattedText
+        self.numRows = numRows
+        self.isReadOnly = isReadOnly
+
+
+class StringValueCommandInput(CommandInput):
+    def __init__(self, id, name, value):
+        super().__init__(id, name)
+        self.value = value
+
+
+class IntegerSpinnerCommandInput(CommandInput):
+    def __init__(self, id, name, min, max, spinStep, initialValue):
+        super().__init__(id, name)
+        self.minimumValue = min
+        self.maximumValue = max
+        self.spinStep = spinStep
+        self.value = initialValue
+
+
+class DropDownStyles:
+    LabeledIconDropDownStyle = 0
+    CheckBoxDropDownStyle = 1
+    TextListDropDownStyle = 2
+
+
+class ListItem:
+    def __init__(self, name, isSelected, index):
+        self.name = name
+        self.isSelected = isSelected
+        self.index = index
+
+
+class ListItems:
+    def __init__(self):
+        self._items = []
+
+    def add(self, name, isSelected, icon="", beforeIndex=-1):
+        item = ListItem(name, isSelected, len(self._items))
+        self._items.append(item)
+        return item
+
+    def clear(self):
+        self._items = []
+        return True
+
+    def item(self, index):
+        return self._items[index]
+
+    @property
+    def count(self):
+        return len(self._items)
+
+
+class DropDownCommandInput(CommandInput):
+    def __init__(self, id, name, dropDownStyle):
+        super().__init__(id, name)
+        self.dropDownStyle = dropDownStyle
+        self.listItems = ListItems()
+
+    @property
+    def selectedItem(self):
+        return next((i for i in self.listItems._items if i.isSelected), None)
+
+
+class CommandInputs:
+    def __init__(self):
+        self._inputs = {}
+
+    def _add(self, command_input):
+        self._inputs[command_input.id] = command_input
+        return command_input
+
+    def addTextBoxCommandInput(self, id, name, formattedText, numRows, isReadOnly):
+        return self._add(TextBoxCommandInput(id, name, formattedText, numRows, isReadOnly))
+
+    def addStringValueInput(self, id, name, value=""):
+        return self._add(StringValueCommandInput(id, name, value))
+
+    def addDropDownCommandInput(self, id, name, dropDownStyle):
+        return self._add(DropDownCommandInput(id, name, dropDownStyle))
+
+    def addIntegerSpinnerCommandInput(self, id, name, min, max, spinStep, initialValue):
+        return self._add(IntegerSpinnerCommandInput(id, name, min, max, spinStep, initialValue))
+
+    def itemById(self, id):
+        return self._inputs.get(id)
+
+    @property
+    def count(self):
+        return len(self._inputs)
+
+
+class Command:
+    """A command dialog; `doExecutePreview` fires the preview synchronously.
+
+    Like Fusion 360, the changes of the previous preview of the active design
+    are rolled back before each preview. `doExecute` clicks OK.
+    """
+
+    def __init__(self):
+        self.commandInputs = CommandInputs()
+        self.execute = CommandEvent("execute")
+        self.inputChanged = InputChangedEvent("inputChanged")
+        self.executePreview = CommandEvent("executePreview")
+        self.validateInputs = ValidateInputsEvent("validateInputs")
+        self.destroy = CommandEvent("destroy")
+        # Whether the last preview set `isValidResult`.
+        self._valid_result = False
+
+    def doExecutePreview(self):
+        design = Application.get().activeProduct
+        if design is not None:
+            design._start_preview()
+        args = CommandEventArgs(command=self)
+        self.executePreview.fire(args)
+        self._valid_result = args.isValidResult
+        return True
+
+    def doExecute(self):
+        """Simulate a click on OK, which ends the command.
+
+        If the last preview set `isValidResult`, its result is kept and no
+        execute event fires. Otherwise the preview is rolled back first.
+        """
+        design = Application.get().activeProduct
+        if design is not None:
+            design._end_preview(keep=self._valid_result)
+        if not self._valid_result:
+            self.execute.fire(CommandEventArgs(command=self))
+        self.destroy.fire(CommandEventArgs(
+            command=self, terminationReason=TerminationReasons.CompletedTerminationReason))
+        return True
+
+    def change_input(self, input_id, value):
+        """Simulate the user changing an input: inputChanged, then a preview.
+
+        For a drop-down `value` is the index of the item to select.
+        """
+        command_input = self.commandInputs.itemById(input_id)
+        if isinstance(command_input, DropDownCommandInput):
+            for item in command_input.listItems._items:
+                item.isSelected = item.index == value
+        else:
+            command_input.value = value
+        self._valid_result = False
+        self.inputChanged.fire(InputChangedEventArgs(
+            input=command_input, inputs=self.commandInputs))
+        self.doExecutePreview()
+
+
+class _Collection:
+    """Items by id, like the Fusion 360 API collections."""
+
+    def __init__(self):
+        self._items = {}
+
+    def _add(self, item):
+        self._items[item.id] = item
+        item._collection = self
+        return item
+
+    def itemById(self, id):
+        return self._items.get(id)
+
+    @property
+    def count(self):
+        return len(self._items)
+
+
+class _CollectionItem:
+    def deleteMe(self):
+        del self._collection._items[self.id]
+        return True
+
+
+class CommandDefinition(_CollectionItem):
+    def __init__(self, id, name, tooltip="", resourceFolder=""):
+        self.id = id
+        self.name = name
+        self.tooltip = tooltip
+        self.resourceFolder = resourceFolder
+        self.commandCreated = CommandCreatedEvent("commandCreated")
+
+    def execute(self):
+        """Simulate a click on the button: a new command is created."""
+        command = Command()
+        self.commandCreated.fire(CommandCreatedEventArgs(command=command))
+        return command
+
+
+class CommandDefinitions(_Collection):
+    def addButtonDefinition(self, id, name, tooltip, resourceFolder=""):
+        return self._add(CommandDefinition(id, name, tooltip, resourceFolder))
+
+
+class CommandControl(_CollectionItem):
+    def __init__(self, command_definition):
+        self.id = command_definition.id
+        self.commandDefinition = command_definition
+        self.isPromoted = False
+
+
+class ToolbarControls(_Collection):
+    def addCommand(self, commandDefinition, positionID="", isBefore=True):
+        return self._add(CommandControl(commandDefinition))
+
+
+class ToolbarPanel(_CollectionItem):
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+        self.controls = ToolbarControls()
+
+
+class ToolbarPanels(_Collection):
+    def __init__(self, panels: dict = None):
+        super().__init__()
+        # Panels are shared by the workspace and its tabs.
+        if panels is not None:
+            self._items = panels
+
+    def add(self, id, name, positionID="", isBefore=True):
+        return self._add(ToolbarPanel(id, name))
+
+
+class ToolbarTab(_CollectionItem):
+    def __init__(self, id, panels: dict):
+        self.id = id
+        self.toolbarPanels = ToolbarPanels(panels)
+
+
+class ToolbarTabs(_Collection):
+    pass
+
+
+class Workspace(_CollectionItem):
+    def __init__(self, id, tab_ids=()):
+        self.id = id
+        self.toolbarPanels = ToolbarPanels()
+        self.toolbarTabs = ToolbarTabs()
+        for tab_id in tab_ids:
+            self.toolbarTabs._add(ToolbarTab(tab_id, self.toolbarPanels._items))
+
+
+class Workspaces(_Collection):
+    def __init__(self):
+        super().__init__()
+        self._add(Workspace("FusionSolidEnvironment", ("SolidTab",)))
+
+
+class Palette(_CollectionItem):
+    """An HTML palette; messages sent to the page are kept in `sent`."""
+
+    def __init__(self, id, name, htmlFileURL, isVisible, showCloseButton, isResizable,
+                 width, height):
+        self.id = id
+        self.name = name
+        self.htmlFileURL = htmlFileURL
+        self.isVisible = isVisible
+        self.showCloseButton = showCloseButton
+        self.isResizable = isResizable
+        self.width = width
+        self.height = height
+        self.sent = []
+        self.incomingFromHTML = HTMLEvent("incomingFromHTML")
+        self.closed = UserInterfaceGeneralEvent("closed")
+
+    def sendInfoToHTML(self, action, data):
+        self.sent.append((action, data))
+        return ""
+
+    def send_from_html(self, action, data=""):
+        """Simulate the page calling `adsk.fusionSendData(action, data)`."""
+        args = HTMLEventArgs(action=action, data=data, returnData="")
+        self.incomingFromHTML.fire(args)
+        return args.returnData
+
+    def close(self):
+        """Simulate the user closing the palette."""
+        self.isVisible = False
+        self.closed.fire(UserInterfaceGeneralEventArgs())
+
+
+class Palettes(_Collection):
+    def add(self, id, name, htmlFileURL, isVisible, showCloseButton, isResizable,
+            width=0, height=0, useNewWebBrowser=False):
+        return self._add(Palette(id, name, htmlFileURL, isVisible, showCloseButton,
+                                 isResizable, width, height))
@@ -0,0 +1,232 @@
+"""Stand-in for `adsk.fusion`.
+
+`Design` keeps its parameters in memory and simulates the cost of a
+parametric recompute, which is what dominates real runs of the add-in. A
+recompute costs `recompute_cost` plus the `parameter_costs` of the
+parameters changed since the last one, as features downstream of an
+expensive parameter are rebuilt too.
+"""
+
+import struct
+import time
+
+from . import core
+
+
+# Internal Fusion 360 length unit is the centimetre.
+_UNIT_SCALE = {"mm": 0.1, "cm": 1.0, "m": 100.0, "in": 2.54}
+
+
+def _evaluate(expression: str, unit: str):
+    expression = expression.strip()
+    if expression[:1] in ("'", '"'):
+        return expression.strip("'\"")
+    number = float(expression.split()[0])
+    return number * _UNIT_SCALE.get(unit, 1.0)
+
+
+class Parameter:
+    def __init__(self, design, name, expression, unit="", comment=""):
+        self._design = design
+        self._name = name
+        self._unit = unit
+        self._comment = comment
+        self._expression = expression
+        self._value = _evaluate(expression, unit)
+
+    # Every property read is counted, as each one is a cross-process call
+    # in Fusion 360.
+    @property
+    def name(self):
+        self._design.api_calls += 1
+        return self._name
+
+    @property
+    def unit(self):
+        self._design.api_calls += 1
+        return self._unit
+
+    @property
+    def comment(self):
+        self._design.api_calls += 1
+        return self._comment
+
+    @property
+    def expression(self):
+        self._design.api_calls += 1
+        return self._expression
+
+    @expression.setter
+    def expression(self, expression):
+        self._design.api_calls += 1
+        self._set(expression)
+        self._design._recompute()
+
+    def _set(self, expression):
+        undo = self._design._preview_undo
+        if undo is not None and self._name not in undo:
+            undo[self._name] = self._expression
+        self._value = _evaluate(expression, self._unit)
+        self._expression = expression
+        self._design._changed.add(self._name)
+
+    @property
+    def value(self):
+        self._design.api_calls += 1
+        return self._value
+
+
+class ParameterList:
+    def __init__(self, design):
+        self._design = design
+        self._items = []
+        self._by_name = {}
+
+    def _add(self, param):
+        self._items.append(param)
+        self._by_name[param._name] = param
+
+    @property
+    def count(self):
+        self._design.api_calls += 1
+        return len(self._items)
+
+    def item(self, index):
+        self._design.api_calls += 1
+        return self._items[index]
+
+    def itemByName(self, name):
+        self._design.api_calls += 1
+        return self._by_name.get(name)
+
+
+class STLExportOptions:
+    def __init__(self, geometry, filename):
+        self.geometry = geometry
+        self.filename = filename
+
+
+class ExportManager:
+    def __init__(self, design):
+        self._design = design
+
+    def createSTLExportOptions(self, geometry, filename=""):
+        return STLExportOptions(geometry, filename)
+
+    def execute(self, options):
+        with open(options.filename, "wb") as f:
+            f.write(self._design._label_mesh())
+        return True
+
+
+class Design:
+    """In-memory design with a configurable per-recompute cost in seconds."""
+
+    def __init__(self, recompute_cost: float = 0.0, parameter_costs: dict = None):
+        self.recompute_cost = recompute_cost
+        self.parameter_costs = dict(parameter_costs or {})
+        self.recompute_count = 0
+        self.api_calls = 0
+        self.allParameters = ParameterList(self)
+        self.rootComponent = object()
+        self.parentDocument = core.Document("gridfinity_label_parametric v11")
+        self.exportManager = ExportManager(self)
+        self._changed = set()
+        # Expressions before the current command preview, None outside one.
+        self._preview_undo = None
+
+    @staticmethod
+    def cast(product):
+        return product if isinstance(product, Design) else None
+
+    def add_parameter(self, name, expression, unit="", comment=""):
+        param = Parameter(self, name, expression, unit, comment)
+        self.allParameters._add(param)
+        return param
+
+    def modifyParameters(self, parameters, values):
+        """Set the expressions of several parameters with a single recompute.
+
+        Every expression is checked first; if one is invalid the call fails
+        and no parameter is changed.
+        """
+        self.api_calls += 1
+        expressions = [v.stringValue for v in values]
+        for param, expression in zip(parameters, expressions):
+            try:
+                _evaluate(expression, param._unit)
+            except (ValueError, IndexError):
+                raise RuntimeError(f"3 : invalid expression '{expression}'") from None
+        for param, expression in zip(parameters, expressions):
+            param._set(expression)
+        self._recompute()
+        return True
+
+    def computeAll(self):
+        self._recompute()
+
+    def _start_preview(self):
+        """Roll back the previous command preview, as Fusion 360 does before each one."""
+        undo, self._preview_undo = self._preview_undo, {}
+        self._roll_back(undo)
+
+    def _end_preview(self, keep: bool):
+        """Keep or roll back the last command preview when the command ends."""
+        undo, self._preview_undo = self._preview_undo, None
+        if not keep:
+            self._roll_back(undo)
+
+    def _roll_back(self, undo: dict):
+        for name, expression in (undo or {}).items():
+            param = self.allParameters._by_name[name]
+            param._value = _evaluate(expression, param._unit)
+            param._expression = expression
+            self._changed.add(name)
+        if undo:
+            self._recompute()
+
+    def _recompute(self):
+        self.recompute_count += 1
+        cost = self.recompute_cost + sum(self.parameter_costs.get(n, 0.0) for n in self._changed)
+        self._changed.clear()
+        if cost:
+            time.sleep(cost)
+
+    def _label_mesh(self) -> bytes:
+        """Binary STL of a box the size of the label, with a raised box per glyph."""
+        params = self.allParameters._by_name
+        span = params["bin_span"]._value if "bin_span" in params else 1.0
+        text = params["label_text"]._value if "label_text" in params else ""
+        x, y, z = span * 42.0 - 0.5, 11.5, 1.2
+        triangles = _box((0, 0, 0), (x, y, z))
+        glyphs = [c for c in str(text) if not c.isspace()]
+        if glyphs:
+            left = y + 0.8
+            pitch = min((x - 0.8 - left) / len(glyphs), 3.0)
+            for i in range(len(glyphs)):
+                x0 = left + i * pitch
+                triangles += _box((x0, 3.5, z), (x0 + 0.8 * pitch, 8.0, z + 0.4))
+        return _stl(triangles)
+
+
+def _stl(triangles: list) -> bytes:
+    """Binary STL of triangles given as three corner tuples each."""
+    data = bytearray(b"\0" * 80)
+    data += struct.pack("<I", len(triangles))
+    for corners in triangles:
+        data += struct.pack("<3f", 0, 0, 0)
+        for corner in corners:
+            data += struct.pack("<3f", *corner)
+        data += b"\0\0"
+    return bytes(data)
+
+
+def _box(low, high) -> list:
+    """The 12 outward facing triangles of an axis aligned box."""
+    (x0, y0, z0), (x1, y1, z1) = low, high
+    v = [(x0, y0, z0), (x1, y0, z0), (x1, y1, z0), (x0, y1, z0),
+         (x0, y0, z1), (x1, y0, z1), (x1, y1, z1), (x0, y1, z1)]
+    faces = [(0, 2, 1), (0, 3, 2), (4, 5, 6), (4, 6, 7),
+             (0, 1, 5), (0, 5, 4), (1, 2, 6), (1, 6, 5),
+             (2, 3, 7), (2, 7, 6), (3, 0, 4), (3, 4, 7)]
+    return [tuple(v[i] for i in face) for face in faces]
@@ -0,0 +1,71 @@
+"""Micro-benchmark of the compiled schema validator.
+
+Usage:
+    python headless/bench_schema_validator.py --rows 100000
+
+Validates a mix of valid and invalid manifest rows against the label schema
+and prints the number of rows validated per second.
+"""
+
+import argparse
+import json
+import random
+import time
+
+import bootstrap
+
+
+def make_rows(count: int, invalid_ratio: float = 0.1, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        row = {
+            "label_text": f"M{rng.choice((2, 3, 4, 5, 6, 8))}x{rng.randint(4, 60)}",
+            "bin_span": str(rng.randint(1, 6)),
+            "picto_inner_diameter": str(rng.uniform(1.0, 8.0)),
+            "picto_outer_diameter": str(rng.uniform(2.0, 14.0)),
+        }
+        if rng.random() < invalid_ratio:
+            row["bin_span"] = rng.choice(("0", "-1", "wide"))
+        rows.append(row)
+    return rows
+
+
+def run(rows: int, repeat: int = 5) -> dict:
+    schema_registry = bootstrap.load_addin("lib.schema_registry")
+    schema_validator = bootstrap.load_addin("lib.schema_validator")
+    batch = bootstrap.load_addin("lib.batch")
+
+    schema = schema_registry.parse_schema(
+        bootstrap.LABEL_SCHEMA, json.loads(bootstrap.LABEL_SCHEMA.read_text()))
+    validator = schema_validator.compile_schema(
+        schema, exclude=batch.DOCUMENT_FIELDS, coerce=True, defaults=True,
+        allow_unknown=False)
+
+    data = make_rows(rows)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = validator.validate_many(data)
+        best = min(best, time.perf_counter() - start)
+    return {
+        "rows": rows,
+        "invalid": sum(not r.ok for r in results),
+        "seconds": best,
+        "rows_per_second": rows / best,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    result = run(args.rows, args.repeat)
+    print(f"{result['rows']} rows ({result['invalid']} invalid) in "
+          f"{result['seconds']:.3f}s: {result['rows_per_second']:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
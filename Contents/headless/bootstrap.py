@@ -0,0 +1,95 @@
+"""Make the add-in importable outside of Fusion 360.
+
+The headless scripts in this directory run as plain Python scripts, so this
+directory (and with it the stand-in `adsk` package) is first on `sys.path`.
+`load_addin` additionally puts the add-in's parent directory on the path and
+imports the add-in folder as a package, so its relative imports keep working.
+"""
+
+import importlib
+import json
+import pathlib
+import sys
+
+HEADLESS_DIR = pathlib.Path(__file__).resolve().parent
+ADDIN_DIR = HEADLESS_DIR.parent
+LABEL_SCHEMA = ADDIN_DIR.joinpath(
+    "res", "schema", "label_document_parameters_schema.json")
+BIN_SCHEMA = ADDIN_DIR.joinpath(
+    "res", "schema", "bin_document_parameters_schema.json")
+
+
+def load_addin(module: str = ""):
+    """Import the add-in package, or one of its modules.
+
+    Args:
+        module (str): dotted module path relative to the add-in, e.g. `lib.batch`.
+    """
+    for path in (str(HEADLESS_DIR), str(ADDIN_DIR.parent)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    name = ADDIN_DIR.name + (f".{module}" if module else "")
+    return importlib.import_module(name)
+
+
+def make_label_design(extra_parameters: int = 0, recompute_cost: float = 0.0,
+                      parameter_costs: dict = None):
+    """Create a simulated label design and make it the active product.
+
+    The design holds every parameter of the label schema at its default value,
+    plus `extra_parameters` model parameters that the add-in never touches.
+    `parameter_costs` adds seconds to a recompute per changed parameter.
+    """
+    import adsk.core
+    import adsk.fusion
+
+    design = adsk.fusion.Design(recompute_cost, parameter_costs)
+    schema = json.loads(LABEL_SCHEMA.read_text())
+    _add_schema_parameters(design, schema["properties"])
+    for i in range(extra_parameters):
+        design.add_parameter(f"d{i + 1}", "1 mm", "mm")
+
+    adsk.core.Application.get().activeProduct = design
+    return design
+
+
+def make_bin_design():
+    """Create a simulated bin design and make it the active product.
+
+    The design holds every parameter of the bin schema at its default value.
+    Booleans are unitless numbers, as Fusion 360 has no boolean parameters.
+    """
+    import adsk.core
+    import adsk.fusion
+
+    design = adsk.fusion.Design()
+    schema = json.loads(BIN_SCHEMA.read_text())
+    _add_schema_parameters(design, schema["schema"])
+    adsk.core.Application.get().activeProduct = design
+    return design
+
+
+def write_stl(fp: pathlib.Path, boxes: list) -> pathlib.Path:
+    """Write a binary STL of axis aligned boxes, each a `(low, high)` corner pair."""
+    import adsk.fusion
+
+    triangles = [t for low, high in boxes for t in adsk.fusion._box(low, high)]
+    fp = pathlib.Path(fp)
+    fp.write_bytes(adsk.fusion._stl(triangles))
+    return fp
+
+
+def _add_schema_parameters(design, properties: dict):
+    for name, prop in properties.items():
+        name = prop.get("document_parameter_name", name)
+        const = prop.get("const", (prop.get("accepted-values") or [None])[0])
+        if name == "gla_id":
+            design.add_parameter(name, f"'{const}'", comment=const)
+        elif prop["type"] == "string":
+            design.add_parameter(name, f"'{prop['default']}'")
+        else:
+            unit = "" if prop["unit"] == "unitless" else prop["unit"]
+            default = prop["default"]
+            if isinstance(default, bool):
+                default = int(default)
+            design.add_parameter(name, f"{default} {unit}".strip(), unit)
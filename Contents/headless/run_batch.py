@@ -0,0 +1,150 @@
+"""Run a batch manifest against a simulated label design.
+
+Usage:
+    python headless/run_batch.py manifest.csv --output-dir out --recompute-cost 0.05
+    python headless/run_batch.py --family socket_head --sizes M3 M4 --output-dir out
+    python headless/run_batch.py manifest.csv --cost-model costs.json --parameter-cost bin_span=0.2
+    python headless/run_batch.py manifest.csv --proof proof.svg --proof-only
+    python headless/run_batch.py manifest.csv --qa --qa-report qa.json
+
+Prints the batch summary and optionally writes the full report as JSON, which
+makes it possible to measure batch throughput outside of Fusion 360.
+"""
+
+import argparse
+import json
+
+import bootstrap
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", nargs="?", help="CSV or JSON manifest of label rows.")
+    parser.add_argument("--family", help="Generate the rows for a screw family instead.")
+    parser.add_argument("--sizes", nargs="*", help="Sizes of --family, e.g. M3 M4.")
+    parser.add_argument("--output-dir", default="headless_output")
+    parser.add_argument("--recompute-cost", type=float, default=0.0,
+                        help="Simulated seconds per design recompute.")
+    parser.add_argument("--parameter-cost", action="append", default=[], metavar="NAME=SECONDS",
+                        help="Simulated extra seconds of a recompute after NAME changed.")
+    parser.add_argument("--cost-model", help="Learned cost model, read and updated.")
+    parser.add_argument("--manifest-order", action="store_true",
+                        help="Apply the rows in manifest order; only predict the time.")
+    parser.add_argument("--extra-parameters", type=int, default=0,
+                        help="Model parameters added to the simulated design.")
+    parser.add_argument("--cache-dir", help="Reuse exported labels from this cache.")
+    parser.add_argument("--journal", help="Checkpoint journal; resumes an interrupted run.")
+    parser.add_argument("--report", help="Write the batch report to this JSON file.")
+    parser.add_argument("--plates-dir", help="Also pack the labels into 3MF plates here.")
+    parser.add_argument("--bed", default="prusa_mk4", help="Printer bed to pack plates for.")
+    parser.add_argument("--proof", help="Write a contact sheet of the labels to this SVG file.")
+    parser.add_argument("--proof-only", action="store_true",
+                        help="Only write the contact sheet, don't run the batch.")
+    parser.add_argument("--proof-cache", help="JSONL file caching the drawn label tiles.")
+    parser.add_argument("--proof-workers", type=int, default=1,
+                        help="Processes drawing uncached tiles.")
+    parser.add_argument("--qa", action="store_true",
+                        help="Check the exported meshes against their parameters (needs NumPy).")
+    parser.add_argument("--qa-report", help="Write the mesh QA report to this JSON file.")
+    parser.add_argument("--qa-workers", type=int, help="Threads checking meshes.")
+    args = parser.parse_args(argv)
+
+    parameter_costs = {}
+    for cost in args.parameter_cost:
+        name, _, seconds = cost.partition("=")
+        parameter_costs[name] = float(seconds)
+    design = bootstrap.make_label_design(
+        args.extra_parameters, args.recompute_cost, parameter_costs)
+    design_parameters = bootstrap.load_addin("lib.design_parameters")
+    schema_registry = bootstrap.load_addin("lib.schema_registry")
+    batch = bootstrap.load_addin("lib.batch")
+    export_cache = bootstrap.load_addin("lib.export_cache")
+    batch_journal = bootstrap.load_addin("lib.batch_journal")
+    batch_schedule = bootstrap.load_addin("lib.batch_schedule")
+
+    schema_registry.registry.load_all()
+    design_params = design_parameters.DesignParameters(design)
+    schema = schema_registry.registry.for_parameters(design_params.parameters)
+    if schema is None:
+        parser.error("the simulated design has no known gla_id")
+    cache = export_cache.ExportCache(args.cache_dir) if args.cache_dir else None
+    journal = batch_journal.BatchJournal(args.journal) if args.journal else None
+    model = batch_schedule.CostModel.load(args.cost_model) if args.cost_model else None
+    scheduler = batch_schedule.BatchScheduler(schema, model, reorder=not args.manifest_order)
+    engine = batch.BatchEngine(
+        design_params, schema, args.output_dir, cache=cache, journal=journal,
+        scheduler=scheduler)
+    if args.family:
+        fastener_family = bootstrap.load_addin("lib.fastener_family")
+        rows = fastener_family.generate(args.family, schema, sizes=args.sizes)
+    elif args.manifest:
+        rows = batch.read_manifest(args.manifest)
+    else:
+        parser.error("a manifest or --family is required")
+    if args.proof:
+        rows = list(rows)
+        write_proof(engine, rows, args.proof, args.proof_cache, args.proof_workers)
+        if args.proof_only:
+            return
+    report = engine.run(rows)
+
+    print(report.summary())
+    print(f"{design.recompute_count} recomputes")
+    print(f"Cost model: {scheduler.model.stats()}")
+    if args.cost_model:
+        scheduler.model.save(args.cost_model)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(), f, indent=2)
+    if args.qa or args.qa_report:
+        check_meshes(engine, report, args.qa_report, args.qa_workers)
+    if args.plates_dir:
+        write_plates(report, args.plates_dir, args.bed)
+
+
+def write_proof(engine, rows: list, fp: str, cache_fp: str, workers: int):
+    label_proof = bootstrap.load_addin("lib.label_proof")
+
+    # Validated like the batch, captioned with the output file names.
+    plan = engine.plan(rows)
+    labels = [(engine.output_path(item).name, item.params) for item in plan.items]
+    sheet = label_proof.render_sheet(
+        fp, labels, cache=label_proof.TileCache(cache_fp), workers=workers)
+    print(f"Proof sheet {fp}: {sheet.summary()}")
+    for caption, warning in sheet.warnings:
+        print(f"  {caption}: {warning}")
+
+
+def check_meshes(engine, report, fp: str, workers: int):
+    mesh_qa = bootstrap.load_addin("lib.mesh_qa")
+
+    labels = [(item.output_path, item.params) for item in report.completed]
+    qa = mesh_qa.check_meshes(labels, workers)
+    print(f"Mesh QA: {qa.summary()}")
+    for check in qa.failed:
+        print(f"  {check.caption}: {'; '.join(check.problems.values())}")
+    if fp:
+        with open(fp, "w", encoding="utf-8") as f:
+            json.dump(qa.to_dict(), f, indent=2)
+
+
+def write_plates(report, output_dir: str, bed: str):
+    plate_packing = bootstrap.load_addin("lib.plate_packing")
+    plate_3mf = bootstrap.load_addin("commands.generateLabel.plate_3mf")
+
+    # Every manifest row is a label to print, repeats included.
+    labels, mesh_paths = [], []
+    for item in report.completed:
+        for _ in item.rows:
+            labels.append(item.params)
+            mesh_paths.append(item.output_path)
+    packing = plate_packing.pack_labels(labels, plate_packing.BED_PROFILES[bed])
+    reports = plate_3mf.package_plates(output_dir, packing, mesh_paths)
+    print(f"{len(labels)} labels on {packing.plates} plates "
+          f"({packing.utilization:.0%} of the bed used)")
+    for r in reports:
+        print(f"{r.path.name}: {r.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+"""Benchmark suite run against a simulated label design.
+
+Usage:
+    python headless/run_benchmarks.py --output results.json
+    python headless/run_benchmarks.py --compare last_release.json
+
+Every benchmark reports a primary `value` with its `unit` and whether lower or
+higher is `better`, plus details. Results are written as JSON; with `--compare`
+any primary value that got worse by more than `--tolerance` is reported and
+the script exits with status 1.
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import bootstrap
+import bench_schema_validator
+
+
+def _summary(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max": samples[-1],
+    }
+
+
+def _result(value: float, unit: str, better: str, **details) -> dict:
+    return {"value": value, "unit": unit, "better": better, **details}
+
+
+# Imports and starts the add-in in a fresh interpreter, as Fusion 360 does.
+_START_SCRIPT = """
+import json, sys, time
+import bootstrap
+start = time.perf_counter()
+main = bootstrap.load_addin("GridfinityLabelAutogen")
+imported = time.perf_counter()
+main.run(None)
+done = time.perf_counter()
+print("RESULT", json.dumps({
+    "import": imported - start,
+    "run": done - imported,
+    "entry_imported": any(m.endswith(".entry") for m in sys.modules),
+}))
+"""
+
+
+def bench_addin_start(opts) -> dict:
+    """Time to import and run the add-in; command modules must stay unloaded."""
+    samples = []
+    for _ in range(opts.starts):
+        output = subprocess.run(
+            [sys.executable, "-c", _START_SCRIPT], cwd=bootstrap.HEADLESS_DIR,
+            capture_output=True, text=True, check=True).stdout
+        line = next(l for l in output.splitlines() if l.startswith("RESULT "))
+        samples.append(json.loads(line[len("RESULT "):]))
+    total = [s["import"] + s["run"] for s in samples]
+    return _result(
+        _summary(total)["p50"], "s", "lower", latency=_summary(total),
+        run=_summary([s["run"] for s in samples])["p50"],
+        entry_imported=any(s["entry_imported"] for s in samples))
+
+
+def bench_dialog_open(opts) -> dict:
+    """Latency of `get_and_validate_design_parameters` when the dialog opens."""
+    entry = bootstrap.load_addin("commands.generateLabel.entry")
+    design = bootstrap.make_label_design(opts.parameters, opts.recompute_cost)
+    samples = []
+    api_calls = 0
+    for _ in range(opts.iterations):
+        design.api_calls = 0
+        start = time.perf_counter()
+        design_params, _ = entry.get_and_validate_design_parameters()
+        samples.append(time.perf_counter() - start)
+        api_calls = design.api_calls
+        assert design_params is not None
+    stats = _summary(samples)
+    return _result(stats["p50"], "s", "lower", latency=stats, api_calls=api_calls)
+
+
+def _open_command(entry):
+    import adsk.core
+    command = adsk.core.Command()
+    entry.command_created(adsk.core.CommandCreatedEventArgs(command=command))
+    return command
+
+
+def bench_preview(opts) -> dict:
+    """Latency of a preview, including the rollback of the previous one."""
+    entry = bootstrap.load_addin("commands.generateLabel.entry")
+    design = bootstrap.make_label_design(opts.parameters, opts.recompute_cost)
+    command = _open_command(entry)
+    spinner = command.commandInputs.itemById("bin_span_spinner")
+
+    samples = []
+    for i in range(opts.iterations):
+        spinner.value = 1 + (i // 2) % 6
+        start = time.perf_counter()
+        command.doExecutePreview()
+        samples.append(time.perf_counter() - start)
+    recomputes = design.recompute_count
+    # OK keeps the last preview, without an execute event.
+    pipeline = entry.preview
+    command.doExecute()
+    return _result(
+        _summary(samples)["p50"], "s", "lower", latency=_summary(samples),
+        previews=pipeline.stats(), recomputes=recomputes,
+        recomputes_on_ok=design.recompute_count - recomputes)
+
+
+def bench_preview_burst(opts) -> dict:
+    """Time until the previews of a burst of spinner clicks are shown."""
+    import adsk.core
+    entry = bootstrap.load_addin("commands.generateLabel.entry")
+    design = bootstrap.make_label_design(opts.parameters, opts.recompute_cost)
+    command = _open_command(entry)
+
+    start = time.perf_counter()
+    for i in range(opts.burst):
+        command.change_input("bin_span_spinner", 2 + i % 5)
+    seconds = time.perf_counter() - start
+    stats = entry.preview.stats()
+    entry.command_destroy(adsk.core.CommandEventArgs(command=command))
+    return _result(seconds, "s", "lower", clicks=opts.burst, previews=stats,
+                   recomputes=design.recompute_count)
+
+
+def bench_schema_load(opts) -> dict:
+    """Schemas parsed per second by a fresh registry."""
+    schema_registry = bootstrap.load_addin("lib.schema_registry")
+    start = time.perf_counter()
+    loads = 0
+    for _ in range(opts.iterations):
+        registry = schema_registry.SchemaRegistry()
+        registry.load_all()
+        loads += registry.load_count
+    seconds = time.perf_counter() - start
+
+    registry = schema_registry.SchemaRegistry()
+    registry.load_all()
+    lookups = 100000
+    start = time.perf_counter()
+    for _ in range(lookups):
+        registry.get("gridfinity_label_parametric")
+    lookup_seconds = time.perf_counter() - start
+    return _result(loads / seconds, "schemas/s", "higher",
+                   lookup_seconds=lookup_seconds / lookups)
+
+
+def bench_schema_validate(opts) -> dict:
+    """Manifest rows validated per second."""
+    result = bench_schema_validator.run(opts.rows)
+    return _result(result["rows_per_second"], "rows/s", "higher", **result)
+
+
+def bench_catalog_search(opts) -> dict:
+    """Search latency while typing, in a catalog scaled to `--catalog-size`."""
+    label_catalog = bootstrap.load_addin("lib.label_catalog")
+    sample = label_catalog.load_catalog()
+    copies = max(1, opts.catalog_size // len(sample))
+    entries = [(f"{e.name} {i}", e.category, e.params)
+               for i in range(copies) for e in sample.entries]
+    start = time.perf_counter()
+    catalog = label_catalog.LabelCatalog(entries)
+    build_seconds = time.perf_counter() - start
+
+    samples = []
+    for e in sample.entries[::max(1, len(sample) // 20)]:
+        # Every keystroke of the entry name is a query.
+        for n in range(1, len(e.name) + 1):
+            start = time.perf_counter()
+            catalog.search(e.name[:n])
+            samples.append(time.perf_counter() - start)
+    stats = _summary(samples)
+    return _result(stats["p95"], "s", "lower", latency=stats,
+                   entries=len(catalog), build_seconds=build_seconds)
+
+
+def bench_handler_dispatch(opts) -> dict:
+    """Overhead of an `add_handler` handler over calling the callback directly."""
+    import adsk.core
+    futil = bootstrap.load_addin("lib.fusionAddInUtils")
+    event = adsk.core.CommandEvent("benchmark")
+    calls = []
+    callback = calls.append
+    futil.add_handler(event, callback, scope=futil.handler_scope("benchmark"))
+    args = adsk.core.CommandEventArgs()
+    count = opts.iterations * 100
+
+    start = time.perf_counter()
+    for _ in range(count):
+        callback(args)
+    direct = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(count):
+        event.fire(args)
+    dispatched = time.perf_counter() - start
+    futil.release_scope("benchmark")
+    return _result((dispatched - direct) / count, "s", "lower",
+                   direct=direct / count, dispatched=dispatched / count)
+
+
+def bench_dialog_sessions(opts) -> dict:
+    """Time to open and close the dialog; handlers must not outlive a session."""
+    import adsk.core
+    entry = bootstrap.load_addin("commands.generateLabel.entry")
+    futil = bootstrap.load_addin("lib.fusionAddInUtils")
+    bootstrap.make_label_design(opts.parameters, opts.recompute_cost)
+    live_before = futil.handler_stats()["live"]
+    start = time.perf_counter()
+    for _ in range(opts.iterations):
+        command = _open_command(entry)
+        command.destroy.fire(adsk.core.CommandEventArgs(command=command))
+    seconds = time.perf_counter() - start
+    stats = futil.handler_stats()
+    return _result(seconds / opts.iterations, "s", "lower",
+                   leaked_handlers=stats["live"] - live_before,
+                   handler_classes=stats["handler_classes"])
+
+
+def _run_background_batch(entry, app, manifest: str, output_dir: str, cancel_after: int = None):
+    """Start a batch from the Batch Labels button and run the event loop until it ends."""
+    import adsk.core
+    app.userInterface.dialog_answers = [manifest, output_dir]
+    command = adsk.core.Command()
+    entry.command_created(adsk.core.CommandCreatedEventArgs(command=command))
+    command.execute.fire(adsk.core.CommandEventArgs(command=command))
+    command.destroy.fire(adsk.core.CommandEventArgs(command=command))
+    runner = entry.runner
+    palette = entry.palette
+    start = time.perf_counter()
+    while not runner.progress.finished or runner.running or runner._messages.qsize():
+        app.process_events(timeout=0.05)
+        if cancel_after is not None and runner.progress.done >= cancel_after:
+            palette.send_from_html("cancel")
+            cancel_after = None
+    return runner, time.perf_counter() - start
+
+
+def bench_background_batch(opts) -> dict:
+    """Longest main thread stall of a background batch, against a synchronous run."""
+    import adsk.core
+    config = bootstrap.load_addin("config")
+    batch = bootstrap.load_addin("lib.batch")
+    design_parameters = bootstrap.load_addin("lib.design_parameters")
+    schema_registry = bootstrap.load_addin("lib.schema_registry")
+    entry = bootstrap.load_addin("commands.batchLabels.entry")
+    app = adsk.core.Application.get()
+    rows = [{"label_text": f"M{3 + i % 5}x{4 + i}", "bin_span": 1 + i % 3}
+            for i in range(opts.batch_size)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = f"{tmp}/manifest.json"
+        with open(manifest, "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+        config.BATCH_COST_MODEL = f"{tmp}/costs.json"
+
+        # Synchronous: the main thread is blocked for the whole batch.
+        design = bootstrap.make_label_design(opts.parameters, opts.recompute_cost)
+        design_params = design_parameters.DesignParameters(design)
+        schema = schema_registry.registry.for_parameters(design_params.parameters)
+        engine = batch.BatchEngine(design_params, schema, f"{tmp}/sync")
+        start = time.perf_counter()
+        engine.run(rows)
+        sync_seconds = time.perf_counter() - start
+
+        # Each background batch starts with an empty export cache.
+        config.BATCH_CACHE_DIR = f"{tmp}/cache"
+        bootstrap.make_label_design(opts.parameters, opts.recompute_cost)
+        runner, seconds = _run_background_batch(entry, app, manifest, f"{tmp}/background")
+        report = runner.report
+        sent = len(entry.palette.sent)
+
+        # Cancelled from the palette halfway through.
+        config.BATCH_CACHE_DIR = f"{tmp}/cancelled_cache"
+        entry.cache = None
+        bootstrap.make_label_design(opts.parameters, opts.recompute_cost)
+        cancelled, _ = _run_background_batch(
+            entry, app, manifest, f"{tmp}/cancelled", cancel_after=opts.batch_size // 2)
+        entry.stop()
+        entry.cache = None
+
+    return _result(
+        runner.max_event_seconds, "s", "lower",
+        items=len(report.items), exported=len(report.completed),
+        seconds=seconds, sync_seconds=sync_seconds,
+        events=runner.events, palette_updates=sent,
+        cancelled_exported=len(cancelled.report.completed),
+        cancelled=cancelled.report.cancelled)
+
+
+def bench_proof_sheet(opts) -> dict:
+    """Labels per second drawn on a proof sheet, cold, cached and after one edit."""
+    design_parameters = bootstrap.load_addin("lib.design_parameters")
+    fastener_family = bootstrap.load_addin("lib.fastener_family")
+    label_proof = bootstrap.load_addin("lib.label_proof")
+    schema_registry = bootstrap.load_addin("lib.schema_registry")
+    design = bootstrap.make_label_design(opts.parameters, opts.recompute_cost)
+    schema = schema_registry.registry.for_parameters(
+        design_parameters.DesignParameters(design).parameters)
+    family_rows = [row for name in fastener_family.FAMILIES
+                   for row in fastener_family.generate(name, schema)]
+    labels = [(f"{i:05d}", dict(row, label_text=f"{row['label_text']} #{i // len(family_rows)}"))
+              for i, row in enumerate(family_rows * (-(-opts.proof_labels // len(family_rows))))]
+    labels = labels[:opts.proof_labels]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_fp = f"{tmp}/tiles.jsonl"
+        cold = label_proof.render_sheet(
+            f"{tmp}/cold.svg", labels, cache=label_proof.TileCache(cache_fp))
+        warm = label_proof.render_sheet(
+            f"{tmp}/warm.svg", labels, cache=label_proof.TileCache(cache_fp))
+        labels[0] = (labels[0][0], dict(labels[0][1], label_text="edited"))
+        edited = label_proof.render_sheet(
+            f"{tmp}/edited.svg", labels, cache=label_proof.TileCache(cache_fp))
+
+    return _result(
+        cold.tiles_per_second, "labels/s", "higher", labels=len(labels),
+        cold_seconds=cold.seconds, cached_seconds=warm.seconds,
+        edited_seconds=edited.seconds, edited_drawn=edited.rendered)
+
+
+def bench_mesh_qa(opts) -> dict:
+    """Triangles per second checked by the mesh QA of an exported batch."""
+    batch = bootstrap.load_addin("lib.batch")
+    design_parameters = bootstrap.load_addin("lib.design_parameters")
+    mesh_qa = bootstrap.load_addin("lib.mesh_qa")
+    schema_registry = bootstrap.load_addin("lib.schema_registry")
+    if not mesh_qa.available():
+        return _result(0.0, "triangles/s", "higher", skipped="NumPy is not installed")
+    rows = [{"label_text": f"M{3 + i % 5}x{4 + i}", "bin_span": 1 + i % 3}
+            for i in range(opts.batch_size)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        design = bootstrap.make_label_design(opts.parameters)
+        design_params = design_parameters.DesignParameters(design)
+        schema = schema_registry.registry.for_parameters(design_params.parameters)
+        report = batch.BatchEngine(design_params, schema, tmp).run(rows)
+        labels = [(item.output_path, item.params) for item in report.completed]
+        serial = mesh_qa.check_meshes(labels, workers=1)
+        threaded = mesh_qa.check_meshes(labels)
+
+    return _result(
+        threaded.throughput, "triangles/s", "higher", meshes=len(labels),
+        triangles=threaded.triangles, failed=len(threaded.failed),
+        seconds=threaded.seconds, workers=threaded.workers,
+        serial_seconds=serial.seconds)
+
+
+class _Record:
+    def __init__(self, expression: str, unit: str):
+        self.expression = expression
+        self.unit = unit
+
+
+def bench_expression_predict(opts) -> dict:
+    """Latency of predicting a parameter change in a tree of `--parameters` derived parameters."""
+    parameter_expressions = bootstrap.load_addin("lib.parameter_expressions")
+    # d0 is the root, every other parameter derives from its parent.
+    records = {"d0": _Record("10 mm", "mm")}
+    for i in range(1, opts.parameters):
+        records[f"d{i}"] = _Record(f"d{(i - 1) // 2} * 1.01 + 0.1 mm", "mm")
+    graph = parameter_expressions.ParameterGraph(records)
+    start = time.perf_counter()
+    for name in records:
+        graph.value(name)
+    load_seconds = time.perf_counter() - start
+
+    # A parameter halfway down the tree, as a label parameter with a few
+    # dependents would be.
+    name = f"d{opts.parameters // 8}"
+    samples = []
+    evaluations = 0
+    for i in range(opts.iterations):
+        graph.evaluations = 0
+        start = time.perf_counter()
+        graph.update({name: f"{1 + i % 10} mm"})
+        samples.append(time.perf_counter() - start)
+        evaluations = graph.evaluations
+    stats = _summary(samples)
+    return _result(stats["p50"], "s", "lower", latency=stats, parameters=len(records),
+                   evaluations=evaluations, load_seconds=load_seconds)
+
+
+BENCHMARKS = {
+    "addin_start": bench_addin_start,
+    "dialog_open": bench_dialog_open,
+    "preview": bench_preview,
+    "preview_burst": bench_preview_burst,
+    "schema_load": bench_schema_load,
+    "schema_validate": bench_schema_validate,
+    "catalog_search": bench_catalog_search,
+    "handler_dispatch": bench_handler_dispatch,
+    "dialog_sessions": bench_dialog_sessions,
+    "background_batch": bench_background_batch,
+    "proof_sheet": bench_proof_sheet,
+    "mesh_qa": bench_mesh_qa,
+    "expression_predict": bench_expression_predict,
+}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Names and changes of benchmarks that regressed against `baseline`."""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old or not old["value"]:
+            continue
+        change = result["value"] / old["value"] - 1.0
+        worse = change if result["better"] == "lower" else -change
+        if worse > tolerance:
+            regressions.append((name, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative slowdown before a regression is reported.")
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS))
+    parser.add_argument("--parameters", type=int, default=500,
+                        help="Model parameters of the simulated design.")
+    parser.add_argument("--recompute-cost", type=float, default=0.002,
+                        help="Simulated seconds per design recompute.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--starts", type=int, default=5,
+                        help="Add-in starts, each in a new interpreter.")
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--catalog-size", type=int, default=30000)
+    parser.add_argument("--proof-labels", type=int, default=2000,
+                        help="Labels on the sheet of the proof_sheet benchmark.")
+    parser.add_argument("--batch-size", type=int, default=200,
+                        help="Manifest rows of the background batch and the mesh QA.")
+    opts = parser.parse_args(argv)
+
+    # Keep handler logging out of the measurements.
+    bootstrap.load_addin("lib.fusionAddInUtils").set_level("", "WARNING")
+    bootstrap.load_addin("lib.schema_registry").registry.load_all()
+    results = {}
+    for name in opts.only or BENCHMARKS:
+        results[name] = BENCHMARKS[name](opts)
+        print(f"{name:18} {results[name]['value']:.6g} {results[name]['unit']}")
+
+    output = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "options": vars(opts),
+        },
+        "results": results,
+    }
+    baseline = None
+    if opts.compare:
+        with open(opts.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    with open(opts.output, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, opts.tolerance)
+        for name, change in regressions:
+            print(f"REGRESSION {name}: {change:+.1%}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Tests of `lib.batch_runner` against the stand-in event loop.
+
+Run with `python -m unittest discover -s headless` from the add-in folder.
+"""
+
+import tempfile
+import threading
+import time
+import unittest
+
+import bootstrap
+
+import adsk.core
+
+batch = bootstrap.load_addin("lib.batch")
+batch_runner = bootstrap.load_addin("lib.batch_runner")
+design_parameters = bootstrap.load_addin("lib.design_parameters")
+schema_registry = bootstrap.load_addin("lib.schema_registry")
+futil = bootstrap.load_addin("lib.fusionAddInUtils")
+
+EVENT_ID = "test_batch_step"
+
+
+class BackgroundBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        schema_registry.registry.load_all()
+        self.app = adsk.core.Application.get()
+        # Events left over from an earlier test.
+        self.app.process_events()
+        self.design = bootstrap.make_label_design()
+        self.design_params = design_parameters.DesignParameters(self.design)
+        self.schema = schema_registry.registry.for_parameters(self.design_params.parameters)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.output_dir = tmp.name
+        # (thread, events dispatched so far, bin_span and label_text of the
+        # design) of every export.
+        self.exports = []
+        # Called after every export, e.g. to cancel the batch.
+        self.on_export = None
+        self.runner = None
+
+    def tearDown(self):
+        if self.runner is not None:
+            self.runner.stop()
+
+    def export(self, design, path):
+        params = design.allParameters
+        self.exports.append((
+            threading.current_thread(), self.runner.events,
+            params.itemByName("bin_span").expression,
+            params.itemByName("label_text").expression))
+        batch.export_stl(design, path)
+        if self.on_export is not None:
+            self.on_export()
+
+    def start(self, rows, **kwargs) -> batch_runner.BackgroundBatch:
+        engine = batch.BatchEngine(
+            self.design_params, self.schema, self.output_dir, exporter=self.export,
+            check_text_fit=False)
+        self.runner = batch_runner.BackgroundBatch(engine, rows, EVENT_ID, **kwargs)
+        self.runner.start()
+        return self.runner
+
+    def run_events(self, runner: batch_runner.BackgroundBatch):
+        while runner.report is None or EVENT_ID in self.app._custom_events:
+            self.app.process_events(timeout=0.05)
+
+    def rows(self, count: int) -> list:
+        return [{"bin_span": 1 + i % 3, "label_text": f"label {i}"} for i in range(count)]
+
+    def test_updates_run_on_the_main_thread_one_per_event(self):
+        runner = self.start(self.rows(5))
+        self.run_events(runner)
+
+        self.assertEqual(len(runner.report.completed), 5)
+        self.assertTrue(all(e[0] is threading.main_thread() for e in self.exports))
+        # Each export happened in an event of its own, the last event
+        # reports the end of the batch.
+        self.assertEqual([e[1] for e in self.exports], [0, 1, 2, 3, 4])
+        self.assertEqual(runner.events, 6)
+        self.assertTrue(runner.progress.finished)
+
+    def test_cancel_stops_after_the_item_in_flight(self):
+        finished = []
+        runner = self.start(self.rows(5), on_finished=finished.append)
+        self.on_export = runner.cancel
+        self.run_events(runner)
+
+        self.assertEqual(len(self.exports), 1)
+        self.assertEqual(len(runner.report.completed), 1)
+        self.assertTrue(runner.report.cancelled)
+        self.assertTrue(runner.progress.cancelled)
+        self.assertEqual(finished, [runner.report])
+
+    def test_stop_drains_pending_items(self):
+        runner = self.start(self.rows(5))
+        # Wait until the worker has handed the first item to the main thread.
+        for _ in range(200):
+            if not self.app._event_queue.empty():
+                break
+            time.sleep(0.01)
+        runner.stop()
+
+        self.assertFalse(runner.running)
+        self.assertEqual(len(self.exports), 1)
+        self.assertIs(self.exports[0][0], threading.main_thread())
+        self.assertTrue(runner.report.cancelled)
+        self.assertEqual(len(runner.report.completed), 1)
+        self.assertNotIn(EVENT_ID, self.app._custom_events)
+        self.assertNotIn(EVENT_ID, futil.handler_stats()["scopes"])
+
+    def test_reads_parameters_again_after_a_user_edit(self):
+        def user_edit(progress):
+            # The user changes bin_span before the second item is applied.
+            if progress.current == "b":
+                self.design.allParameters.itemByName("bin_span").expression = "3"
+                self.app.userInterface.commandTerminated.fire(
+                    adsk.core.ApplicationCommandEventArgs(
+                        commandId="FusionChangeParametersCommand",
+                        terminationReason=adsk.core.TerminationReasons.CompletedTerminationReason))
+
+        runner = self.start([{"bin_span": 2, "label_text": "a"},
+                             {"bin_span": 2, "label_text": "b"}], on_progress=user_edit)
+        self.run_events(runner)
+
+        self.assertEqual(len(runner.report.completed), 2)
+        self.assertEqual([e[2] for e in self.exports], ["2", "2"])
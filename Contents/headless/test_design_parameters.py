@@ -0,0 +1,97 @@
+"""Tests of the lazy parameter reads of `lib.design_parameters`.
+
+Run with `python -m unittest discover -s headless` from the add-in folder.
+"""
+
+import unittest
+
+import bootstrap
+
+import adsk.core
+
+design_parameters = bootstrap.load_addin("lib.design_parameters")
+futil = bootstrap.load_addin("lib.fusionAddInUtils")
+
+SCOPE = "test_design_parameters"
+
+
+class ParameterViewTest(unittest.TestCase):
+
+    def setUp(self):
+        self.design = bootstrap.make_label_design(extra_parameters=500)
+        self.design.api_calls = 0
+        self.params = design_parameters.DesignParameters(self.design)
+
+    def test_nothing_is_read_up_front(self):
+        self.assertEqual(self.design.api_calls, 0)
+        self.assertEqual(len(self.params.parameters), 0)
+
+    def test_each_attribute_is_read_once(self):
+        view = self.params.parameters
+        record = view["bin_span"]
+        self.assertEqual(self.design.api_calls, 1)
+        self.assertEqual(record.expression, "1.0")
+        self.assertEqual(record.expression, "1.0")
+        self.assertEqual(record.value, 1.0)
+        self.assertEqual(self.design.api_calls, 3)
+        self.assertIs(view["bin_span"], record)
+        self.assertEqual(self.design.api_calls, view.api_calls)
+
+    def test_missing_parameter_is_looked_up_once(self):
+        view = self.params.parameters
+        self.assertNotIn("missing", view)
+        self.assertIsNone(view.get("missing"))
+        with self.assertRaises(KeyError):
+            view["missing"]
+        self.assertEqual(self.design.api_calls, 1)
+        self.assertEqual(list(view), [])
+
+    def test_iterates_the_parameters_read_so_far(self):
+        view = self.params.parameters
+        view.get("label_text")
+        view.get("bin_span")
+        view.get("missing")
+        self.assertEqual(list(view), ["label_text", "bin_span"])
+        self.assertEqual(len(view), 2)
+
+    def test_invalidate_reads_again(self):
+        record = self.params.parameters["bin_span"]
+        self.assertEqual(record.value, 1.0)
+        self.design.allParameters.itemByName("bin_span").expression = "4"
+        self.assertEqual(self.params.parameters["bin_span"].value, 1.0)
+
+        self.params.invalidate()
+        self.assertEqual(self.params.parameters["bin_span"].value, 4.0)
+
+
+class WatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = adsk.core.Application.get()
+        self.design = bootstrap.make_label_design()
+        self.params = design_parameters.DesignParameters(self.design)
+        self.params.watch(futil.handler_scope(SCOPE))
+        self.addCleanup(futil.release_scope, SCOPE)
+        self.assertEqual(self.params.parameters["bin_span"].value, 1.0)
+        self.design.allParameters.itemByName("bin_span").expression = "2"
+
+    def terminate(self, reason):
+        self.app.userInterface.commandTerminated.fire(adsk.core.ApplicationCommandEventArgs(
+            commandId="FusionChangeParametersCommand", terminationReason=reason))
+
+    def test_completed_command_invalidates(self):
+        self.terminate(adsk.core.TerminationReasons.CompletedTerminationReason)
+        self.assertEqual(self.params.parameters["bin_span"].value, 2.0)
+
+    def test_cancelled_command_keeps_the_cache(self):
+        self.terminate(adsk.core.TerminationReasons.CancelledTerminationReason)
+        self.assertEqual(self.params.parameters["bin_span"].value, 1.0)
+
+    def test_activated_document_invalidates(self):
+        self.app.documentActivated.fire(adsk.core.DocumentEventArgs(document=None))
+        self.assertEqual(self.params.parameters["bin_span"].value, 2.0)
+
+    def test_released_scope_stops_watching(self):
+        futil.release_scope(SCOPE)
+        self.app.documentActivated.fire(adsk.core.DocumentEventArgs(document=None))
+        self.assertEqual(self.params.parameters["bin_span"].value, 1.0)
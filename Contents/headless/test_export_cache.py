@@ -0,0 +1,138 @@
+"""Tests of `lib.export_cache` and its use by `lib.batch`.
+
+Run with `python -m unittest discover -s headless` from the add-in folder.
+"""
+
+import os
+import pathlib
+import tempfile
+import unittest
+
+import bootstrap
+
+batch = bootstrap.load_addin("lib.batch")
+design_parameters = bootstrap.load_addin("lib.design_parameters")
+export_cache = bootstrap.load_addin("lib.export_cache")
+schema_registry = bootstrap.load_addin("lib.schema_registry")
+
+
+class ExportCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = pathlib.Path(tmp.name)
+        self.cache_dir = self.tmp.joinpath("cache")
+
+    def export(self, name: str, size: int) -> pathlib.Path:
+        path = self.tmp.joinpath(name)
+        path.write_bytes(name.encode()[:1] * size)
+        return path
+
+    def test_fetch_copies_a_stored_file(self):
+        cache = export_cache.ExportCache(self.cache_dir)
+        key = export_cache.parameters_key({"bin_span": 2, "label_text": "M3"}, "design")
+        self.assertFalse(cache.fetch(key, self.tmp.joinpath("out.stl")))
+
+        cache.put(key, self.export("a.stl", 10))
+        out = self.tmp.joinpath("out.stl")
+        self.assertTrue(cache.fetch(key, out))
+        self.assertEqual(out.read_bytes(), b"a" * 10)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        # Another suffix is another file.
+        self.assertFalse(cache.fetch(key, self.tmp.joinpath("out.3mf")))
+
+    def test_key_depends_on_parameters_and_design(self):
+        key = export_cache.parameters_key
+        self.assertEqual(key({"a": 1, "b": "x"}, "d"), key({"b": "x", "a": 1}, "d"))
+        self.assertNotEqual(key({"a": 1}, "d"), key({"a": 2}, "d"))
+        self.assertNotEqual(key({"a": 1}, "d"), key({"a": 1}, "e"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = export_cache.ExportCache(self.cache_dir, max_bytes=25)
+        cache.put("a", self.export("a.stl", 10))
+        cache.put("b", self.export("b.stl", 10))
+        self.assertIsNotNone(cache.get("a", ".stl"))
+        cache.put("c", self.export("c.stl", 10))
+
+        self.assertIsNone(cache.get("b", ".stl"))
+        self.assertIsNotNone(cache.get("a", ".stl"))
+        self.assertIsNotNone(cache.get("c", ".stl"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.size, 20)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["a.stl", "c.stl"])
+
+    def test_entries_survive_a_restart(self):
+        cache = export_cache.ExportCache(self.cache_dir)
+        cache.put("a", self.export("a.stl", 10))
+        # Left behind by a write that was interrupted.
+        self.cache_dir.joinpath(".b.stl.1.tmp").write_bytes(b"b")
+
+        cache = export_cache.ExportCache(self.cache_dir)
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.assertIsNotNone(cache.get("a", ".stl"))
+        self.assertFalse(self.cache_dir.joinpath(".b.stl.1.tmp").exists())
+
+
+class DesignDigestTest(unittest.TestCase):
+
+    def setUp(self):
+        schema_registry.registry.load_all()
+        self.design = bootstrap.make_label_design(extra_parameters=100)
+        self.params = design_parameters.DesignParameters(self.design)
+        self.schema = schema_registry.registry.for_parameters(self.params.parameters)
+
+    def digest(self) -> str:
+        return export_cache.design_digest(
+            self.design, self.params.parameters, self.schema, batch.DOCUMENT_FIELDS)
+
+    def test_reads_no_model_parameter(self):
+        self.design.api_calls = 0
+        self.digest()
+        # The expression of `gla_id`, found when the schema was looked up.
+        self.assertEqual(self.design.api_calls, 1)
+        self.assertEqual(list(self.params.parameters), ["gla_id"])
+
+    def test_label_fields_leave_the_digest_as_it_is(self):
+        digest = self.digest()
+        self.params.update_parameter_expressions({"bin_span": "3", "label_text": "'M3'"})
+        self.assertEqual(self.digest(), digest)
+
+    def test_saved_version_changes_the_digest(self):
+        digest = self.digest()
+        self.design.parentDocument.dataFile = _DataFile("urn:label", 12)
+        saved = self.digest()
+        self.assertNotEqual(saved, digest)
+        self.design.parentDocument.dataFile = _DataFile("urn:label", 13)
+        self.assertNotEqual(self.digest(), saved)
+
+
+class _DataFile:
+    def __init__(self, id: str, versionNumber: int):
+        self.id = id
+        self.versionNumber = versionNumber
+
+
+class CachedBatchTest(unittest.TestCase):
+
+    def test_repeated_batch_is_served_from_the_cache(self):
+        schema_registry.registry.load_all()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache = export_cache.ExportCache(pathlib.Path(tmp.name, "cache"))
+        rows = [{"bin_span": 1 + i % 3, "label_text": f"M{i}"} for i in range(4)]
+
+        reports = []
+        for run in ("first", "second"):
+            design = bootstrap.make_label_design()
+            params = design_parameters.DesignParameters(design)
+            schema = schema_registry.registry.for_parameters(params.parameters)
+            engine = batch.BatchEngine(
+                params, schema, pathlib.Path(tmp.name, run), cache=cache, check_text_fit=False)
+            reports.append(engine.run(rows))
+
+        self.assertEqual(len(reports[0].cached), 0)
+        self.assertEqual(len(reports[1].cached), 4)
+        self.assertEqual(design.recompute_count, 0)
+        self.assertEqual(cache.stats()["stores"], 4)
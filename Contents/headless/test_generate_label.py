@@ -0,0 +1,102 @@
+"""Tests of the Generate Label dialog against the stand-in command events.
+
+Run with `python -m unittest discover -s headless` from the add-in folder.
+"""
+
+import unittest
+
+import bootstrap
+
+import adsk.core
+
+entry = bootstrap.load_addin("commands.generateLabel.entry")
+schema_registry = bootstrap.load_addin("lib.schema_registry")
+futil = bootstrap.load_addin("lib.fusionAddInUtils")
+
+
+class GenerateLabelTest(unittest.TestCase):
+
+    def setUp(self):
+        schema_registry.registry.load_all()
+        self.app = adsk.core.Application.get()
+        self.app.userInterface.messages.clear()
+        self.design = bootstrap.make_label_design()
+
+    def open_dialog(self) -> adsk.core.Command:
+        command = adsk.core.Command()
+        entry.command_created(adsk.core.CommandCreatedEventArgs(command=command))
+        # Releases the dialog's handlers if a test fails before OK.
+        self.addCleanup(futil.release_scope, entry.CMD_ID)
+        return command
+
+    def expression(self, name: str) -> str:
+        return self.design.allParameters.itemByName(name).expression
+
+    def test_ok_keeps_the_last_preview(self):
+        command = self.open_dialog()
+        command.change_input("bin_span_spinner", 3)
+        pipeline = entry.preview
+        recomputes = self.design.recompute_count
+
+        command.doExecute()
+
+        self.assertEqual(self.expression("bin_span"), "3")
+        self.assertEqual(self.design.recompute_count, recomputes)
+        self.assertEqual(pipeline.stats()["reused"], 1)
+        self.assertEqual(pipeline.stats()["executed"], 0)
+
+    def test_ok_after_a_rejected_preview_executes(self):
+        command = self.open_dialog()
+        command.change_input("bin_span_spinner", 2)
+        text_box = command.commandInputs.itemById("text_box")
+        text_box.text = "it's \"quoted\""
+        command.doExecutePreview()
+        pipeline = entry.preview
+        text_box.text = "M3"
+
+        command.doExecute()
+
+        self.assertEqual(self.expression("label_text"), "'M3'")
+        self.assertEqual(self.expression("bin_span"), "2")
+        self.assertEqual(pipeline.stats()["executed"], 1)
+        self.assertEqual(pipeline.stats()["reused"], 0)
+
+    def test_catalog_entry_fills_the_inputs(self):
+        command = self.open_dialog()
+        inputs = command.commandInputs
+        self.assertEqual(inputs.itemById("text_box").text, "[label_text]")
+
+        command.change_input("catalog_search", "m3x40 shcs")
+        results = inputs.itemById("catalog_results").listItems
+        self.assertEqual([results.item(i).name for i in range(results.count)],
+                         ["M3x40 socket head cap screw DIN 912"])
+        command.change_input("catalog_results", 0)
+
+        self.assertEqual(inputs.itemById("text_box").text, "M3x40 SHCS")
+        self.assertEqual(self.expression("label_text"), "'M3x40 SHCS'")
+        command.doExecute()
+        self.assertEqual(self.expression("label_text"), "'M3x40 SHCS'")
+
+    def test_bin_document_has_no_label_inputs(self):
+        self.design = bootstrap.make_bin_design()
+        command = self.open_dialog()
+        inputs = command.commandInputs
+
+        for input_id in ("text_box", "bin_span_spinner", "catalog_search", "catalog_results"):
+            self.assertIsNone(inputs.itemById(input_id), input_id)
+        self.assertIsNone(entry.catalog)
+        self.assertEqual(self.app.userInterface.messages, [])
+
+        args = adsk.core.ValidateInputsEventArgs(inputs=inputs)
+        command.validateInputs.fire(args)
+        self.assertTrue(args.areInputsValid)
+        command.doExecutePreview()
+        command.doExecute()
+        self.assertEqual(self.design.recompute_count, 0)
+
+    def test_document_without_schema_opens_no_dialog(self):
+        self.design.allParameters.itemByName("gla_id")._comment = "other"
+        command = self.open_dialog()
+        self.assertEqual(command.commandInputs.count, 0)
+        self.assertEqual(self.app.userInterface.messages,
+                         ["Please open an official GLA Fusion 360 Document."])
@@ -0,0 +1,93 @@
+"""Tests of the main thread handoff of `lib.fusionAddInUtils.log_utils`.
+
+The stand-in `Application.log` raises when it is called off the main thread.
+
+Run with `python -m unittest discover -s headless` from the add-in folder.
+"""
+
+import threading
+import unittest
+
+import bootstrap
+
+import adsk.core
+
+log_utils = bootstrap.load_addin("lib.fusionAddInUtils.log_utils")
+
+EVENT_ID = "test_log_console"
+
+
+def in_thread(target):
+    """Run `target` on a worker thread and wait for it."""
+    errors = []
+
+    def run():
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+class FusionConsoleSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = adsk.core.Application.get()
+        self.app.process_events()
+        self.sink = log_utils.FusionConsoleSink(EVENT_ID, debug=False)
+        self.addCleanup(self.sink.unregister)
+        self.since = len(self.app.log_records)
+
+    def logged(self) -> list:
+        return [(m, t) for m, _, t in self.app.log_records[self.since:]]
+
+    def lines(self, *texts, level=log_utils.ERROR) -> list:
+        return [(log_utils.LogRecord("test", level, t, ()), t) for t in texts]
+
+    def test_lines_of_a_worker_wait_for_the_event(self):
+        self.sink.register()
+        in_thread(lambda: self.sink.write(self.lines("failed")))
+        self.assertEqual(self.logged(), [])
+
+        self.assertEqual(self.app.process_events(), 1)
+        self.assertEqual(self.logged(), [("failed", adsk.core.LogTypes.FileLogType)])
+
+    def test_lines_before_register_are_kept(self):
+        in_thread(lambda: self.sink.write(self.lines("early")))
+        self.assertEqual(self.logged(), [])
+        # No event is fired before it is registered.
+        self.assertEqual(self.app.process_events(), 0)
+
+        self.sink.register()
+        self.assertEqual(self.logged(), [("early", adsk.core.LogTypes.FileLogType)])
+
+    def test_main_thread_writes_queued_lines_first(self):
+        in_thread(lambda: self.sink.write(self.lines("first")))
+        self.sink.write(self.lines("second"))
+        self.assertEqual([m for m, _ in self.logged()], ["first", "second"])
+
+    def test_console_lines_only_in_debug_or_forced(self):
+        record = log_utils.LogRecord("test", log_utils.INFO, "forced", (), force_console=True)
+        self.sink.write(self.lines("quiet", level=log_utils.INFO) + [(record, "forced")])
+        self.assertEqual(self.logged(), [("forced", adsk.core.LogTypes.ConsoleLogType)])
+
+
+class WriteNowTest(unittest.TestCase):
+
+    def test_error_of_a_worker_is_handed_to_the_main_thread(self):
+        app = adsk.core.Application.get()
+        since = len(app.log_records)
+        logger = log_utils.get_logger("test.worker")
+
+        in_thread(lambda: logger.error("worker failed"))
+        self.assertEqual(app.log_records[since:], [])
+
+        logger.error("main failed")
+        file_log = [m for m, _, t in app.log_records[since:]
+                    if t == adsk.core.LogTypes.FileLogType]
+        self.assertEqual(file_log, ["worker failed", "main failed"])
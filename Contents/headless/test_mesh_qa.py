@@ -0,0 +1,91 @@
+"""Tests of `lib.mesh_qa` on meshes exported by the simulated label design.
+
+Run with `python -m unittest discover -s headless` from the add-in folder.
+"""
+
+import pathlib
+import tempfile
+import unittest
+
+import bootstrap
+
+design_parameters = bootstrap.load_addin("lib.design_parameters")
+mesh_qa = bootstrap.load_addin("lib.mesh_qa")
+schema_registry = bootstrap.load_addin("lib.schema_registry")
+batch = bootstrap.load_addin("lib.batch")
+
+# Outline of a span 1 label.
+WIDTH, HEIGHT = 41.5, 11.5
+
+
+@unittest.skipUnless(mesh_qa.available(), "NumPy is not installed")
+class MeshQATest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = pathlib.Path(tmp.name)
+
+    def export(self, rows: list) -> list:
+        """`(path, params)` of every label exported from the simulated design."""
+        schema_registry.registry.load_all()
+        design = bootstrap.make_label_design()
+        params = design_parameters.DesignParameters(design)
+        schema = schema_registry.registry.for_parameters(params.parameters)
+        report = batch.BatchEngine(
+            params, schema, self.tmp.joinpath("export"), check_text_fit=False).run(rows)
+        return [(item.output_path, item.params) for item in report.completed]
+
+    def stl(self, name: str, *boxes) -> pathlib.Path:
+        return bootstrap.write_stl(self.tmp.joinpath(name), boxes)
+
+    def test_exported_batch_passes(self):
+        labels = self.export([{"bin_span": 1 + i % 3, "label_text": f"M{i}"} for i in range(4)])
+        report = mesh_qa.check_meshes(labels, workers=2)
+        self.assertEqual(report.failed, [])
+        # Measured from the meshes, the simulated design is 1.2 mm thick.
+        self.assertAlmostEqual(report.profile.thickness, 1.2, places=3)
+        self.assertAlmostEqual(report.profile.relief, 0.4, places=3)
+
+    def test_label_without_its_text_fails(self):
+        labels = self.export([{"bin_span": 1, "label_text": t} for t in ("M3", "M4")])
+        # The body alone, as if the text feature had failed to compute.
+        body = self.stl("body.stl", ((0, 0, 0), (WIDTH, HEIGHT, 1.2)))
+        labels.append((body, {"bin_span": 1, "label_text": "M3"}))
+
+        report = mesh_qa.check_meshes(labels, workers=1)
+        self.assertEqual(len(report.failed), 1)
+        self.assertEqual(list(report.failed[0].problems), ["text missing"])
+
+    def test_text_flush_with_the_body_fails(self):
+        # Enough triangles for a glyph, but nothing above the body top.
+        fp = self.stl("flush.stl", ((0, 0, 0), (WIDTH, HEIGHT, 1.2)),
+                      ((0, 0, -1.0), (5.0, 5.0, 0)))
+        check = mesh_qa.check_mesh(fp, {"bin_span": 1, "label_text": "M3"})
+        self.assertIn("text missing", check.problems)
+
+    def test_body_thicker_than_the_batch_fails(self):
+        labels = self.export([{"bin_span": span, "label_text": ""} for span in (1, 2, 3)])
+        thick = self.stl("thick.stl", ((0, 0, 0), (WIDTH, HEIGHT, 2.0)))
+        labels.append((thick, {"bin_span": 1, "label_text": ""}))
+
+        report = mesh_qa.check_meshes(labels, workers=1)
+        self.assertAlmostEqual(report.profile.thickness, 1.2, places=3)
+        self.assertEqual([c.path for c in report.failed], [thick])
+        self.assertEqual(list(report.failed[0].problems), ["thickness"])
+
+    def test_given_profile_is_used(self):
+        labels = self.export([{"bin_span": 2, "label_text": "M4"}])
+        report = mesh_qa.check_meshes(labels, profile=mesh_qa.LabelProfile(1.6, 0.4))
+        self.assertEqual(list(report.failed[0].problems), ["thickness"])
+
+    def test_wrong_outline_and_open_mesh_fail(self):
+        fp = self.stl("short.stl", ((0, 0, 0), (30.0, HEIGHT, 1.2)))
+        # Drop the last triangle, leaving a hole in the side of the box.
+        data = bytearray(fp.read_bytes())
+        data[80:84] = (11).to_bytes(4, "little")
+        fp.write_bytes(bytes(data[:-50]))
+
+        check = mesh_qa.check_mesh(fp, {"bin_span": 1, "label_text": ""})
+        self.assertIn("size", check.problems)
+        self.assertIn("open edges", check.problems)
@@ -0,0 +1,130 @@
+"""Tests of `lib.parameter_expressions` and the writes of `lib.design_parameters`.
+
+Run with `python -m unittest discover -s headless` from the add-in folder.
+"""
+
+import math
+import unittest
+
+import bootstrap
+
+design_parameters = bootstrap.load_addin("lib.design_parameters")
+parameter_expressions = bootstrap.load_addin("lib.parameter_expressions")
+
+
+class _Record:
+    def __init__(self, expression: str, unit: str = ""):
+        self.expression = expression
+        self.unit = unit
+
+
+def graph_of(expressions: dict) -> parameter_expressions.ParameterGraph:
+    """Graph of unitless parameters with the given expressions."""
+    return parameter_expressions.ParameterGraph(
+        {name: _Record(e) for name, e in expressions.items()})
+
+
+class ParameterGraphTest(unittest.TestCase):
+
+    def test_predict_with_unknown_reference_of_a_dependent(self):
+        # `pi` is no parameter of the design; Fusion 360 knows it, the graph
+        # does not, so the dependent's value is unknown.
+        graph = graph_of({"bin_span": "1", "a": "bin_span * pi"})
+        self.assertEqual(graph.predict({"bin_span": "2"}), {"bin_span": 2.0, "a": None})
+        self.assertEqual(graph.update({"bin_span": "2"}), {"bin_span": 2.0, "a": None})
+
+    def test_predict_dependents(self):
+        graph = graph_of({"bin_span": "1", "width": "bin_span * 42", "r": "width / PI"})
+        values = graph.predict({"bin_span": "2"})
+        self.assertEqual(values["width"], 84.0)
+        self.assertAlmostEqual(values["r"], 84.0 / math.pi)
+
+    def test_unparsed_expression_is_a_dependent(self):
+        # `mil` is no unit the parser knows.
+        graph = graph_of({"bin_span": "1", "a": "bin_span * 2 mil", "b": "a + 1"})
+        self.assertEqual(graph.dependents("bin_span"), ["a", "b"])
+        self.assertEqual(graph.predict({"bin_span": "2"}), {"bin_span": 2.0, "a": None, "b": None})
+
+
+class SameExpressionTest(unittest.TestCase):
+
+    def test_same_values_without_references(self):
+        same = parameter_expressions.same_expression
+        self.assertTrue(same("1.0", "1"))
+        self.assertTrue(same("1 mm", "1mm", "mm"))
+        self.assertTrue(same("10 mm", "1 cm", "mm"))
+        self.assertTrue(same("'M3'", '"M3"'))
+
+    def test_different_expressions(self):
+        same = parameter_expressions.same_expression
+        self.assertFalse(same("1", "2"))
+        self.assertFalse(same("'1'", "1"))
+        self.assertFalse(same("1 mm", "1", "cm"))
+        # References may change later, the expressions are kept apart.
+        self.assertFalse(same("bin_span * 2", "2 * bin_span"))
+        self.assertFalse(same("1 +", "1"))
+
+
+class DesignParametersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.design = bootstrap.make_label_design()
+        self.params = design_parameters.DesignParameters(self.design)
+
+    def expression(self, name: str) -> str:
+        return self.design.allParameters.itemByName(name).expression
+
+    def test_equivalent_expressions_are_not_written(self):
+        # The design holds `1.0` and `'[label_text]'`.
+        written = self.params.update_parameter_expressions(
+            {"bin_span": "1", "label_text": '"[label_text]"'})
+        self.assertEqual(written, [])
+        self.assertEqual(self.design.recompute_count, 0)
+
+    def test_changes_are_written_with_one_recompute(self):
+        written = self.params.update_parameter_expressions(
+            {"bin_span": "2", "label_text": "'M3'", "picto_inner_diameter": "2 mm"})
+        self.assertEqual(written, ["bin_span", "label_text"])
+        self.assertEqual(self.design.recompute_count, 1)
+        self.assertEqual(self.expression("label_text"), "'M3'")
+        self.assertEqual(self.params.parameters["bin_span"].value, 2.0)
+
+    def test_rejected_write_changes_nothing(self):
+        def modify(parameters, values):
+            raise RuntimeError("3 : invalid expression")
+
+        self.design.modifyParameters = modify
+        with self.assertRaises(RuntimeError):
+            self.params.update_parameter_expressions({"bin_span": "2", "label_text": "'M3'"})
+        self.assertEqual(self.design.recompute_count, 0)
+        self.assertEqual(self.expression("bin_span"), "1.0")
+        self.assertEqual(self.params.parameters["bin_span"].expression, "1.0")
+
+    def test_partial_write_is_rolled_back_with_one_recompute(self):
+        modify = self.design.modifyParameters
+
+        def modify_first(parameters, values):
+            # Fails after changing the first parameter.
+            self.design.modifyParameters = modify
+            parameters[0]._set(values[0].stringValue)
+            raise RuntimeError("3 : invalid expression")
+
+        self.design.modifyParameters = modify_first
+        with self.assertRaises(RuntimeError):
+            self.params.update_parameter_expressions({"bin_span": "2", "label_text": "'M3'"})
+        self.assertEqual(self.design.recompute_count, 1)
+        self.assertEqual(self.expression("bin_span"), "1.0")
+        self.assertEqual(self.expression("label_text"), "'[label_text]'")
+
+    def test_value_of_unparsed_dependent_is_read_again_after_a_write(self):
+        # The stand-in does not evaluate references, its values are set the
+        # way Fusion 360 would compute them.
+        offset = self.design.add_parameter("offset", "2")
+        offset._expression = "bin_span * 2 mil"
+        params = self.params
+        self.assertEqual(params.parameters["offset"].value, 2.0)
+        params.graph.load()
+
+        params.update_parameter_expressions({"bin_span": "3"})
+        offset._value = 6.0
+        self.assertEqual(params.parameters["offset"].value, 6.0)
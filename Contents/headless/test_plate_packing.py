@@ -0,0 +1,101 @@
+"""Tests of `lib.plate_packing` and the 3MF plates written from its placements.
+
+Run with `python -m unittest discover -s headless` from the add-in folder.
+"""
+
+import pathlib
+import re
+import tempfile
+import unittest
+import zipfile
+
+import bootstrap
+
+label_geometry = bootstrap.load_addin("lib.label_geometry")
+plate_packing = bootstrap.load_addin("lib.plate_packing")
+plate_3mf = bootstrap.load_addin("commands.generateLabel.plate_3mf")
+
+
+def labels(*spans) -> list:
+    return [{"bin_span": span} for span in spans]
+
+
+class PackLabelsTest(unittest.TestCase):
+
+    def assertValidPacking(self, result, count: int):
+        bed = result.bed
+        self.assertEqual(len(result.placements), count)
+        self.assertEqual(sorted(p.label for p in result.placements), list(range(count)))
+        for plate in result.by_plate():
+            for i, a in enumerate(plate):
+                self.assertGreaterEqual(a.x, bed.margin - 1e-9)
+                self.assertGreaterEqual(a.y, bed.margin - 1e-9)
+                self.assertLessEqual(a.x + a.width, bed.width - bed.margin + 1e-9)
+                self.assertLessEqual(a.y + a.height, bed.depth - bed.margin + 1e-9)
+                for b in plate[i + 1:]:
+                    apart = (a.x + a.width + bed.spacing <= b.x + 1e-9
+                             or b.x + b.width + bed.spacing <= a.x + 1e-9
+                             or a.y + a.height + bed.spacing <= b.y + 1e-9
+                             or b.y + b.height + bed.spacing <= a.y + 1e-9)
+                    self.assertTrue(apart, f"{a} overlaps {b}")
+
+    def test_mixed_batch_does_not_overlap(self):
+        spans = [1 + i % 5 for i in range(120)]
+        result = plate_packing.pack_labels(labels(*spans), plate_packing.BED_PROFILES["prusa_mk4"])
+        self.assertValidPacking(result, len(spans))
+
+    def test_free_strip_is_filled_with_rotated_labels(self):
+        bed = plate_packing.BED_PROFILES["prusa_mk4"]
+        result = plate_packing.pack_labels(labels(*[2] * 200), bed)
+        self.assertValidPacking(result, 200)
+        # Shelves alone hold 2 x 14 labels of 83.5 mm per plate, 8 plates.
+        self.assertEqual(result.plates, 6)
+        self.assertTrue(any(p.rotated for p in result.placements))
+        for p in result.placements:
+            if p.rotated:
+                self.assertEqual((p.width, p.height), (label_geometry.LABEL_HEIGHT, 83.5))
+
+    def test_label_longer_than_the_bed_is_wide_is_rotated(self):
+        bed = plate_packing.BedProfile("narrow", 100.0, 200.0)
+        result = plate_packing.pack_labels(labels(3, 3, 1), bed)
+        self.assertValidPacking(result, 3)
+        self.assertEqual(result.plates, 1)
+        self.assertEqual([p.rotated for p in result.placements], [True, True, False])
+
+    def test_label_too_long_for_the_bed_raises(self):
+        bed = plate_packing.BED_PROFILES["prusa_mini"]
+        with self.assertRaises(ValueError):
+            plate_packing.pack_labels(labels(1, 5), bed)
+
+    def test_placements_are_written_to_csv(self):
+        result = plate_packing.pack_labels(labels(1, 2), plate_packing.BED_PROFILES["ender3"])
+        with tempfile.TemporaryDirectory() as tmp:
+            fp = pathlib.Path(tmp, "plates.csv")
+            result.write_csv(fp)
+            header = fp.read_text().splitlines()[0]
+        self.assertEqual(header, ",".join(plate_packing.Placement.__slots__))
+
+
+class RotatedItemTest(unittest.TestCase):
+
+    def test_rotated_item_covers_its_placement(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            stl = bootstrap.write_stl(
+                pathlib.Path(tmp, "label.stl"), [((2.0, 3.0, 0.0), (42.0, 14.0, 1.2))])
+            fp = pathlib.Path(tmp, "plate.3mf")
+            with plate_3mf.ThreeMFPackager(fp) as packager:
+                obj = packager.add(stl, 10.0, 20.0, rotated=True)
+            with zipfile.ZipFile(fp) as package:
+                model = package.read(plate_3mf.MODEL_PATH).decode()
+
+        m = [float(v) for v in re.search(r'transform="([^"]+)"', model).group(1).split()]
+        (ox, oy, oz), (sx, sy, sz) = obj.origin, obj.size
+        corners = [(x, y) for x in (ox, ox + sx) for y in (oy, oy + sy)]
+        # 3MF transforms multiply row vectors: p' = p * M + t.
+        moved = [(x * m[0] + y * m[3] + m[9], x * m[1] + y * m[4] + m[10]) for x, y in corners]
+        xs, ys = zip(*moved)
+        self.assertAlmostEqual(min(xs), 10.0, places=4)
+        self.assertAlmostEqual(max(xs), 10.0 + sy, places=4)
+        self.assertAlmostEqual(min(ys), 20.0, places=4)
+        self.assertAlmostEqual(max(ys), 20.0 + sx, places=4)
+        self.assertAlmostEqual(m[11], -oz, places=4)
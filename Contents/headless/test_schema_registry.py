@@ -0,0 +1,88 @@
+"""Tests of `lib.schema_registry.SchemaRegistry`.
+
+Run with `python -m unittest discover -s headless` from the add-in folder.
+"""
+
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+import bootstrap
+
+import adsk.core
+
+schema_registry = bootstrap.load_addin("lib.schema_registry")
+
+LABEL_ID = "gridfinity_label_parametric"
+BIN_ID = "gridfinity-label-autogen-bin"
+
+
+class SchemaRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.schema_dir = pathlib.Path(tmp.name)
+        shutil.copy(bootstrap.LABEL_SCHEMA, self.schema_dir)
+        self.registry = schema_registry.SchemaRegistry(self.schema_dir)
+        self.app = adsk.core.Application.get()
+
+    def logged_errors(self, since: int) -> list:
+        """Messages written to the Fusion 360 log file after record `since`."""
+        return [m for m, _, log_type in self.app.log_records[since:]
+                if log_type == adsk.core.LogTypes.FileLogType]
+
+    def write(self, name: str, text: str, mtime_ns: int = None) -> pathlib.Path:
+        path = self.schema_dir.joinpath(name)
+        path.write_text(text, encoding="utf-8")
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def test_loads_each_schema_once(self):
+        self.registry.load_all()
+        self.registry.load_all()
+        self.assertEqual(self.registry.stats()["loads"], 1)
+        self.assertEqual(self.registry.get(LABEL_ID).title, "Label")
+        self.assertIsNone(self.registry.get(BIN_ID))
+
+    def test_malformed_file_is_skipped(self):
+        broken = self.write("broken.json", '{"schema": {"gla_id": ')
+        self.write("other.json", '{"title": "not a schema"}')
+        since = len(self.app.log_records)
+        self.registry.load_all()
+
+        self.assertEqual(len(self.registry), 1)
+        self.assertEqual(self.registry.get(LABEL_ID).title, "Label")
+        errors = self.logged_errors(since)
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(errors[0].startswith("Skipping schema broken.json"))
+        self.assertEqual(self.registry.stats()["errors"], 2)
+        self.assertIn(broken, self.registry.errors)
+
+        # Not parsed again until the file changes.
+        self.registry.load_all()
+        self.assertEqual(self.registry.stats()["loads"], 3)
+
+    def test_fixed_file_is_loaded(self):
+        broken = self.write("bin.json", "{", mtime_ns=1_000_000_000)
+        self.registry.load_all()
+        self.assertIsNone(self.registry.get(BIN_ID))
+        self.assertIn(broken, self.registry.errors)
+
+        self.write(broken.name, bootstrap.BIN_SCHEMA.read_text(), mtime_ns=2_000_000_000)
+        self.registry.load_all()
+        self.assertIsNotNone(self.registry.get(BIN_ID))
+        self.assertEqual(self.registry.errors, {})
+
+    def test_schema_broken_by_an_edit_is_dropped(self):
+        path = self.schema_dir.joinpath(bootstrap.LABEL_SCHEMA.name)
+        os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+        self.registry.load_all()
+        self.write(path.name, "[]", mtime_ns=2_000_000_000)
+
+        self.assertIsNone(self.registry.get(LABEL_ID))
+        self.assertEqual(len(self.registry), 0)
+        self.assertEqual(len(self.registry.errors), 1)
@@ -0,0 +1,91 @@
+"""Tests of `lib.schema_validator` and the validation of designs.
+
+Run with `python -m unittest discover -s headless` from the add-in folder.
+"""
+
+import json
+import unittest
+
+import bootstrap
+
+design_parameters = bootstrap.load_addin("lib.design_parameters")
+schema_registry = bootstrap.load_addin("lib.schema_registry")
+schema_validator = bootstrap.load_addin("lib.schema_validator")
+
+
+def parse(path):
+    return schema_registry.parse_schema(path, json.loads(path.read_text()))
+
+
+class CompiledValidatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.label = parse(bootstrap.LABEL_SCHEMA)
+        self.bin = parse(bootstrap.BIN_SCHEMA)
+
+    def codes(self, result) -> dict:
+        return {e.field: e.code for e in result.errors}
+
+    def test_manifest_row_is_coerced(self):
+        validator = schema_validator.compile_schema(
+            self.label, exclude=("gla_id",), coerce=True, defaults=True)
+        result = validator.validate({"bin_span": "2", "label_text": "M3"})
+        self.assertTrue(result.ok, str(result))
+        self.assertEqual(result.values["bin_span"], 2.0)
+        self.assertEqual(result.values["picto_inner_diameter"], 2.0)
+
+    def test_errors_of_every_field_are_reported(self):
+        validator = schema_validator.compile_schema(self.label, allow_unknown=False)
+        result = validator.validate({
+            "gla_id": "other", "bin_span": 0, "picto_inner_diameter": "2",
+            "label_text": "M3", "colour": "red"})
+        self.assertEqual(self.codes(result), {
+            "gla_id": "const",
+            "bin_span": "exclusiveMinimum",
+            "picto_inner_diameter": "type",
+            "picto_outer_diameter": "required",
+            "picto_inner_length": "required",
+            "picto_outer_length": "required",
+            "colour": "unknown",
+        })
+
+    def test_boolean_is_coerced_from_csv_text(self):
+        validator = schema_validator.compile_schema(self.bin, coerce=True, defaults=True)
+        self.assertIs(validator.validate({"has_label": "no"}).values["has_label"], False)
+        result = validator.validate({"has_label": "maybe"})
+        self.assertEqual(self.codes(result), {"has_label": "type", "gla_id": "required"})
+
+
+class DesignValidationTest(unittest.TestCase):
+
+    def setUp(self):
+        schema_registry.registry.load_all()
+
+    def test_label_design_is_valid(self):
+        params = design_parameters.DesignParameters(bootstrap.make_label_design())
+        schema = schema_registry.registry.for_parameters(params.parameters)
+        self.assertEqual(schema.title, "Label")
+        result = schema.validate(params.parameters)
+        self.assertTrue(result.ok, str(result))
+        self.assertEqual(result.values["label_text"], "[label_text]")
+
+    def test_bin_design_is_valid(self):
+        design = bootstrap.make_bin_design()
+        params = design_parameters.DesignParameters(design)
+        schema = schema_registry.registry.for_parameters(params.parameters)
+        self.assertEqual(schema.gla_ids, ("gridfinity-label-autogen-bin",))
+
+        result = schema.validate(params.parameters)
+        self.assertTrue(result.ok, str(result))
+        self.assertIs(result.values["has_label"], True)
+        self.assertEqual(result.values["scoop_curve_radius"], 10.0)
+
+        design.allParameters.itemByName("HasLabel").expression = "0"
+        params.invalidate()
+        self.assertIs(schema.validate(params.parameters).values["has_label"], False)
+
+    def test_bin_design_values_written_back(self):
+        params = design_parameters.DesignParameters(bootstrap.make_bin_design())
+        schema = schema_registry.registry.for_parameters(params.parameters)
+        expressions = schema.expressions({"has_label": False, "label_width": 10.0})
+        self.assertEqual(expressions, {"HasLabel": "0", "LabelWidth": "10 mm"})
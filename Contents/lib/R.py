@@ -5,6 +5,19 @@ import pathlib
 
 # LABEL_DOCUMENT_PARAMETERS_SCHEMA = "res/schema/label_document_parameters_schema.json"
 
-LABEL_DOCUMENT_PARAMETERS_SCHEMA = pathlib.Path(__file__).parent.parent.joinpath(
-    "res\schema\label_document_parameters_schema.json"
+# Paths are joined part by part so they resolve on Windows and macOS alike.
+RES_DIR = pathlib.Path(__file__).parent.parent.joinpath("res")
+
+SCHEMA_DIR = RES_DIR.joinpath("schema")
+
+LABEL_DESIGN = RES_DIR.joinpath("gridfinity_label_parametric v11.f3d")
+
+LABEL_DOCUMENT_PARAMETERS_SCHEMA = SCHEMA_DIR.joinpath(
+    "label_document_parameters_schema.json"
 )
+
+BIN_DOCUMENT_PARAMETERS_SCHEMA = SCHEMA_DIR.joinpath(
+    "bin_document_parameters_schema.json"
+)
+
+LABEL_CATALOG = RES_DIR.joinpath("catalog", "label_catalog.csv")
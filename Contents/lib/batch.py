@@ -0,0 +1,434 @@
+"""Batch label generation.
+
+Implements the "Autogeneration Loop" of `docs/sequenceDiagram.mmd`: a manifest
+of parameter rows is read, every row is validated against the label schema,
+applied to the open design and the result is exported.
+"""
+
+import csv
+import json
+import pathlib
+import re
+import time
+
+import adsk.fusion
+from ..lib import fusionAddInUtils as futil
+from . import batch_journal
+from . import batch_schedule
+from . import design_parameters
+from . import export_cache
+from . import parameter_expressions
+from . import schema_registry
+from . import schema_validator
+from . import text_fit
+
+logger = futil.get_logger(__name__)
+
+# Schema properties that describe the document itself and are never part of a
+# manifest row.
+DOCUMENT_FIELDS = ("gla_id",)
+
+DEFAULT_NAME_TEMPLATE = "{index:04d}_{label_text}.stl"
+
+
+def read_manifest(fp: pathlib.Path) -> list:
+    """Read the parameter rows of a CSV or JSON manifest.
+
+    A JSON manifest is either a list of objects or an object with a `labels`
+    list. Empty CSV cells are dropped so the schema default applies.
+
+    Args:
+        fp (pathlib.Path): path of the manifest file.
+    """
+    fp = pathlib.Path(fp)
+    suffix = fp.suffix.lower()
+    if suffix == ".csv":
+        with fp.open(newline="", encoding="utf-8-sig") as f:
+            rows = []
+            for row in csv.DictReader(f):
+                row = {k.strip(): v.strip() for k, v in row.items()
+                       if k and v is not None and v.strip() != ""}
+                if row:
+                    rows.append(row)
+            return rows
+    if suffix == ".json":
+        with fp.open(encoding="utf-8") as f:
+            json_obj = json.load(f)
+        if isinstance(json_obj, dict):
+            json_obj = json_obj["labels"]
+        return list(json_obj)
+    raise ValueError(f"Unsupported manifest type '{fp.suffix}'.")
+
+
+def export_stl(design: adsk.fusion.Design, fp: pathlib.Path):
+    """Export the root component of `design` as an STL file."""
+    export_mgr = design.exportManager
+    options = export_mgr.createSTLExportOptions(design.rootComponent, str(fp))
+    export_mgr.execute(options)
+
+
+def _safe_name(text: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", text).strip("_")[:48] or "label"
+
+
+class BatchItem:
+    """One unique parameter set of a manifest."""
+
+    def __init__(self, index: int, params: dict):
+        self.index = index
+        self.params = params
+        # Manifest rows (0-based) that resolved to this parameter set.
+        self.rows = [index]
+        self.output_path = None
+        self.seconds = 0.0
+        self.error = None
+        # True if the output was copied from the export cache.
+        self.cached = False
+        # True if the journal of an earlier run had already exported it.
+        self.resumed = False
+        # Position in which the item was applied to the design.
+        self.order = None
+        # Seconds of the parameter update and of the export.
+        self.apply_seconds = 0.0
+        self.export_seconds = 0.0
+
+
+class BatchReport:
+    def __init__(self):
+        self.items = []
+        # (row index, list of FieldError) of rows that failed validation.
+        self.rejected = []
+        self.seconds = 0.0
+        # Seconds spent applying and exporting the items that were not
+        # cached or resumed, and the scheduler's predictions of it.
+        self.design_updates = 0
+        self.design_seconds = 0.0
+        self.predicted_seconds = None
+        self.manifest_seconds = None
+        # True if the run was stopped before all items were done.
+        self.cancelled = False
+
+    @property
+    def completed(self) -> list:
+        return [i for i in self.items if i.error is None and i.output_path]
+
+    @property
+    def failed(self) -> list:
+        return [i for i in self.items if i.error is not None]
+
+    @property
+    def cached(self) -> list:
+        return [i for i in self.items if i.cached]
+
+    @property
+    def resumed(self) -> list:
+        return [i for i in self.items if i.resumed]
+
+    @property
+    def duplicates(self) -> int:
+        return sum(len(i.rows) - 1 for i in self.items)
+
+    @property
+    def throughput(self) -> float:
+        """Completed labels per second."""
+        return len(self.completed) / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        summary = (
+            f"{len(self.completed)} exported ({len(self.cached)} cached, "
+            f"{len(self.resumed)} resumed), "
+            f"{len(self.failed)} failed, "
+            f"{len(self.rejected)} rejected, {self.duplicates} duplicates "
+            f"in {self.seconds:.2f}s ({self.throughput:.1f} labels/s)"
+        )
+        if self.predicted_seconds is not None:
+            summary += (
+                f", design updates {self.design_seconds:.2f}s "
+                f"(predicted {self.predicted_seconds:.2f}s, "
+                f"{self.manifest_seconds:.2f}s in manifest order)"
+            )
+        if self.cancelled:
+            summary += ", cancelled"
+        return summary
+
+    def to_dict(self) -> dict:
+        return {
+            "seconds": self.seconds,
+            "throughput": self.throughput,
+            "duplicates": self.duplicates,
+            "cancelled": self.cancelled,
+            "design_seconds": self.design_seconds,
+            "predicted_seconds": self.predicted_seconds,
+            "manifest_seconds": self.manifest_seconds,
+            "rejected": [
+                {"row": r, "errors": [e.to_dict() for e in errors]}
+                for r, errors in self.rejected
+            ],
+            "items": [
+                {
+                    "index": i.index,
+                    "rows": i.rows,
+                    "params": i.params,
+                    "output_path": str(i.output_path) if i.output_path else None,
+                    "seconds": i.seconds,
+                    "order": i.order,
+                    "apply_seconds": i.apply_seconds,
+                    "export_seconds": i.export_seconds,
+                    "cached": i.cached,
+                    "resumed": i.resumed,
+                    "error": i.error,
+                }
+                for i in self.items
+            ],
+        }
+
+
+class BatchEngine:
+    """Apply the parameter rows of a manifest to a design and export each label.
+
+    Args:
+        design_params (DesignParameters): parameters of the open GLA design.
+        schema (DocumentSchema): label document schema.
+        output_dir (pathlib.Path): directory the exported labels are written to.
+        name_template (str): file name of an exported label, formatted with
+            the row `index` and the label parameters.
+        exporter (Callable): called as `exporter(design, path)`, defaults to
+            `export_stl`.
+        cache (ExportCache): cache of previously exported labels, optional.
+        design_hash (str): hash of the source design, part of the cache key.
+            Defaults to `export_cache.design_digest` of the open design.
+        check_text_fit (bool): reject rows whose `label_text` is not legible
+            on a label of their `bin_span`.
+        journal (BatchJournal): checkpoint journal, optional. Items it lists
+            as exported are skipped if their output file still exists, every
+            newly exported item is recorded, and the journal is compacted
+            when the run finishes without failures.
+        scheduler (BatchScheduler): orders the items that are applied to the
+            design by the predicted cost of their parameter changes and
+            learns the costs from the measured times, optional. Output names
+            keep the manifest row index.
+    """
+
+    def __init__(
+            self,
+            design_params: design_parameters.DesignParameters,
+            schema: schema_registry.DocumentSchema,
+            output_dir: pathlib.Path,
+            name_template: str = DEFAULT_NAME_TEMPLATE,
+            exporter=export_stl,
+            cache: export_cache.ExportCache = None,
+            design_hash: str = None,
+            check_text_fit: bool = True,
+            journal: batch_journal.BatchJournal = None,
+            scheduler: batch_schedule.BatchScheduler = None,
+    ):
+        self.design_params = design_params
+        self.schema = schema
+        self.output_dir = pathlib.Path(output_dir)
+        self.name_template = name_template
+        self.exporter = exporter
+        self.cache = cache
+        self.journal = journal
+        self.scheduler = scheduler
+        # Schema field name per document parameter name.
+        self._field_names = {f.document_parameter_name: f.name for f in schema.fields.values()}
+        if (cache is not None or journal is not None) and design_hash is None:
+            design_hash = export_cache.design_digest(
+                design_params.design, design_params.parameters, schema, DOCUMENT_FIELDS)
+        self.design_hash = design_hash
+        self.check_text_fit = check_text_fit
+        # Manifest rows never carry document fields, take schema defaults for
+        # missing fields and are read as text from CSV files.
+        self.row_validator = schema_validator.compile_schema(
+            schema, exclude=DOCUMENT_FIELDS, coerce=True, defaults=True,
+            allow_unknown=False)
+
+    def plan(self, rows: list) -> BatchReport:
+        """Validate `rows` and collapse duplicates without touching the design.
+
+        `rows` may be any iterable, e.g. a generator, and is consumed once.
+        """
+        report = BatchReport()
+        seen = {}
+        validate = self.row_validator.validate
+        for index, row in enumerate(rows):
+            result = validate(row)
+            if not result.ok:
+                report.rejected.append((index, result.errors))
+                continue
+            params = result.values
+            quoting = self._quoting_errors(params)
+            if quoting:
+                report.rejected.append((index, quoting))
+                continue
+            if self.check_text_fit and "label_text" in params:
+                fit = text_fit.fit_text(params["label_text"], params["bin_span"])
+                if not fit.fits:
+                    report.rejected.append(
+                        (index, [schema_validator.FieldError("label_text", "fit", fit.reason)]))
+                    continue
+            key = tuple(sorted(params.items()))
+            if key in seen:
+                seen[key].rows.append(index)
+                continue
+            item = BatchItem(index, params)
+            seen[key] = item
+            report.items.append(item)
+        return report
+
+    @staticmethod
+    def _quoting_errors(params: dict) -> list:
+        # Text that cannot be written as a text expression.
+        errors = []
+        for name, value in params.items():
+            if isinstance(value, str):
+                try:
+                    design_parameters.format_expression(value)
+                except parameter_expressions.ExpressionError as e:
+                    errors.append(schema_validator.FieldError(name, "text", e.message))
+        return errors
+
+    def output_path(self, item: BatchItem) -> pathlib.Path:
+        fields = {k: _safe_name(v) if isinstance(v, str) else v
+                  for k, v in item.params.items()}
+        return self.output_dir.joinpath(
+            self.name_template.format(index=item.index, **fields))
+
+    def apply(self, params: dict) -> list:
+        """Write `params` to the design, returns the names of the changed parameters."""
+        return self.design_params.update_parameter_expressions(self.schema.expressions(params))
+
+    def run(self, rows: list) -> BatchReport:
+        """Validate, apply and export `rows` on the calling thread.
+
+        See `batch_runner.BackgroundBatch` for a run that leaves the user
+        interface responsive.
+        """
+        report = self.plan(rows)
+        self.begin(report)
+        try:
+            start = time.perf_counter()
+            pending = self.resolve(report)
+            if self.scheduler is not None:
+                pending = self.order(report, pending, self.design_values())
+            for item, path, key in pending:
+                item_start = time.perf_counter()
+                try:
+                    changed = self.update_design(item, path)
+                    self.record(report, item, path, key, changed, item_start)
+                except Exception as e:
+                    self.fail(item, e, item_start)
+            report.seconds = time.perf_counter() - start
+        finally:
+            self.finish(report)
+        return report
+
+    # The steps of `run`. Only `design_values` and `update_design` use the
+    # Fusion 360 API and must run on the main thread.
+
+    def begin(self, report: BatchReport):
+        """Report the rejected rows and open the output directory and journal."""
+        for index, errors in report.rejected:
+            logger.warning("Batch row %d rejected: %s", index, "; ".join(map(str, errors)))
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.journal is not None:
+            self.journal.open()
+
+    def resolve(self, report: BatchReport) -> list:
+        """Finish the items served by the journal or the export cache.
+
+        Returns:
+            list: `(item, output path, key)` of the items that have to be
+            applied to the design, in manifest order.
+        """
+        pending = []
+        for item in report.items:
+            item_start = time.perf_counter()
+            try:
+                path = self.output_path(item)
+                key = None
+                if self.cache is not None or self.journal is not None:
+                    key = export_cache.parameters_key(item.params, self.design_hash)
+                if self.journal is not None and self.journal.completed(key, path):
+                    item.resumed = True
+                    item.output_path = path
+                    continue
+                if self.cache is not None and self.cache.fetch(key, path):
+                    item.cached = True
+                    self._completed(item, path, key, item_start)
+                    continue
+                pending.append((item, path, key))
+            except Exception as e:
+                self.fail(item, e, item_start)
+        return pending
+
+    def design_values(self) -> dict:
+        """Schema field values of the design before the batch."""
+        return self.schema.design_values(self.design_params.parameters)
+
+    def order(self, report: BatchReport, pending: list, start: dict) -> list:
+        """`pending` in the order of the scheduler.
+
+        Args:
+            start (dict): schema field values of the design, see `design_values`.
+        """
+        paths = {id(item): (path, key) for item, path, key in pending}
+        schedule = self.scheduler.schedule([item for item, _, _ in pending], start)
+        report.predicted_seconds = schedule.predicted_seconds
+        report.manifest_seconds = schedule.manifest_seconds
+        return [(item, *paths[id(item)]) for item in schedule.items]
+
+    def update_design(self, item: BatchItem, path: pathlib.Path) -> list:
+        """Apply an item to the design and export it to `path`.
+
+        Returns:
+            list: names of the document parameters that changed.
+        """
+        item_start = time.perf_counter()
+        with futil.span("apply", "batch", index=item.index):
+            changed = self.apply(item.params)
+        apply_end = time.perf_counter()
+        with futil.span("export", "batch", index=item.index):
+            self.exporter(self.design_params.design, path)
+        item.apply_seconds = apply_end - item_start
+        item.export_seconds = time.perf_counter() - apply_end
+        return changed
+
+    def record(self, report: BatchReport, item: BatchItem, path: pathlib.Path, key: str,
+               changed: list, item_start: float):
+        """Book an item `update_design` exported."""
+        item.order = report.design_updates
+        report.design_updates += 1
+        report.design_seconds += item.apply_seconds + item.export_seconds
+        if self.scheduler is not None:
+            self.scheduler.observe(
+                [self._field_names.get(p, p) for p in changed],
+                item.apply_seconds, item.export_seconds)
+        if self.cache is not None:
+            self.cache.put(key, path)
+        self._completed(item, path, key, item_start)
+
+    def finish(self, report: BatchReport):
+        """Close the journal and log the results of the run."""
+        if self.journal is not None:
+            logger.info("Batch journal: %s", self.journal.stats())
+            if not report.failed and not report.cancelled:
+                self.journal.compact()
+            self.journal.close()
+        if self.scheduler is not None and report.design_updates:
+            self.scheduler.model.fit()
+            logger.info("Batch cost model: %s", self.scheduler.model.stats())
+        logger.info("Batch finished: %s", report.summary())
+        if self.cache is not None:
+            logger.info("Export cache: %s", self.cache.stats())
+
+    def _completed(self, item: BatchItem, path: pathlib.Path, key: str, item_start: float):
+        item.output_path = path
+        item.seconds = time.perf_counter() - item_start
+        if self.journal is not None:
+            self.journal.record(key, item.index, path, item.seconds)
+
+    def fail(self, item: BatchItem, error: Exception, item_start: float):
+        item.error = f"{type(error).__name__}: {error}"
+        item.seconds = time.perf_counter() - item_start
+        logger.warning("Batch item %d failed: %s", item.index, item.error)
@@ -0,0 +1,179 @@
+"""Append-only journal of completed batch items.
+
+Every item a batch finishes is appended to a JSONL file as one record. The
+line is flushed and fsync'd before the batch moves on, so after a crash,
+a lost license or a reboot the journal names every item that was exported.
+A resumed run replays the journal and skips the items whose output file
+still exists.
+
+Records are keyed by `export_cache.parameters_key`, so a record only matches
+an item with the same parameters exported from the same design. A line torn
+by a crash is ignored on replay. When a run finishes, `compact` rewrites the
+journal with one record per key.
+"""
+
+import json
+import os
+import pathlib
+import time
+
+from ..lib import fusionAddInUtils as futil
+
+logger = futil.get_logger(__name__)
+
+
+class JournalRecord:
+    __slots__ = ("key", "index", "output_path", "seconds", "time")
+
+    def __init__(self, key: str, index: int, output_path: str, seconds: float, time: float):
+        self.key = key
+        self.index = index
+        self.output_path = output_path
+        self.seconds = seconds
+        self.time = time
+
+    def to_dict(self) -> dict:
+        return {s: getattr(self, s) for s in self.__slots__}
+
+
+class BatchJournal:
+    """Checkpoint journal of a batch run.
+
+    Args:
+        fp (pathlib.Path): JSONL journal file, created if it does not exist.
+        sync (bool): fsync every record. Only turn this off when losing the
+            last records on a crash is acceptable.
+    """
+
+    def __init__(self, fp: pathlib.Path, sync: bool = True):
+        self.path = pathlib.Path(fp)
+        self.sync = sync
+        self.records = {}
+        self.replayed = 0
+        self.torn = 0
+        self.replay_seconds = 0.0
+        self.appended = 0
+        self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        """Replay the journal, then open it for appending."""
+        if self._file is not None:
+            return
+        self.replay()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        # Terminate a line torn by a crash so the next record starts clean.
+        if self._file.tell() and self._last_byte() != b"\n":
+            self._file.write("\n")
+
+    def _last_byte(self) -> bytes:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def replay(self) -> int:
+        """Read the records of an earlier run, returns their number."""
+        start = time.perf_counter()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = [line for line in f.read().splitlines() if line]
+        except FileNotFoundError:
+            lines = []
+        try:
+            # One parse of the whole journal is much faster than one per line.
+            objs = json.loads(f"[{','.join(lines)}]")
+        except ValueError:
+            objs = None
+        if objs is not None and len(objs) != len(lines):
+            objs = None
+
+        records = {}
+        replayed = torn = 0
+        for i, line in enumerate(lines):
+            try:
+                record = JournalRecord(**(objs[i] if objs else json.loads(line)))
+            except (ValueError, TypeError):
+                torn += 1
+                continue
+            # The latest record of a key wins.
+            records[record.key] = record
+            replayed += 1
+        self.records = records
+        self.replayed = replayed
+        self.torn = torn
+        self.replay_seconds = time.perf_counter() - start
+        if replayed or torn:
+            logger.info("Replayed %d journal records (%d torn) from %s in %.1f ms",
+                        replayed, torn, self.path.name, self.replay_seconds * 1000)
+        return replayed
+
+    def completed(self, key: str, output_path: pathlib.Path = None) -> JournalRecord:
+        """Record of an item that was already exported, or None.
+
+        Args:
+            key (str): parameters key of the item.
+            output_path (pathlib.Path): path the item is exported to. A
+                record written for another path does not count.
+        """
+        record = self.records.get(key)
+        if record is None:
+            return None
+        if output_path is not None and pathlib.Path(record.output_path) != pathlib.Path(output_path):
+            return None
+        if not os.path.exists(record.output_path):
+            return None
+        return record
+
+    def record(self, key: str, index: int, output_path: pathlib.Path, seconds: float) -> JournalRecord:
+        """Append the record of a completed item and make it durable."""
+        record = JournalRecord(key, index, str(output_path), seconds, time.time())
+        self._file.write(json.dumps(record.to_dict(), separators=(",", ":")) + "\n")
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        self.records[key] = record
+        self.appended += 1
+        return record
+
+    def compact(self) -> int:
+        """Rewrite the journal with the latest record per key.
+
+        Records whose output file no longer exists are dropped. Returns the
+        number of records kept.
+        """
+        was_open = self._file is not None
+        self.close()
+        records = [r for r in self.records.values() if os.path.exists(r.output_path)]
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record.to_dict(), separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.records = {r.key: r for r in records}
+        logger.info("Compacted journal %s to %d records", self.path.name, len(records))
+        if was_open:
+            self._file = open(self.path, "a", encoding="utf-8")
+        return len(records)
+
+    def stats(self) -> dict:
+        return {
+            "records": len(self.records),
+            "replayed": self.replayed,
+            "torn": self.torn,
+            "replay_seconds": self.replay_seconds,
+            "appended": self.appended,
+        }
@@ -0,0 +1,262 @@
+"""Run a batch without blocking the Fusion 360 user interface.
+
+`BatchEngine.run` applies and exports every item inside one event handler,
+so Fusion 360 cannot repaint or react to input until the whole batch is done.
+`BackgroundBatch` splits the work between two threads:
+
+- A worker thread validates the rows, serves items from the journal and the
+  export cache, schedules the rest and books every exported item (cache,
+  journal, cost model, progress).
+- The Fusion 360 API may only be used from the main thread, so every design
+  update is handed to it as one custom event. The main thread applies and
+  exports that one item and hands the result back.
+
+Fusion 360 handles user input between two custom events. The dialog stays
+responsive, and a cancelled batch stops after the item in progress. The user
+may edit the design meanwhile, so the cached design parameters are
+invalidated whenever a command completes (`DesignParameters.watch`).
+"""
+
+import queue
+import threading
+import time
+
+import adsk.core
+from ..lib import fusionAddInUtils as futil
+from . import batch
+
+app = adsk.core.Application.get()
+logger = futil.get_logger(__name__)
+
+# Seconds the worker waits for the main thread before it checks again
+# whether the batch was stopped.
+_POLL_INTERVAL = 0.1
+
+
+class BatchProgress:
+    """Snapshot of the progress of a batch, as shown to the user."""
+
+    __slots__ = ("total", "done", "failed", "skipped", "elapsed", "current", "finished",
+                 "cancelled")
+
+    def __init__(self, total: int = 0, done: int = 0, failed: int = 0, skipped: int = 0,
+                 elapsed: float = 0.0, current: str = "", finished: bool = False,
+                 cancelled: bool = False):
+        self.total = total
+        self.done = done
+        self.failed = failed
+        # Items of `done` and `failed` settled before the first design
+        # update, from the journal or the export cache. They don't count
+        # towards the throughput.
+        self.skipped = skipped
+        self.elapsed = elapsed
+        # Label text of the item being exported.
+        self.current = current
+        self.finished = finished
+        self.cancelled = cancelled
+
+    @property
+    def fraction(self) -> float:
+        return (self.done + self.failed) / self.total if self.total else 1.0
+
+    @property
+    def throughput(self) -> float:
+        """Items per second so far."""
+        return (self.done + self.failed - self.skipped) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta(self) -> float:
+        """Estimated seconds until the batch is done, None before the first item."""
+        rate = self.throughput
+        if not rate:
+            return None
+        return (self.total - self.done - self.failed) / rate
+
+    def to_dict(self) -> dict:
+        json_obj = {s: getattr(self, s) for s in self.__slots__}
+        json_obj.update(fraction=self.fraction, throughput=self.throughput, eta=self.eta)
+        return json_obj
+
+    def __repr__(self):
+        return f"BatchProgress({self.done + self.failed}/{self.total})"
+
+
+class BackgroundBatch:
+    """Batch whose design updates are posted to the main thread one at a time.
+
+    `start`, `cancel` and `stop` are called from the main thread, as are
+    `on_progress` and `on_finished`.
+
+    Args:
+        engine (BatchEngine): engine of the batch.
+        rows (list): manifest rows, any iterable. They are consumed by the
+            worker thread.
+        event_id (str): id of the custom event the batch registers.
+        on_progress (Callable): called with a `BatchProgress` when an item
+            starts and when the batch is finished.
+        on_finished (Callable): called with the `BatchReport` at the end.
+    """
+
+    def __init__(self, engine: batch.BatchEngine, rows, event_id: str,
+                 on_progress=None, on_finished=None):
+        self.engine = engine
+        self.rows = rows
+        self.event_id = event_id
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.report = None
+        self.error = None
+        self.progress = BatchProgress()
+        # Messages for the main thread, one custom event each.
+        self._messages = queue.Queue()
+        # Results of design updates for the worker.
+        self._results = queue.Queue()
+        self._cancel = threading.Event()
+        self._thread = None
+        self._event = None
+        self._start_values = None
+        self.events = 0
+        # Longest time the main thread spent on one event, in seconds.
+        self.max_event_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the worker thread."""
+        self._event = app.registerCustomEvent(self.event_id)
+        handlers = futil.handler_scope(self.event_id)
+        futil.add_handler(self._event, self._on_event, scope=handlers)
+        # The user may edit the design between two items; parameters read
+        # before are read again after any command that completes.
+        self.engine.design_params.watch(handlers)
+        if self.engine.scheduler is not None:
+            # The scheduler starts from the current design, read here while
+            # still on the main thread.
+            self._start_values = self.engine.design_values()
+        self._thread = threading.Thread(
+            target=self._work, name=f"batch {self.event_id}", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stop after the item in progress; the finished event still follows."""
+        if not self._cancel.is_set():
+            logger.info("Batch %s cancelled", self.event_id)
+        self._cancel.set()
+
+    def stop(self):
+        """Cancel and wait for the worker, e.g. when the add-in stops.
+
+        Design updates the worker is waiting for are done here, as the main
+        thread may not dispatch another custom event.
+        """
+        self.cancel()
+        while self.running:
+            self._dispatch()
+            self._thread.join(_POLL_INTERVAL)
+        while self._dispatch():
+            pass
+        self._release()
+
+    def _post(self, message: tuple):
+        self._messages.put(message)
+        app.fireCustomEvent(self.event_id)
+
+    def _snapshot(self, current: str = "") -> BatchProgress:
+        p = self.progress
+        return BatchProgress(p.total, p.done, p.failed, p.skipped, p.elapsed, current,
+                             p.finished, p.cancelled)
+
+    # Worker thread.
+
+    def _work(self):
+        engine = self.engine
+        report = batch.BatchReport()
+        start = updates_start = time.perf_counter()
+        begun = False
+        try:
+            report = engine.plan(self.rows)
+            engine.begin(report)
+            begun = True
+            pending = engine.resolve(report)
+            if engine.scheduler is not None:
+                pending = engine.order(report, pending, self._start_values)
+            progress = self.progress
+            progress.total = len(report.items)
+            progress.done = len(report.completed)
+            progress.failed = len(report.failed)
+            progress.skipped = progress.done + progress.failed
+            updates_start = time.perf_counter()
+
+            for item, path, key in pending:
+                if self._cancel.is_set():
+                    report.cancelled = True
+                    break
+                progress.elapsed = time.perf_counter() - updates_start
+                item_start = time.perf_counter()
+                self._post(("item", item, path, self._snapshot(item.params.get("label_text", ""))))
+                changed, error = self._wait_result()
+                if error is None:
+                    engine.record(report, item, path, key, changed, item_start)
+                    progress.done += 1
+                else:
+                    engine.fail(item, error, item_start)
+                    progress.failed += 1
+            report.seconds = time.perf_counter() - start
+        except Exception as e:
+            self.error = e
+            logger.error("Batch %s failed: %s: %s", self.event_id, type(e).__name__, e)
+        finally:
+            if begun:
+                engine.finish(report)
+            self.report = report
+            self.progress.finished = True
+            self.progress.cancelled = report.cancelled
+            self.progress.elapsed = time.perf_counter() - updates_start
+            self._post(("finished", self._snapshot()))
+
+    def _wait_result(self) -> tuple:
+        while True:
+            try:
+                return self._results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if self._event is None:
+                    return None, RuntimeError("batch stopped")
+
+    # Main thread.
+
+    def _on_event(self, args: adsk.core.CustomEventArgs):
+        self._dispatch()
+
+    def _dispatch(self) -> bool:
+        """Handle one message of the worker, returns False if there was none."""
+        try:
+            message = self._messages.get_nowait()
+        except queue.Empty:
+            return False
+        start = time.perf_counter()
+        kind, *data = message
+        if kind == "item":
+            item, path, progress = data
+            if self.on_progress is not None:
+                self.on_progress(progress)
+            try:
+                self._results.put((self.engine.update_design(item, path), None))
+            except Exception as e:
+                self._results.put((None, e))
+        elif kind == "finished":
+            self._release()
+            if self.on_progress is not None:
+                self.on_progress(data[0])
+            if self.on_finished is not None:
+                self.on_finished(self.report)
+        self.events += 1
+        self.max_event_seconds = max(self.max_event_seconds, time.perf_counter() - start)
+        return True
+
+    def _release(self):
+        if self._event is not None:
+            futil.release_scope(self.event_id)
+            app.unregisterCustomEvent(self.event_id)
+            self._event = None
@@ -0,0 +1,303 @@
+"""Order batch items by the cost of the parameter changes between them.
+
+Applying a parameter set costs one recompute of the label design, and what a
+recompute costs depends on which parameters changed: a new `bin_span`
+rebuilds the whole label body, a new `label_text` only the text feature.
+`CostModel` learns the seconds a change of each parameter adds to a write
+and recompute from the times measured by earlier batches.
+
+`BatchScheduler` groups the items by the most expensive parameter, within a
+group by the next most expensive one and so on, so every value of an
+expensive parameter is applied once and the cheap ones are swept inside the
+groups. Every other group is traversed in reverse ("snake" order), so the
+last item of a group often shares its cheaper values with the first item of
+the next one.
+
+Only the order of the work changes. Output names are formatted with the
+manifest row index, so the files are named as without scheduling.
+"""
+
+import json
+import os
+import pathlib
+
+from ..lib import fusionAddInUtils as futil
+from . import design_parameters
+
+logger = futil.get_logger(__name__)
+
+# Seconds per changed parameter assumed before anything has been measured.
+# Only the ratios matter for the order of the first batch.
+DEFAULT_COSTS = {
+    "bin_span": 2.0,
+    "picto_outer_diameter": 0.5,
+    "picto_outer_length": 0.5,
+    "picto_inner_diameter": 0.5,
+    "picto_inner_length": 0.5,
+    "label_text": 0.2,
+}
+DEFAULT_COST = 0.5
+
+# Weight of the prior costs in the fit, in measurements. Parameters that
+# always change together cannot be told apart by measurements alone; the
+# prior splits their combined cost.
+PRIOR_WEIGHT = 1.0
+
+
+def _solve(a: list, b: list) -> list:
+    """Solve the linear system `a x = b` by Gaussian elimination."""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            continue
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(n):
+            if r != col and m[r][col]:
+                f = m[r][col] / m[col][col]
+                m[r] = [x - f * y for x, y in zip(m[r], m[col])]
+    return [m[i][n] / m[i][i] if abs(m[i][i]) >= 1e-12 else 0.0 for i in range(n)]
+
+
+class CostModel:
+    """Seconds of a design update as a sum of per-parameter costs.
+
+    The time to apply a parameter set is modelled as `base` plus the cost of
+    every parameter that changed. The costs are a least squares fit of the
+    measured times, regularized towards the prior costs. The sums of the
+    normal equations are kept, so a model saved after a batch goes on
+    learning from the next one.
+
+    Args:
+        prior (dict): prior seconds per parameter, defaults to `DEFAULT_COSTS`.
+    """
+
+    def __init__(self, prior: dict = None):
+        self.prior = dict(DEFAULT_COSTS if prior is None else prior)
+        self.base = 0.0
+        self.costs = dict(self.prior)
+        self.export_seconds = 0.0
+        self.samples = 0
+        self.exports = 0
+        # Normal equation sums over the measured updates, per parameter name
+        # and parameter name pair. "" is the intercept.
+        self._xx = {}
+        self._xy = {}
+        self._export_total = 0.0
+
+    def cost(self, name: str) -> float:
+        return self.costs.get(name, self.prior.get(name, DEFAULT_COST))
+
+    def predict(self, changed) -> float:
+        """Seconds to write and recompute the parameters `changed`."""
+        if not changed:
+            return 0.0
+        return self.base + sum(self.cost(name) for name in changed)
+
+    def observe(self, changed, seconds: float):
+        """Add the measured time of a design update."""
+        if not changed:
+            return
+        names = ("",) + tuple(changed)
+        for a in names:
+            self._xy[a] = self._xy.get(a, 0.0) + seconds
+            row = self._xx.setdefault(a, {})
+            for b in names:
+                row[b] = row.get(b, 0.0) + 1.0
+        self.samples += 1
+
+    def observe_export(self, seconds: float):
+        self._export_total += seconds
+        self.exports += 1
+        self.export_seconds = self._export_total / self.exports
+
+    def fit(self):
+        """Refit `base` and `costs` to all measurements so far."""
+        if not self.samples:
+            return
+        names = [""] + sorted(n for n in self._xx if n)
+        prior = {n: self.prior.get(n, DEFAULT_COST) for n in names[1:]}
+        xx, xy = self._xx, self._xy
+
+        # The prior costs are only right up to a factor, e.g. the speed of
+        # the machine. First fit that factor, as `base + scale * prior cost
+        # of the changed parameters`, then regularize towards scaled priors.
+        z = sum(prior[n] * xx[""].get(n, 0.0) for n in prior)
+        zz = sum(prior[n] * prior[m] * xx[n].get(m, 0.0) for n in prior for m in prior)
+        zy = sum(prior[n] * xy.get(n, 0.0) for n in prior)
+        _, scale = _solve([[self.samples, z], [z, zz]], [xy[""], zy])
+        scale = max(0.0, scale)
+
+        a, b = [], []
+        for i, n in enumerate(names):
+            row = xx.get(n, {})
+            a.append([row.get(m, 0.0) for m in names])
+            b.append(xy.get(n, 0.0))
+            if n:
+                a[i][i] += PRIOR_WEIGHT
+                b[i] += PRIOR_WEIGHT * scale * prior[n]
+        x = _solve(a, b)
+        self.base = max(0.0, x[0])
+        # Parameters that were never changed keep their scaled prior.
+        self.costs = {n: scale * c for n, c in self.prior.items()}
+        for n, cost in zip(names[1:], x[1:]):
+            self.costs[n] = max(0.0, cost)
+
+    @classmethod
+    def load(cls, fp: pathlib.Path) -> "CostModel":
+        """Model saved by `save`, or a new model if `fp` does not exist."""
+        model = cls()
+        try:
+            with open(fp, encoding="utf-8") as f:
+                json_obj = json.load(f)
+        except FileNotFoundError:
+            return model
+        model.prior.update(json_obj.get("prior", {}))
+        model._xx = json_obj.get("xx", {})
+        model._xy = json_obj.get("xy", {})
+        model.samples = json_obj.get("samples", 0)
+        model.exports = json_obj.get("exports", 0)
+        model._export_total = json_obj.get("export_total", 0.0)
+        if model.exports:
+            model.export_seconds = model._export_total / model.exports
+        model.costs = dict(model.prior)
+        model.fit()
+        return model
+
+    def save(self, fp: pathlib.Path):
+        fp = pathlib.Path(fp)
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        tmp = fp.with_name(f".{fp.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "prior": self.prior,
+                "samples": self.samples,
+                "exports": self.exports,
+                "export_total": self._export_total,
+                "xx": self._xx,
+                "xy": self._xy,
+                # Fitted values, for people reading the file.
+                "base": self.base,
+                "costs": self.costs,
+                "export_seconds": self.export_seconds,
+            }, f, indent=2)
+        os.replace(tmp, fp)
+
+    def stats(self) -> dict:
+        return {
+            "samples": self.samples,
+            "base": self.base,
+            "costs": dict(self.costs),
+            "export_seconds": self.export_seconds,
+        }
+
+
+class Schedule:
+    """Order in which batch items are applied, with its predicted time.
+
+    Attributes:
+        items (list): items in the order they are applied.
+        predicted_seconds (float): predicted time of `items` in that order.
+        manifest_seconds (float): predicted time in manifest order.
+    """
+
+    __slots__ = ("items", "predicted_seconds", "manifest_seconds")
+
+    def __init__(self, items: list, predicted_seconds: float, manifest_seconds: float):
+        self.items = items
+        self.predicted_seconds = predicted_seconds
+        self.manifest_seconds = manifest_seconds
+
+    @property
+    def predicted_saving(self) -> float:
+        return self.manifest_seconds - self.predicted_seconds
+
+
+class BatchScheduler:
+    """Reorder batch items to make the parameter changes between them cheap.
+
+    Args:
+        schema (DocumentSchema): label schema of the batch.
+        model (CostModel): cost model, a new one with the default costs if
+            not given.
+        reorder (bool): schedule the items; otherwise they keep manifest order
+            and only the time is predicted.
+    """
+
+    def __init__(self, schema, model: CostModel = None, reorder: bool = True):
+        self.schema = schema
+        self.model = model if model is not None else CostModel()
+        self.reorder = reorder
+
+    def _state(self, values: dict) -> dict:
+        # Compared as expressions, the way `DesignParameters` decides what to
+        # write, so 4.000000000000001 read back from a design equals 4.
+        fields = self.schema.fields
+        return {name: design_parameters.format_expression(v, fields[name].unit)
+                for name, v in values.items() if name in fields}
+
+    def changed(self, before: dict, after: dict) -> list:
+        """Names of the parameters that differ between two states."""
+        return [n for n, v in after.items() if before.get(n) != v]
+
+    def predict(self, states: list, start: dict) -> float:
+        model = self.model
+        seconds = len(states) * model.export_seconds
+        previous = start
+        for state in states:
+            seconds += model.predict(self.changed(previous, state))
+            previous = state
+        return seconds
+
+    def schedule(self, items: list, start: dict = None) -> Schedule:
+        """Order `items` (`BatchItem`).
+
+        Args:
+            items (list): items in manifest order.
+            start (dict): schema field values of the design before the first
+                item is applied, e.g. `DocumentSchema.design_values`.
+        """
+        with futil.span("schedule", "batch", items=len(items)):
+            start = self._state(start or {})
+            states = [self._state(item.params) for item in items]
+            manifest_seconds = self.predict(states, start)
+            best = (manifest_seconds, list(range(len(items))))
+            if self.reorder and len(items) > 1:
+                for reverse in (False, True):
+                    order = self._snake_order(states, reverse)
+                    seconds = self.predict([states[i] for i in order], start)
+                    if seconds < best[0]:
+                        best = (seconds, order)
+        predicted, order = best
+        logger.info("Scheduled %d items: %.2fs predicted, %.2fs in manifest order "
+                    "(cost model of %d measurements)",
+                    len(items), predicted, manifest_seconds, self.model.samples)
+        return Schedule([items[i] for i in order], predicted, manifest_seconds)
+
+    def _snake_order(self, states: list, reverse: bool) -> list:
+        # Parameters that vary within the batch, most expensive first.
+        varying = [n for n in {n for s in states for n in s}
+                   if len({s.get(n) for s in states}) > 1]
+        varying.sort(key=lambda n: (-self.model.cost(n), n))
+        order = []
+        self._snake(list(range(len(states))), states, varying, reverse, order)
+        return order
+
+    def _snake(self, indices: list, states: list, names: list, reverse: bool, order: list):
+        if not names or len(indices) <= 1:
+            order.extend(indices)
+            return
+        name, rest = names[0], names[1:]
+        groups = {}
+        for i in indices:
+            groups.setdefault(states[i].get(name, ""), []).append(i)
+        inner_reverse = False
+        for value in sorted(groups, reverse=reverse):
+            self._snake(groups[value], states, rest, inner_reverse, order)
+            inner_reverse = not inner_reverse
+
+    def observe(self, changed, apply_seconds: float, export_seconds: float):
+        """Add the measured times of an applied and exported item."""
+        self.model.observe(changed, apply_seconds)
+        self.model.observe_export(export_seconds)
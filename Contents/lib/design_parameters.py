@@ -1,78 +1,244 @@
-import pathlib
 import adsk.fusion
 import adsk.core
 from ..lib import fusionAddInUtils as futil
-import json
-from . import R
+from . import parameter_expressions
 
 
-class JSONSchema:
+def format_expression(value, unit: str = "") -> str:
+    """Format a python value as a Fusion 360 parameter expression.
 
-    def __init__(self, fp: pathlib.Path):
-        """_summary_
+    Strings become text expressions, numbers get the unit appended unless the
+    parameter is unitless. Text is quoted with `'`, or with `"` if it contains
+    an apostrophe.
 
-        Args:
-            fp (pathlib.Path): a pathlib.Path object pointing to a JSON schema document.
-        """
-        self.path = fp
-        self.schema = None
-        self.id = None
-        self.title = None
-        self.description = None
-        self.properties = {}
-        self.required = []
-
-    def load(self):
-        json_obj = json.load(self.path.open())
-        self.schema = json_obj["$schema"]
-        self.id = json_obj["$id"]
-        self.title = json_obj["title"]
-        self.description = json_obj["description"]
-        self.required = json_obj["required"]
-
-        # futil.log(f"$schema: {self.schema}")
-        # futil.log(f"$id: {self.id}")
-        # futil.log(f"title: {self.title}")
-        # futil.log(f"description: {self.description}")
-        # futil.log(f"required: {self.required}")
-
-        for p in json_obj["properties"]:
-            self.properties[p] = {}
-            for key in json_obj["properties"][p]:
-                self.properties[p][key] = json_obj["properties"][p][key]
-            # futil.log(f"{p}: {self.properties[p]}")
-
-    def validate(self, props: dict):
-        futil.log(f"Validating...")
-        val_props = {}
-        for p in props:
-            if not p in self.properties:
-                continue
-            val_props[p] = props[p]
-        return val_props
+    Raises:
+        ExpressionError: the text contains both `'` and `"`, which no text
+            expression can hold.
+    """
+    if isinstance(value, str):
+        if "'" not in value:
+            return f"'{value}'"
+        if '"' not in value:
+            return f'"{value}"'
+        raise parameter_expressions.ExpressionError("text may not contain both ' and \"")
+    if unit and unit != "unitless":
+        return f"{value:g} {unit}"
+    return f"{value:g}"
+
+
+# Marks a record attribute that has not been read from the design yet.
+_UNREAD = object()
+
+
+class _LazyAttribute:
+    """Record attribute read from the Fusion 360 parameter on first access."""
+
+    def __init__(self, attr: str):
+        self.attr = attr
+        self.slot = f"_{attr}"
+
+    def __get__(self, record, owner):
+        if record is None:
+            return self
+        value = getattr(record, self.slot)
+        if value is _UNREAD:
+            record.view.api_calls += 1
+            value = getattr(record.param, self.attr)
+            setattr(record, self.slot, value)
+        return value
+
+    def __set__(self, record, value):
+        setattr(record, self.slot, value)
+
+
+class ParameterRecord:
+    """Cached state of one design parameter.
+
+    Each attribute costs one API call when it is first read and is free after.
+    """
+
+    __slots__ = ("name", "param", "view", "_comment", "_unit", "_expression", "_value")
+
+    comment = _LazyAttribute("comment")
+    unit = _LazyAttribute("unit")
+    expression = _LazyAttribute("expression")
+    value = _LazyAttribute("value")
+
+    def __init__(self, view, name: str, param: adsk.fusion.Parameter):
+        self.view = view
+        self.name = name
+        self.param = param
+        self._comment = self._unit = self._expression = self._value = _UNREAD
+
+    def __repr__(self):
+        return f"ParameterRecord({self.name!r})"
+
+
+class ParameterView:
+    """Read-only mapping of parameter name to `ParameterRecord`.
+
+    Parameters are looked up with `itemByName` the first time they are
+    requested, instead of scanning all of `design.allParameters`.
+
+    Attributes:
+        api_calls (int): number of Fusion 360 API calls made for reads.
+    """
+
+    def __init__(self, design: adsk.fusion.Design):
+        self.design = design
+        self._records = {}
+        self.api_calls = 0
+
+    def get(self, name: str, default=None) -> ParameterRecord:
+        record = self._records.get(name, _UNREAD)
+        if record is _UNREAD:
+            self.api_calls += 1
+            with futil.span("itemByName", "parameters", parameter=name):
+                param = self.design.allParameters.itemByName(name)
+            record = ParameterRecord(self, name, param) if param else None
+            self._records[name] = record
+        return record if record is not None else default
+
+    def __getitem__(self, name: str) -> ParameterRecord:
+        record = self.get(name)
+        if record is None:
+            raise KeyError(name)
+        return record
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def __len__(self):
+        return sum(r is not None for r in self._records.values())
+
+    def __iter__(self):
+        return (n for n, r in self._records.items() if r is not None)
+
+    def invalidate(self):
+        """Drop cached state after the design changed."""
+        self._records.clear()
 
 
 class DesignParameters:
     def __init__(self, _design: adsk.fusion.Design):
         self.design = _design
-        self.parameters = {}
-        self.read_design_parameters()
-
-    def read_design_parameters(self):
-        for i in range(self.design.allParameters.count):
-            param = self.design.allParameters.item(i)
-            self.parameters[param.name] = {
-                "comment": param.comment,
-                "unit": param.unit,
-                "expression": param.expression,
-                "value": param.value,
-            }
-            # futil.log(f"{param.name}: {self.parameters[param.name]}")
+        self.parameters = ParameterView(_design)
+        # Expressions of the parameters read so far, to check new ones and
+        # predict the values they lead to.
+        self.graph = parameter_expressions.ParameterGraph(self.parameters)
+
+    @property
+    def api_calls(self) -> int:
+        return self.parameters.api_calls
+
+    def invalidate(self):
+        """Drop everything read from the design.
+
+        Parameters written through this object stay cached; a change made
+        anywhere else does not. Whoever keeps an instance across Fusion 360
+        events, like a background batch, calls `watch` or this method.
+        """
+        self.parameters.invalidate()
+        self.graph.forget()
+
+    def watch(self, scope: futil.HandlerScope):
+        """Invalidate whenever the design may have changed behind this object.
+
+        Fusion 360 has no event for a changed parameter. Every command that
+        completes may have edited the design, and activating another document
+        changes the active design, so both invalidate. The handlers are
+        removed when `scope` is released.
+        """
+        _app = adsk.core.Application.get()
+        futil.add_handler(_app.userInterface.commandTerminated, self._command_terminated,
+                          scope=scope)
+        futil.add_handler(_app.documentActivated, self._document_activated, scope=scope)
+
+    def _command_terminated(self, args: adsk.core.ApplicationCommandEventArgs):
+        if args.terminationReason == adsk.core.TerminationReasons.CompletedTerminationReason:
+            self.invalidate()
+
+    def _document_activated(self, args: adsk.core.DocumentEventArgs):
+        self.invalidate()
+
+    def check_parameter_expressions(self, expressions: dict) -> dict:
+        """Predicted values of `expressions` and their dependents, see `ParameterGraph.predict`.
+
+        Raises:
+            ExpressionError: Fusion 360 would reject an expression or fail to
+                compute a parameter with it.
+        """
+        return self.graph.predict(expressions)
 
     def preview_parameter_expression(self, param_id, value):
-        # self.parameters[param_id]["expression"] = value
-        self.design.allParameters.itemByName(param_id).expression = value
+        self.update_parameter_expressions({param_id: value}, preview=True)
 
     def set_parameter_expression(self, param_id, value):
-        self.parameters[param_id]["expression"] = value
-        self.design.allParameters.itemByName(param_id).expression = value
+        self.update_parameter_expressions({param_id: value})
+
+    def update_parameter_expressions(self, expressions: dict, preview: bool = False) -> list:
+        """Write several parameter expressions with a single recompute.
+
+        Expressions that give the same parameter as the ones in
+        `self.parameters` are skipped, see `same_expression`. The remaining
+        ones are checked by `self.graph` first, so an invalid one is rejected
+        without a recompute. They are then written with one call of
+        `Design.modifyParameters`, which recomputes the design once. If it
+        fails, any parameter it left changed is restored before the error is
+        raised again.
+
+        Args:
+            expressions (dict): new expression per parameter name.
+            preview (bool): leave `self.parameters` untouched, for changes that
+                Fusion 360 rolls back after a command preview.
+
+        Returns:
+            list: names of the parameters that were written.
+
+        Raises:
+            ExpressionError: an expression is invalid; nothing was written.
+        """
+        changed = {}
+        for p, e in expressions.items():
+            record = self.parameters.get(p)
+            if record is None:
+                raise KeyError(f"Design has no parameter named '{p}'")
+            if record.expression != e and not parameter_expressions.same_expression(
+                    record.expression, e, record.unit):
+                changed[p] = e
+        if not changed:
+            return []
+
+        self.graph.predict(changed)
+        with futil.span("update parameters", "parameters", count=len(changed)):
+            self._write_expressions(changed)
+
+        if not preview:
+            for p, e in changed.items():
+                self.parameters[p].expression = e
+            # Only the changed parameters and their dependents have new
+            # values. Predicted numbers are taken, the rest is read again.
+            for p, value in self.graph.update(changed).items():
+                record = self.parameters[p]
+                record.value = value if isinstance(value, float) else _UNREAD
+        return list(changed)
+
+    def _write_expressions(self, changed: dict):
+        records = [self.parameters[p] for p in changed]
+        try:
+            self._modify(records, list(changed.values()))
+        except:
+            # Expressions the failed call left written, compared against the
+            # ones read before.
+            self.parameters.api_calls += len(records)
+            written = [r for r in records if r.param.expression != r.expression]
+            if written:
+                self._modify(written, [r.expression for r in written])
+            raise
+
+    def _modify(self, records: list, expressions: list):
+        self.parameters.api_calls += 1
+        values = [adsk.core.ValueInput.createByString(e) for e in expressions]
+        with futil.span("recompute", "parameters"):
+            if not self.design.modifyParameters([r.param for r in records], values):
+                raise RuntimeError("Fusion 360 did not modify the parameters")
@@ -0,0 +1,197 @@
+"""Content-addressed cache of exported label files.
+
+An exported label is fully determined by its validated parameter set and the
+source design it was generated from, so the cache key is a hash of both. On a
+hit the stored STL/3MF file is copied to the requested location without
+touching the design.
+
+Cached files are named `<key><suffix>` and their modification time doubles as
+the last-used time, so the LRU order survives restarts without an index file.
+Files are written to a temporary name and renamed into place, a crash can
+therefore never leave a partially written entry behind.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+
+_TMP_SUFFIX = ".tmp"
+_CHUNK_SIZE = 1 << 20
+
+# Digest per (path, size, mtime) so unchanged design files are hashed once.
+_file_digests = {}
+
+
+def file_digest(fp: pathlib.Path) -> str:
+    """SHA-256 of a file, memoized while its size and mtime are unchanged."""
+    st = os.stat(fp)
+    memo_key = (str(fp), st.st_size, st.st_mtime_ns)
+    digest = _file_digests.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(fp, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                h.update(chunk)
+        digest = _file_digests[memo_key] = h.hexdigest()
+    return digest
+
+
+def design_digest(design, parameters, schema, document_fields=()) -> str:
+    """SHA-256 of the state of an open design that an export depends on.
+
+    Hashes the document, and its version once it is saved, the fields of
+    `schema`, and the expressions of its `document_fields` read through
+    `parameters`. The other schema fields are set per label and hashed by
+    `parameters_key`. No other parameter is read, so edits of the model are
+    seen once the document is saved as a new version.
+
+    Args:
+        design (adsk.fusion.Design): the design the labels are exported from.
+        parameters (ParameterView): parameters of `design`.
+        schema (DocumentSchema): schema of the labels.
+        document_fields: names of the schema fields that identify the
+            document, like `gla_id`.
+    """
+    h = hashlib.sha256()
+    document = design.parentDocument
+    data_file = document.dataFile
+    if data_file is not None:
+        h.update(f"{data_file.id}\n{data_file.versionNumber}\n".encode())
+    else:
+        h.update(f"{document.name}\n".encode())
+    for field in schema.fields.values():
+        h.update(
+            f"{field.name}:{field.document_parameter_name}:{field.type}:{field.unit}\n".encode())
+        if field.name in document_fields:
+            record = parameters.get(field.document_parameter_name)
+            h.update(f"={record.expression if record else None}\n".encode())
+    return h.hexdigest()
+
+
+def parameters_key(params: dict, design_hash: str) -> str:
+    """Cache key of a validated parameter set exported from a design."""
+    normalized = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{design_hash}\n{normalized}".encode()).hexdigest()
+
+
+def _atomic_copy(src: pathlib.Path, dst: pathlib.Path):
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}{_TMP_SUFFIX}")
+    try:
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            shutil.copyfileobj(fsrc, fdst, _CHUNK_SIZE)
+            fdst.flush()
+            os.fsync(fdst.fileno())
+        os.replace(tmp, dst)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+
+
+class ExportCache:
+    """Size-bounded LRU cache of exported files.
+
+    Args:
+        cache_dir (pathlib.Path): directory holding the cached files.
+        max_bytes (int): total size above which least recently used entries
+            are evicted.
+    """
+
+    def __init__(self, cache_dir: pathlib.Path, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        # File name to size, least recently used first.
+        self._entries = collections.OrderedDict()
+        self.size = 0
+        self._scan()
+
+    def _scan(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(_TMP_SUFFIX):
+                # Left behind by an interrupted write.
+                os.unlink(entry.path)
+                continue
+            st = entry.stat()
+            entries.append((st.st_mtime_ns, entry.name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+            self.size += size
+
+    def _path(self, key: str, suffix: str) -> pathlib.Path:
+        return self.cache_dir.joinpath(f"{key}{suffix}")
+
+    def get(self, key: str, suffix: str) -> pathlib.Path:
+        """Path of the cached file for `key`, or None on a miss."""
+        path = self._path(key, suffix)
+        if path.name not in self._entries or not path.exists():
+            self.size -= self._entries.pop(path.name, 0)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(path.name)
+        os.utime(path)
+        self.hits += 1
+        return path
+
+    def fetch(self, key: str, dst: pathlib.Path) -> bool:
+        """Copy the cached file for `key` to `dst`; the suffix of `dst` is used."""
+        dst = pathlib.Path(dst)
+        path = self.get(key, dst.suffix)
+        if path is None:
+            return False
+        _atomic_copy(path, dst)
+        return True
+
+    def put(self, key: str, src: pathlib.Path) -> pathlib.Path:
+        """Store a copy of the exported file `src` under `key`."""
+        src = pathlib.Path(src)
+        path = self._path(key, src.suffix)
+        _atomic_copy(src, path)
+        size = path.stat().st_size
+        self.size += size - self._entries.pop(path.name, 0)
+        self._entries[path.name] = size
+        self.stores += 1
+        self._evict()
+        return path
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            try:
+                os.unlink(self.cache_dir.joinpath(name))
+            except FileNotFoundError:
+                pass
+            self.size -= size
+            self.evictions += 1
+
+    def clear(self):
+        for name in list(self._entries):
+            self.cache_dir.joinpath(name).unlink(missing_ok=True)
+        self._entries.clear()
+        self.size = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
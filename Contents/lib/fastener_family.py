@@ -0,0 +1,186 @@
+"""Label parameters for families of standard metric screws.
+
+The pictogram of a screw label is a side view: `picto_outer_*` is the head
+(diameter and height) and `picto_inner_*` the shank. Their dimensions follow
+from the head tables of the screw standard. The drawing is scaled to fit
+the square pictogram area of the label (see `label_geometry.text_area`).
+
+`generate` yields one validated parameter set per size and length. The rows
+are produced lazily, one size at a time. Dimensions are computed for all
+lengths of a size at once, so a family of thousands of screws can be fed
+into a batch without building the whole family first.
+"""
+
+import math
+
+from . import batch
+from . import label_geometry
+from . import schema_validator
+from . import text_fit
+
+# ISO 4762 / ISO 4017 preferred nominal lengths in mm.
+STANDARD_LENGTHS = (
+    3, 4, 5, 6, 8, 10, 12, 16, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70,
+    80, 90, 100, 110, 120, 130, 140, 150, 160, 180, 200,
+)
+
+# Shortest and longest commercial length per size, in mm.
+_LENGTH_RANGES = {
+    "M2": (3, 20), "M2.5": (4, 25), "M3": (5, 30), "M4": (6, 40), "M5": (8, 50),
+    "M6": (10, 60), "M8": (12, 80), "M10": (16, 100), "M12": (20, 120),
+}
+
+# Side of the square pictogram area and the margin kept around the drawing.
+PICTO_SIZE = label_geometry.LABEL_HEIGHT - 2 * label_geometry.LABEL_MARGIN
+
+# Shanks longer than this many head diameters are drawn shortened, so the
+# head of a long screw stays legible.
+MAX_SHANK_RATIO = 3.0
+
+# Space taken by the bin walls when a screw has to lie flat in a bin, in mm.
+BIN_WALL_ALLOWANCE = 4.0
+
+
+class FastenerFamily:
+    """Head dimensions of one screw standard.
+
+    Args:
+        name (str): family key, e.g. "socket_head".
+        standard (str): standard the dimensions come from.
+        abbreviation (str): short name used in the label text.
+        heads (dict): `(head diameter, head height)` in mm per size name.
+        head_in_length (bool): the nominal length includes the head, as for
+            countersunk screws.
+    """
+
+    __slots__ = ("name", "standard", "abbreviation", "heads", "head_in_length")
+
+    def __init__(self, name: str, standard: str, abbreviation: str, heads: dict,
+                 head_in_length: bool = False):
+        self.name = name
+        self.standard = standard
+        self.abbreviation = abbreviation
+        self.heads = heads
+        self.head_in_length = head_in_length
+
+    @property
+    def sizes(self) -> list:
+        return list(self.heads)
+
+    def lengths(self, size: str) -> list:
+        """Standard lengths available for `size`."""
+        shortest, longest = _LENGTH_RANGES[size]
+        return [l for l in STANDARD_LENGTHS if shortest <= l <= longest]
+
+    def __repr__(self):
+        return f"FastenerFamily({self.name!r}, {self.standard!r})"
+
+
+FAMILIES = {
+    f.name: f
+    for f in (
+        # Head diameter dk and height k of cylindrical socket heads.
+        FastenerFamily("socket_head", "ISO 4762", "SHCS", {
+            "M2": (3.8, 2.0), "M2.5": (4.5, 2.5), "M3": (5.5, 3.0),
+            "M4": (7.0, 4.0), "M5": (8.5, 5.0), "M6": (10.0, 6.0),
+            "M8": (13.0, 8.0), "M10": (16.0, 10.0), "M12": (18.0, 12.0),
+        }),
+        # Width across corners e and head height k of hexagon heads.
+        FastenerFamily("hex_head", "ISO 4017", "Hex", {
+            "M2": (4.32, 1.4), "M2.5": (5.45, 1.7), "M3": (6.01, 2.0),
+            "M4": (7.66, 2.8), "M5": (8.79, 3.5), "M6": (11.05, 4.0),
+            "M8": (14.38, 5.3), "M10": (17.77, 6.4), "M12": (20.03, 7.5),
+        }),
+        # Head diameter dk and head height k of countersunk heads.
+        FastenerFamily("countersunk", "ISO 10642", "CSK", {
+            "M3": (6.72, 1.86), "M4": (8.96, 2.48), "M5": (11.2, 3.1),
+            "M6": (13.44, 3.72), "M8": (17.92, 4.96), "M10": (22.4, 6.2),
+            "M12": (26.88, 7.44),
+        }, head_in_length=True),
+    )
+}
+
+
+def nominal_diameter(size: str) -> float:
+    """Shank diameter of a metric size name, e.g. 2.5 for "M2.5"."""
+    return float(size.lstrip("Mm"))
+
+
+def bin_span_for_length(length: float) -> int:
+    """Smallest bin span in which a screw of `length` mm lies flat."""
+    return max(1, math.ceil((length + BIN_WALL_ALLOWANCE) / label_geometry.GRIDFINITY_PITCH))
+
+
+def _round(value: float) -> float:
+    return round(value, 2)
+
+
+def size_rows(family: FastenerFamily, size: str, lengths: list) -> list:
+    """Label parameters of all `lengths` of one size, computed column-wise."""
+    d = nominal_diameter(size)
+    head_diameter, head_height = family.heads[size]
+    if family.head_in_length:
+        shanks = [l - head_height for l in lengths]
+        totals = list(lengths)
+    else:
+        shanks = list(lengths)
+        totals = [l + head_height for l in lengths]
+
+    # The drawing is as tall as the head and as long as head plus shank.
+    drawn_shanks = [min(s, MAX_SHANK_RATIO * head_diameter) for s in shanks]
+    scales = [min(PICTO_SIZE / head_diameter, PICTO_SIZE / (head_height + s))
+              for s in drawn_shanks]
+    texts = [f"{size}x{l:g} {family.abbreviation}" for l in lengths]
+    spans = [bin_span_for_length(t) for t in totals]
+
+    rows = []
+    for length, text, span, scale, drawn_shank in zip(lengths, texts, spans, scales, drawn_shanks):
+        # Long texts may need a wider label than the screw itself.
+        while not text_fit.fit_text(text, span).fits:
+            span += 1
+        rows.append({
+            "label_text": text,
+            "bin_span": float(span),
+            "picto_outer_diameter": _round(head_diameter * scale),
+            "picto_outer_length": _round(head_height * scale),
+            "picto_inner_diameter": _round(d * scale),
+            "picto_inner_length": _round(drawn_shank * scale),
+        })
+    return rows
+
+
+def generate(family, schema, sizes: list = None, lengths: list = None,
+             min_length: float = None, max_length: float = None):
+    """Yield validated label parameter sets of a screw family.
+
+    Args:
+        family: `FastenerFamily` or its name in `FAMILIES`.
+        schema (DocumentSchema): label schema the parameter sets are
+            validated against; missing fields take their defaults.
+        sizes (list): size names, defaults to all sizes of the family.
+        lengths (list): nominal lengths, defaults to the standard lengths of
+            each size.
+        min_length (float): skip shorter lengths.
+        max_length (float): skip longer lengths.
+
+    Raises:
+        ValueError: a generated parameter set does not satisfy `schema`.
+    """
+    if isinstance(family, str):
+        family = FAMILIES[family]
+    validator = schema_validator.compile_schema(
+        schema, exclude=batch.DOCUMENT_FIELDS, defaults=True, allow_unknown=False)
+    for size in sizes or family.sizes:
+        if size not in family.heads:
+            raise ValueError(f"{family.standard} has no size {size}")
+        size_lengths = [
+            l for l in (lengths or family.lengths(size))
+            if (min_length is None or l >= min_length)
+            and (max_length is None or l <= max_length)
+            and (not family.head_in_length or l > family.heads[size][1])
+        ]
+        for row in size_rows(family, size, size_lengths):
+            result = validator.validate(row)
+            if not result.ok:
+                raise ValueError(f"{row['label_text']}: {result}")
+            yield result.values
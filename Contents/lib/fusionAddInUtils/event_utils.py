@@ -14,10 +14,69 @@ from typing import Callable
 
 import adsk.core
 from .general_utils import handle_error
+from .trace_utils import tracer
 
 
-# Global Variable to hold Event Handlers
-_handlers = []
+# Handler class per event type, created on first use. Fusion 360 passes the
+# handler type an event accepts only as the annotation of its `add` method.
+_handler_classes = {}
+
+
+class HandlerScope:
+    """Handlers that share a lifetime, e.g. those of one open command dialog.
+
+    A scope keeps its handlers referenced so they aren't released and garbage
+    collected, and `release` removes them from their events again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._handlers = []
+        self.added = 0
+        self.released = 0
+        self._released_dispatches = 0
+
+    def add(self, event: adsk.core.Event, handler):
+        event.add(handler)
+        self._handlers.append((event, handler))
+        self.added += 1
+
+    def release(self) -> int:
+        """Remove all handlers from their events, returns their number."""
+        handlers, self._handlers = self._handlers, []
+        for event, handler in handlers:
+            try:
+                event.remove(handler)
+            except:
+                handle_error(f"release {self.name}")
+        self.released += len(handlers)
+        self._released_dispatches += sum(h.dispatches for _, h in handlers)
+        return len(handlers)
+
+    @property
+    def dispatches(self) -> int:
+        """Events handled by the handlers of this scope, released ones included."""
+        return self._released_dispatches + sum(h.dispatches for _, h in self._handlers)
+
+    def __len__(self):
+        return len(self._handlers)
+
+
+class _ListScope(HandlerScope):
+    """Scope backed by a caller managed `local_handlers` list."""
+
+    def __init__(self, handlers: list):
+        super().__init__("local")
+        self.handlers = handlers
+
+    def add(self, event: adsk.core.Event, handler):
+        event.add(handler)
+        self.handlers.append(handler)
+
+
+# Global scope of handlers that live until the add-in stops.
+_global_scope = HandlerScope("global")
+_scopes = {}
 
 
 def add_handler(
@@ -25,7 +84,8 @@ def add_handler(
         callback: Callable,
         *,
         name: str = None,
-        local_handlers: list = None
+        local_handlers: list = None,
+        scope: HandlerScope = None
 ):
     """Adds an event handler to the specified event.
 
@@ -37,52 +97,91 @@ def add_handler(
             must be specified by its keyword.
     local_handlers -- A list of handlers you manage that is used to maintain
                       a reference to the handlers so they aren't released.
-                      This argument must be specified by its keyword. If not
-                      specified the handler is added to a global list and can
-                      be cleared using the clear_handlers function. You may want
-                      to maintain your own handler list so it can be managed 
-                      independently for each command.
+                      This argument must be specified by its keyword.
+    scope -- A `HandlerScope` from `handler_scope` that keeps the handler until
+             the scope is released, e.g. when a command is destroyed. If
+             neither `scope` nor `local_handlers` is specified the handler is
+             added to a global scope that is cleared by the clear_handlers function.
 
     :returns:
         The event handler that was created.  You don't often need this reference, but it can be useful in some cases.
-    """   
-    module = sys.modules[event.__module__]
-    handler_type = module.__dict__[event.add.__annotations__['handler']]
-    handler = _create_handler(handler_type, callback, event, name, local_handlers)
-    event.add(handler)
+    """
+    handler_class = _handler_class(type(event))
+    handler = handler_class(callback, name or handler_class.event_name)
+    if scope is None:
+        scope = _ListScope(local_handlers) if local_handlers is not None else _global_scope
+    scope.add(event, handler)
     return handler
 
 
+def handler_scope(name: str) -> HandlerScope:
+    """Scope of handlers named `name`, created on first use."""
+    scope = _scopes.get(name)
+    if scope is None:
+        scope = _scopes[name] = HandlerScope(name)
+    return scope
+
+
+def release_scope(name: str) -> int:
+    """Remove the handlers of a scope from their events and forget the scope.
+
+    Returns:
+        int: number of handlers released.
+    """
+    scope = _scopes.pop(name, None)
+    return scope.release() if scope is not None else 0
+
+
 def clear_handlers():
-    """Clears the global list of handlers.
+    """Removes the handlers of the global scope and all named scopes.
     """
-    global _handlers
-    _handlers = []
+    _global_scope.release()
+    for name in list(_scopes):
+        release_scope(name)
 
 
-def _create_handler(
-        handler_type,
-        callback: Callable,
-        event: adsk.core.Event,
-        name: str = None,
-        local_handlers: list = None
-):
-    handler = _define_handler(handler_type, callback, name)()
-    (local_handlers if local_handlers is not None else _handlers).append(handler)
-    return handler
+def handler_stats() -> dict:
+    """Live handlers and dispatch counts per scope."""
+    scopes = {"global": _global_scope, **_scopes}
+    return {
+        "live": sum(len(s) for s in scopes.values()),
+        "handler_classes": len(_handler_classes),
+        "scopes": {name: {"live": len(s), "added": s.added, "dispatches": s.dispatches}
+                   for name, s in scopes.items()},
+    }
+
 
+def _handler_class(event_type: type):
+    handler_class = _handler_classes.get(event_type)
+    if handler_class is None:
+        module = sys.modules[event_type.__module__]
+        handler_type = module.__dict__[event_type.add.__annotations__['handler']]
+        handler_class = _handler_classes[event_type] = _define_handler(handler_type)
+    return handler_class
 
-def _define_handler(handler_type, callback, name: str = None):
-    name = name or handler_type.__name__
 
+def _define_handler(handler_type):
     class Handler(handler_type):
-        def __init__(self):
+        event_name = handler_type.__name__
+
+        def __init__(self, callback: Callable, name: str):
             super().__init__()
+            self.callback = callback
+            self.name = name
+            self.callback_name = getattr(callback, "__name__", name)
+            self.dispatches = 0
 
         def notify(self, args):
+            self.dispatches += 1
             try:
-                callback(args)
+                if tracer.enabled:
+                    # Time the event type and, nested in it, the callback.
+                    with tracer.span(self.name, "event"):
+                        with tracer.span(self.callback_name, "handler"):
+                            self.callback(args)
+                else:
+                    self.callback(args)
             except:
-                handle_error(name)
+                handle_error(self.name)
 
     return Handler
@@ -12,6 +12,7 @@
 import os
 import traceback
 import adsk.core
+from . import log_utils
 
 app = adsk.core.Application.get()
 ui = app.userInterface
@@ -24,6 +25,15 @@ except:
     DEBUG = False
 
 
+_logger = log_utils.get_logger("futil")
+
+_LOG_LEVELS = {
+    adsk.core.LogLevels.InfoLogLevel: log_utils.INFO,
+    adsk.core.LogLevels.WarningLogLevel: log_utils.WARNING,
+    adsk.core.LogLevels.ErrorLogLevel: log_utils.ERROR,
+}
+
+
 def log(message: str, level: adsk.core.LogLevels = adsk.core.LogLevels.InfoLogLevel, force_console: bool = False):
     """Utility function to easily handle logging in your app.
 
@@ -31,19 +41,11 @@ def log(message: str, level: adsk.core.LogLevels = adsk.core.LogLevels.InfoLogLe
     message -- The message to log.
     level -- The logging severity level.
     force_console -- Forces the message to be written to the Text Command window. 
-    """    
-    # Always print to console, only seen through IDE.
-    print(message)  
-
-    # Log all errors to Fusion log file.
-    if level == adsk.core.LogLevels.ErrorLogLevel:
-        log_type = adsk.core.LogTypes.FileLogType
-        app.log(message, level, log_type)
 
-    # If config.DEBUG is True write all log messages to the console.
-    if DEBUG or force_console:
-        log_type = adsk.core.LogTypes.ConsoleLogType
-        app.log(message, level, log_type)
+    Messages are buffered and written by the log flusher, see `log_utils`.
+    Errors are always written immediately, to the console and the Fusion log file.
+    """    
+    _logger.log(_LOG_LEVELS.get(level, log_utils.INFO), message, force_console=force_console)
 
 
 def handle_error(name: str, show_message_box: bool = False):
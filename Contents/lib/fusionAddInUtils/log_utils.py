@@ -0,0 +1,391 @@
+"""Buffered, level-filtered logging.
+
+Messages are filtered by level per logger name before anything else happens,
+and their arguments are only formatted (`msg % args`) when the message is
+written, so disabled debug messages in event handlers cost almost nothing.
+
+Enabled messages go into a bounded ring buffer. Once `start_log_flusher` has
+been called a background thread drains the buffer into the sinks; until then
+every message is written immediately. When the buffer is full the oldest
+messages are dropped and counted. Errors always bypass the buffer.
+
+Fusion 360 API calls must be made on the main thread, so messages for the
+Fusion console are handed to the main thread through a custom event.
+"""
+
+import collections
+import threading
+import time
+
+import adsk.core
+
+__all__ = [
+    "Logger",
+    "get_logger",
+    "set_level",
+    "start_log_flusher",
+    "stop_log_flusher",
+    "flush_log",
+    "log_stats",
+]
+
+app = adsk.core.Application.get()
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+_LEVEL_NAMES = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+
+_FUSION_LEVELS = {
+    DEBUG: adsk.core.LogLevels.InfoLogLevel,
+    INFO: adsk.core.LogLevels.InfoLogLevel,
+    WARNING: adsk.core.LogLevels.WarningLogLevel,
+    ERROR: adsk.core.LogLevels.ErrorLogLevel,
+}
+
+# Attempt to read the logging configuration from parent config.
+try:
+    from ... import config
+    _DEBUG = config.DEBUG
+    _LEVELS = dict(config.LOG_LEVELS)
+    _BUFFER_SIZE = config.LOG_BUFFER_SIZE
+    _CONSOLE_EVENT_ID = f"{config.COMPANY_NAME}_{config.ADDIN_NAME}_log_console"
+except:
+    _DEBUG = False
+    _LEVELS = {}
+    _BUFFER_SIZE = 4096
+    _CONSOLE_EVENT_ID = "GridfinityLabelAutogen_log_console"
+
+
+def level_from_name(level) -> int:
+    return _LEVEL_NAMES[level.upper()] if isinstance(level, str) else level
+
+
+class LogRecord:
+    __slots__ = ("name", "level", "msg", "args", "created", "force_console")
+
+    def __init__(self, name, level, msg, args, force_console=False):
+        self.name = name
+        self.level = level
+        self.msg = msg
+        self.args = args
+        self.created = time.time()
+        self.force_console = force_console
+
+    def message(self) -> str:
+        if not self.args:
+            return str(self.msg)
+        try:
+            return self.msg % self.args
+        except (TypeError, ValueError):
+            return f"{self.msg} {self.args}"
+
+
+class PrintSink:
+    """Print messages, only seen through an IDE."""
+
+    def write(self, lines: list):
+        for record, text in lines:
+            print(text)
+
+
+class FileSink:
+    """Append messages to a text file."""
+
+    def __init__(self, fp):
+        self.path = fp
+
+    def write(self, lines: list):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record, text in lines:
+                stamp = time.strftime("%H:%M:%S", time.localtime(record.created))
+                f.write(f"{stamp} {record.name}: {text}\n")
+
+
+class _ConsoleEventHandler(adsk.core.CustomEventHandler):
+    def __init__(self, sink):
+        super().__init__()
+        self.sink = sink
+
+    def notify(self, args):
+        self.sink.drain()
+
+
+class FusionConsoleSink:
+    """Write messages to the Fusion 360 Text Command window.
+
+    Only messages of the debug configuration, or logged with `force_console`,
+    are written. Errors are written to the Fusion 360 log file as well. The
+    Fusion 360 log is only ever written from the main thread: lines written
+    from another thread are queued and written by the main thread when the
+    custom event `event_id` fires. Until the event is registered they wait
+    for `register` or the next line written on the main thread.
+    """
+
+    def __init__(self, event_id: str, debug: bool = _DEBUG):
+        self.event_id = event_id
+        self.debug = debug
+        self.main_thread = threading.current_thread()
+        self._pending = collections.deque(maxlen=_BUFFER_SIZE)
+        self._event = None
+        self._handler = None
+
+    def register(self):
+        """Register the custom event and write the lines queued so far."""
+        self._event = app.registerCustomEvent(self.event_id)
+        self._handler = _ConsoleEventHandler(self)
+        self._event.add(self._handler)
+        self.drain()
+
+    def unregister(self):
+        if self._event is not None:
+            self._event.remove(self._handler)
+            app.unregisterCustomEvent(self.event_id)
+        self._event = None
+        self._handler = None
+        self.drain()
+
+    def write(self, lines: list):
+        lines = [(r, t) for r, t in lines
+                 if self.debug or r.force_console or r.level >= ERROR]
+        if not lines:
+            return
+        if threading.current_thread() is self.main_thread:
+            self.drain()
+            self._write(lines)
+            return
+        self._pending.extend(lines)
+        if self._event is not None:
+            app.fireCustomEvent(self.event_id)
+
+    def drain(self):
+        """Write the queued lines; only called on the main thread."""
+        lines = []
+        while self._pending:
+            lines.append(self._pending.popleft())
+        self._write(lines)
+
+    def _write(self, lines: list):
+        for record, text in lines:
+            level = _FUSION_LEVELS[record.level]
+            if record.level >= ERROR:
+                app.log(text, level, adsk.core.LogTypes.FileLogType)
+            if self.debug or record.force_console:
+                app.log(text, level, adsk.core.LogTypes.ConsoleLogType)
+
+
+class LogBuffer:
+    """Bounded ring buffer of log records drained into sinks.
+
+    Args:
+        capacity (int): records held before the oldest ones are dropped.
+    """
+
+    def __init__(self, capacity: int = _BUFFER_SIZE):
+        self.capacity = capacity
+        self.sinks = []
+        self._records = collections.deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+        self.dropped = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def append(self, record: LogRecord):
+        with self._lock:
+            if len(self._records) >= self.capacity:
+                self._records.popleft()
+                self.dropped += 1
+            self._records.append(record)
+            pending = len(self._records)
+        if not self.running:
+            self.flush()
+        elif pending >= self.capacity // 2:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write all buffered records to the sinks, returns their number."""
+        with self._flush_lock:
+            with self._lock:
+                records = list(self._records)
+                self._records.clear()
+            if not records:
+                return 0
+            start = time.perf_counter()
+            lines = [(r, r.message()) for r in records]
+            for sink in self.sinks:
+                try:
+                    sink.write(lines)
+                except Exception as e:
+                    print(f"Log sink {type(sink).__name__} failed: {e}")
+            seconds = time.perf_counter() - start
+        self.flushes += 1
+        self.flushed += len(records)
+        self.flush_seconds += seconds
+        self.max_flush_seconds = max(self.max_flush_seconds, seconds)
+        return len(records)
+
+    def start(self, interval: float = 0.25):
+        if self.running:
+            return
+        self._stop = False
+
+        def run():
+            while not self._stop:
+                self._wake.wait(interval)
+                self._wake.clear()
+                self.flush()
+
+        self._thread = threading.Thread(target=run, name="GLA log flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop = True
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._records),
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flushed": self.flushed,
+            "flush_seconds": self.flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+        }
+
+
+_buffer = LogBuffer()
+_console_sink = FusionConsoleSink(_CONSOLE_EVENT_ID)
+_buffer.sinks.extend([PrintSink(), _console_sink])
+_loggers = {}
+
+
+class Logger:
+    """Named logger; messages below its level are discarded unformatted."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.level = _effective_level(name)
+
+    def is_enabled_for(self, level: int) -> bool:
+        return level >= self.level
+
+    def log(self, level: int, msg, *args, force_console: bool = False):
+        if level < self.level:
+            return
+        record = LogRecord(self.name, level, msg, args, force_console)
+        if level >= ERROR:
+            write_now(record)
+        else:
+            _buffer.append(record)
+
+    def debug(self, msg, *args):
+        if DEBUG >= self.level:
+            _buffer.append(LogRecord(self.name, DEBUG, msg, args))
+
+    def info(self, msg, *args):
+        if INFO >= self.level:
+            _buffer.append(LogRecord(self.name, INFO, msg, args))
+
+    def warning(self, msg, *args):
+        if WARNING >= self.level:
+            _buffer.append(LogRecord(self.name, WARNING, msg, args))
+
+    def error(self, msg, *args):
+        write_now(LogRecord(self.name, ERROR, msg, args))
+
+
+def _effective_level(name: str) -> int:
+    """Level of the longest configured name prefix matching `name`."""
+    best, level = -1, DEBUG if _DEBUG else INFO
+    for prefix, prefix_level in _LEVELS.items():
+        if (name == prefix or name.startswith(f"{prefix}.") or not prefix) \
+                and len(prefix) > best:
+            best, level = len(prefix), level_from_name(prefix_level)
+    return level
+
+
+def get_logger(name: str) -> Logger:
+    """Logger for a module, usually called as `get_logger(__name__)`."""
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = Logger(name)
+    return logger
+
+
+def set_level(name: str, level):
+    """Set the level of `name` and the loggers below it; `""` is the root.
+
+    Args:
+        name (str): logger name prefix.
+        level: a level number or name such as `"DEBUG"`.
+    """
+    _LEVELS[name] = level
+    for logger in _loggers.values():
+        logger.level = _effective_level(logger.name)
+
+
+def write_now(record: LogRecord):
+    """Write a record immediately, after anything still buffered.
+
+    Errors are also written to the Fusion 360 log file. The Fusion 360 log
+    may only be written from the main thread; on another thread the record
+    is flushed through the buffer, whose console sink hands it over.
+    """
+    if threading.current_thread() is not _console_sink.main_thread:
+        _buffer.append(record)
+        _buffer.flush()
+        return
+    _buffer.flush()
+    _console_sink.drain()
+    text = record.message()
+    print(text)
+    if record.level >= ERROR:
+        app.log(text, _FUSION_LEVELS[record.level], adsk.core.LogTypes.FileLogType)
+    if _DEBUG or record.force_console:
+        app.log(text, _FUSION_LEVELS[record.level], adsk.core.LogTypes.ConsoleLogType)
+
+
+def start_log_flusher(log_file=None, interval: float = 0.25):
+    """Write buffered messages from a background thread from now on.
+
+    Args:
+        log_file: optional path of a file that receives all messages.
+        interval (float): seconds between flushes of the buffer.
+    """
+    if log_file:
+        _buffer.sinks.append(FileSink(log_file))
+    _console_sink.register()
+    _buffer.start(interval)
+
+
+def stop_log_flusher():
+    """Flush remaining messages and return to writing messages immediately."""
+    _buffer.stop()
+    _console_sink.unregister()
+    _buffer.sinks[:] = [s for s in _buffer.sinks if not isinstance(s, FileSink)]
+
+
+def flush_log() -> int:
+    return _buffer.flush()
+
+
+def log_stats() -> dict:
+    """Dropped message count and flush timings of the log buffer."""
+    return _buffer.stats()
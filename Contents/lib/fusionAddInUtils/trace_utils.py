@@ -0,0 +1,173 @@
+"""Opt-in timing instrumentation.
+
+When tracing is enabled every event handler created through `add_handler`
+is timed, and code can add nested spans with `span(...)`. Each finished span
+is added to a rolling latency histogram for its name, and kept as a Chrome
+trace event so that `write_chrome_trace` can produce a file for a trace viewer
+(chrome://tracing or https://ui.perfetto.dev).
+
+When tracing is disabled `span` returns a shared no-op context manager.
+"""
+
+import bisect
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+__all__ = [
+    "span",
+    "traced",
+    "enable_tracing",
+    "disable_tracing",
+    "is_tracing",
+    "write_chrome_trace",
+    "latency_stats",
+]
+
+# Upper bounds of the histogram buckets in seconds, from 10 us to 10 s.
+_BUCKETS = tuple(m * 10 ** e for e in range(-5, 1) for m in (1, 2, 5)) + (10.0,)
+
+
+class LatencyHistogram:
+    """Bucketed latencies of the most recent `window` samples."""
+
+    def __init__(self, window: int = 1000):
+        self._samples = collections.deque(maxlen=window)
+        self.counts = [0] * (len(_BUCKETS) + 1)
+        self.total = 0
+
+    def add(self, seconds: float):
+        if len(self._samples) == self._samples.maxlen:
+            self.counts[bisect.bisect_left(_BUCKETS, self._samples[0])] -= 1
+        self._samples.append(seconds)
+        self.counts[bisect.bisect_left(_BUCKETS, seconds)] += 1
+        self.total += 1
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the `p`th percentile (0-100)."""
+        if not self._samples:
+            return 0.0
+        rank = p / 100.0 * len(self._samples)
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return _BUCKETS[i] if i < len(_BUCKETS) else max(self._samples)
+        return max(self._samples)
+
+    def stats(self) -> dict:
+        samples = self._samples
+        return {
+            "count": self.total,
+            "window": len(samples),
+            "mean": sum(samples) / len(samples) if samples else 0.0,
+            "max": max(samples) if samples else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class Tracer:
+    """Collect spans as Chrome trace events and latency histograms.
+
+    Args:
+        max_events (int): trace events kept; older ones are discarded.
+        window (int): samples per latency histogram.
+    """
+
+    def __init__(self, max_events: int = 100000, window: int = 1000):
+        self.enabled = False
+        self.window = window
+        self.events = collections.deque(maxlen=max_events)
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def record(self, name: str, category: str, start: float, seconds: float, args: dict = None):
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": seconds * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram(self.window)
+            histogram.add(seconds)
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "addin", **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, category, start, time.perf_counter() - start, args)
+
+
+tracer = Tracer()
+_NO_SPAN = contextlib.nullcontext()
+
+
+def span(name: str, category: str = "addin", **args):
+    """Context manager timing the enclosed block while tracing is enabled."""
+    if not tracer.enabled:
+        return _NO_SPAN
+    return tracer.span(name, category, **args)
+
+
+def traced(name: str = None, category: str = "addin"):
+    """Decorator timing every call of a function while tracing is enabled."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable_tracing():
+    tracer.enabled = True
+
+
+def disable_tracing():
+    tracer.enabled = False
+
+
+def is_tracing() -> bool:
+    return tracer.enabled
+
+
+def write_chrome_trace(fp) -> int:
+    """Write the collected spans as a Chrome trace-event JSON file.
+
+    Returns:
+        int: number of events written.
+    """
+    with tracer._lock:
+        events = list(tracer.events)
+    with open(fp, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(events)
+
+
+def latency_stats() -> dict:
+    """Latency statistics per span name."""
+    with tracer._lock:
+        return {name: h.stats() for name, h in tracer.histograms.items()}
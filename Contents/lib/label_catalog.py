@@ -0,0 +1,234 @@
+"""Searchable catalog of predefined labels.
+
+A catalog is a manifest (see `batch.read_manifest`) whose rows also carry a
+`name` to search for and an optional `category`. The other columns are label
+parameters, validated against the label schema when the catalog is loaded.
+
+Names, categories and label texts are split into lower case tokens. A query matches the
+entries that contain, for every query token, a token starting with it. For
+short prefixes, which match many entries, the matching entry ids are
+precomputed. Longer prefixes are looked up with a binary search in the
+sorted token list. Entries are numbered in name order, so the first `limit`
+ids of the intersection are already the best-ranked results.
+"""
+
+import bisect
+import os
+import pathlib
+import re
+import time
+
+from ..lib import fusionAddInUtils as futil
+from . import batch
+from . import schema_validator
+from . import R
+
+logger = futil.get_logger(__name__)
+
+# Prefixes up to this length get a precomputed list of entry ids.
+SHORT_PREFIX = 2
+
+# Longer prefixes whose entry ids are kept between searches. Typing repeats
+# the prefixes of the words already typed with every keystroke.
+_PREFIX_CACHE_SIZE = 4096
+
+# Decimal numbers such as "4.7k" are kept in one token.
+_TOKEN = re.compile(r"\d+(?:[.,]\d+)*[^\W_]*|[^\W_]+")
+_NUMBER = re.compile(r"(\d+(?:\.\d+)?)")
+
+
+def tokenize(text: str) -> list:
+    """Lower case alphanumeric tokens of `text`, e.g. "M3x8 DIN-912 4.7k"
+    gives `["m3x8", "din", "912", "4.7k"]`."""
+    return _TOKEN.findall(text.casefold())
+
+
+def _natural_key(text: str) -> tuple:
+    """Sort key ordering "M3x8" before "M3x10"."""
+    parts = _NUMBER.split(text.casefold())
+    parts[1::2] = [float(p) for p in parts[1::2]]
+    return tuple(parts)
+
+
+class CatalogEntry:
+    __slots__ = ("id", "name", "category", "params")
+
+    def __init__(self, id: int, name: str, category: str, params: dict):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.params = params
+
+    def __repr__(self):
+        return f"CatalogEntry({self.name!r}, {self.category!r})"
+
+
+class LabelCatalog:
+    """Catalog entries with a prefix index over their names and categories.
+
+    Args:
+        entries (list): `(name, category, params)` tuples.
+    """
+
+    def __init__(self, entries: list):
+        entries = sorted(entries, key=lambda e: (_natural_key(e[0]), e[1].casefold()))
+        self.entries = [CatalogEntry(i, *e) for i, e in enumerate(entries)]
+        self.path = None
+        self.mtime = None
+        self.schema = None
+        self.rejected = []
+        self.searches = 0
+        self.search_seconds = 0.0
+        self.max_search_seconds = 0.0
+
+        postings = {}
+        for entry in self.entries:
+            text = f"{entry.name} {entry.category} {entry.params.get('label_text', '')}"
+            for token in set(tokenize(text)):
+                postings.setdefault(token, []).append(entry.id)
+
+        # Entry ids per short prefix, merged from the tokens sharing it.
+        short_tokens = {}
+        for token in postings:
+            for n in range(1, SHORT_PREFIX + 1):
+                short_tokens.setdefault(token[:n], set()).add(token)
+        short = {}
+        for prefix, tokens in short_tokens.items():
+            if len(tokens) == 1:
+                short[prefix] = postings[tokens.pop()]
+            else:
+                short[prefix] = sorted(set().union(*(postings[t] for t in tokens)))
+        self._postings = postings
+        self._tokens = sorted(postings)
+        self._short = short
+        # Ids and id sets of recently searched prefixes.
+        self._long = {}
+        self._sets = {}
+
+    @classmethod
+    def load(cls, fp: pathlib.Path, schema=None) -> "LabelCatalog":
+        """Read a catalog file.
+
+        Args:
+            fp (pathlib.Path): CSV or JSON catalog.
+            schema (DocumentSchema): label schema the entry parameters are
+                validated against. Invalid entries are left out and listed
+                in `rejected`. Without a schema parameters are kept as read.
+        """
+        start = time.perf_counter()
+        rows = batch.read_manifest(fp)
+        validator = None
+        if schema is not None:
+            validator = schema_validator.compile_schema(
+                schema, exclude=batch.DOCUMENT_FIELDS, coerce=True, defaults=True,
+                allow_unknown=False)
+
+        entries, rejected = [], []
+        for index, row in enumerate(rows):
+            params = dict(row)
+            category = str(params.pop("category", ""))
+            name = str(params.pop("name", "") or params.get("label_text", ""))
+            if validator is not None:
+                result = validator.validate(params)
+                if not result.ok:
+                    rejected.append((index, result.errors))
+                    continue
+                params = result.values
+            entries.append((name, category, params))
+
+        catalog = cls(entries)
+        catalog.path = pathlib.Path(fp)
+        catalog.mtime = os.stat(fp).st_mtime_ns
+        catalog.schema = schema
+        catalog.rejected = rejected
+        for index, errors in rejected:
+            logger.warning("Catalog row %d rejected: %s", index, "; ".join(map(str, errors)))
+        logger.info("Loaded %d catalog entries from %s in %.1f ms", len(catalog),
+                    catalog.path.name, (time.perf_counter() - start) * 1000)
+        return catalog
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, entry_id: int) -> CatalogEntry:
+        return self.entries[entry_id]
+
+    def _ids(self, prefix: str) -> list:
+        """Ascending ids of the entries with a token starting with `prefix`."""
+        if len(prefix) <= SHORT_PREFIX:
+            return self._short.get(prefix, ())
+        ids = self._long.get(prefix)
+        if ids is not None:
+            return ids
+        tokens = self._tokens
+        i = bisect.bisect_left(tokens, prefix)
+        matches = []
+        while i < len(tokens) and tokens[i].startswith(prefix):
+            matches.append(self._postings[tokens[i]])
+            i += 1
+        ids = matches[0] if len(matches) == 1 else sorted(set().union(*matches))
+        if len(self._long) >= _PREFIX_CACHE_SIZE:
+            self._long.clear()
+            self._sets.clear()
+        self._long[prefix] = ids
+        return ids
+
+    def _id_set(self, prefix: str) -> frozenset:
+        id_set = self._sets.get(prefix)
+        if id_set is None:
+            id_set = self._sets[prefix] = frozenset(self._ids(prefix))
+        return id_set
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """Entries matching every token of `query`, in name order.
+
+        An empty query matches the first `limit` entries.
+        """
+        start = time.perf_counter()
+        prefixes = set(tokenize(query))
+        if not prefixes:
+            results = self.entries[:limit]
+        else:
+            candidates = sorted(((self._ids(p), p) for p in prefixes), key=lambda c: len(c[0]))
+            ids, _ = candidates[0]
+            others = [self._id_set(p) for _, p in candidates[1:]]
+            results = []
+            for entry_id in ids:
+                if all(entry_id in s for s in others):
+                    results.append(self.entries[entry_id])
+                    if len(results) >= limit:
+                        break
+        seconds = time.perf_counter() - start
+        self.searches += 1
+        self.search_seconds += seconds
+        self.max_search_seconds = max(self.max_search_seconds, seconds)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "tokens": len(self._tokens),
+            "rejected": len(self.rejected),
+            "searches": self.searches,
+            "mean_search_seconds": self.search_seconds / self.searches if self.searches else 0.0,
+            "max_search_seconds": self.max_search_seconds,
+        }
+
+
+_catalogs = {}
+
+
+def load_catalog(fp: pathlib.Path = R.LABEL_CATALOG, schema=None) -> LabelCatalog:
+    """The catalog in `fp`, read again only if the file or schema changed.
+
+    Args:
+        fp (pathlib.Path): catalog file, defaults to the catalog in `res`.
+        schema (DocumentSchema): label schema to validate the entries with.
+    """
+    fp = pathlib.Path(fp)
+    catalog = _catalogs.get(fp)
+    if catalog is None or catalog.schema is not schema \
+            or catalog.mtime != os.stat(fp).st_mtime_ns:
+        with futil.span("load catalog", "catalog", file=fp.name):
+            catalog = _catalogs[fp] = LabelCatalog.load(fp, schema)
+    return catalog
@@ -0,0 +1,38 @@
+"""Fixed dimensions of the GLA label design, in millimetres.
+
+The label footprint follows from `bin_span` alone, which lets layout work
+(text fitting, plate packing) be done without asking Fusion 360 for geometry.
+"""
+
+# Gridfinity grid pitch.
+GRIDFINITY_PITCH = 42.0
+
+# Clearance taken off the label length so it fits between the bin walls.
+LABEL_CLEARANCE = 0.5
+
+# Depth of the label tab.
+LABEL_HEIGHT = 11.5
+
+# Margin kept free around the text and the pictogram.
+LABEL_MARGIN = 0.8
+
+
+def label_width(bin_span: float) -> float:
+    """Length of a label for a bin spanning `bin_span` grid units."""
+    return bin_span * GRIDFINITY_PITCH - LABEL_CLEARANCE
+
+
+def label_size(bin_span: float) -> tuple:
+    """(width, height) footprint of a label."""
+    return label_width(bin_span), LABEL_HEIGHT
+
+
+def text_area(bin_span: float) -> tuple:
+    """(width, height) of the area left for text next to the pictogram.
+
+    The pictogram takes a square as tall as the label at its left end.
+    """
+    width = label_width(bin_span) - LABEL_HEIGHT - 2 * LABEL_MARGIN
+    height = LABEL_HEIGHT - 2 * LABEL_MARGIN
+    return max(width, 0.0), height
+
@@ -0,0 +1,293 @@
+"""Contact sheet of label proofs, drawn without the Fusion 360 design.
+
+Every validated parameter set is drawn as a 2D tile: the label outline
+(from `bin_span`), the text laid out by `text_fit` and the pictogram as a
+side view of a screw, `picto_outer_*` being the head and `picto_inner_*` the
+shank (see `fastener_family`). A reviewer can check a whole batch on one
+sheet before any label is recomputed. Text that is not legible and a
+pictogram that leaves its square are drawn in red.
+
+Tiles are cached by parameter key, so after an edit only the changed labels
+are drawn again. Drawing a tile is cheap compared to handing it to another
+process, so a process pool is only used for large numbers of uncached tiles.
+The sheet is written as SVG; there is no rasterizer in the Fusion 360 Python
+environment to write PNG.
+"""
+
+import concurrent.futures
+import json
+import os
+import pathlib
+import time
+from xml.sax.saxutils import escape
+
+from ..lib import fusionAddInUtils as futil
+from . import export_cache
+from . import label_geometry
+from . import text_fit
+
+logger = futil.get_logger(__name__)
+
+# Part of the tile cache key; change it when the drawing changes.
+RENDERER_VERSION = "proof-1"
+
+PICTO_SIZE = label_geometry.LABEL_HEIGHT - 2 * label_geometry.LABEL_MARGIN
+
+# Pictogram dimensions are rounded to 0.01 mm, their sum may exceed the
+# square by this much without a warning.
+PICTO_TOLERANCE = 0.05
+
+# Cap height of the label font in em, used to center lines vertically.
+_CAP_HEIGHT = 0.716
+
+# Space between tiles and height of the caption under a tile, in mm.
+TILE_GAP = 3.0
+CAPTION_SIZE = 2.5
+
+# Uncached tiles below which no process pool is started, and tiles per task
+# sent to a pool process.
+PARALLEL_MIN_TILES = 2000
+CHUNK_SIZE = 256
+
+_FONT = "Arial, Helvetica, sans-serif"
+_OK, _BAD = "#333", "#d22"
+
+
+def _n(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def render_tile(params: dict) -> dict:
+    """Draw one label.
+
+    Returns:
+        dict: `svg` (a `<g>` element in mm, origin at the top left corner of
+        the label), `width` and `height` of the label in mm and `warnings`.
+    """
+    span = float(params.get("bin_span", 1.0))
+    width, height = label_geometry.label_size(span)
+    margin = label_geometry.LABEL_MARGIN
+    warnings = []
+    parts = []
+
+    # Pictogram: head and shank side by side, centered in the square.
+    od = float(params.get("picto_outer_diameter", 0.0))
+    ol = float(params.get("picto_outer_length", 0.0))
+    inner_d = float(params.get("picto_inner_diameter", 0.0))
+    il = float(params.get("picto_inner_length", 0.0))
+    limit = PICTO_SIZE + PICTO_TOLERANCE
+    picto_ok = ol + il <= limit and max(od, inner_d) <= limit
+    if not picto_ok:
+        warnings.append(f"pictogram {_n(ol + il)} x {_n(max(od, inner_d))} mm "
+                        f"exceeds {_n(PICTO_SIZE)} mm")
+    x0 = margin + (PICTO_SIZE - ol - il) / 2
+    cy = height / 2
+    stroke = _OK if picto_ok else _BAD
+    parts.append(
+        f'<rect x="{_n(x0)}" y="{_n(cy - od / 2)}" width="{_n(ol)}" height="{_n(od)}" '
+        f'fill="#bbb" stroke="{stroke}" stroke-width="0.15"/>'
+        f'<rect x="{_n(x0 + ol)}" y="{_n(cy - inner_d / 2)}" width="{_n(il)}" '
+        f'height="{_n(inner_d)}" fill="#ddd" stroke="{stroke}" stroke-width="0.15"/>')
+
+    # Text, as `text_fit` lays it out in the text area.
+    text = str(params.get("label_text", ""))
+    fit = text_fit.fit_text(text, span)
+    if not fit.fits:
+        warnings.append(fit.reason)
+    size = max(fit.size, text_fit.SIZE_STEP)
+    x = label_geometry.LABEL_HEIGHT + margin
+    pitch = text_fit.LINE_SPACING * size
+    first = cy - (len(fit.lines) - 1) * pitch / 2 + _CAP_HEIGHT * size / 2
+    fill = _OK if fit.fits else _BAD
+    for i, line in enumerate(fit.lines):
+        parts.append(
+            f'<text x="{_n(x)}" y="{_n(first + i * pitch)}" font-size="{_n(size)}" '
+            f'font-family="{_FONT}" fill="{fill}">{escape(line)}</text>')
+
+    outline = _OK if not warnings else _BAD
+    svg = (f'<g><rect width="{_n(width)}" height="{_n(height)}" rx="1" fill="#f6f6f6" '
+           f'stroke="{outline}" stroke-width="0.25"/>{"".join(parts)}</g>')
+    return {"svg": svg, "width": width, "height": height, "warnings": warnings}
+
+
+def render_tiles(params_list: list) -> list:
+    """`render_tile` of several labels, one task of the process pool."""
+    return [render_tile(p) for p in params_list]
+
+
+def tile_key(params: dict) -> str:
+    return export_cache.parameters_key(params, RENDERER_VERSION)
+
+
+class TileCache:
+    """Rendered tiles by key, kept in memory and optionally in a file.
+
+    The file holds one JSON line per tile. It is read once, and tiles drawn
+    later are appended by `flush`, so an edit of a few labels writes a few
+    lines. A file grown to more than `max_tiles` tiles is started anew.
+
+    Args:
+        fp (pathlib.Path): JSONL tile file, None to keep tiles in memory only.
+        max_tiles (int): tiles the file may hold.
+    """
+
+    def __init__(self, fp: pathlib.Path = None, max_tiles: int = 100000):
+        self.path = pathlib.Path(fp) if fp is not None else None
+        self.max_tiles = max_tiles
+        self._tiles = {}
+        self._new = []
+        self._torn = False
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        key, tile = json.loads(line)
+                    except ValueError:
+                        # A line torn by a crash, terminated by the next flush.
+                        self._torn = not line.endswith("\n")
+                        continue
+                    self._tiles[key] = tile
+        except FileNotFoundError:
+            return
+        if len(self._tiles) > self.max_tiles:
+            self._tiles.clear()
+            os.remove(self.path)
+
+    def get(self, key: str) -> dict:
+        tile = self._tiles.get(key)
+        if tile is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return tile
+
+    def put(self, key: str, tile: dict):
+        self._tiles[key] = tile
+        self._new.append(key)
+
+    def flush(self):
+        """Append the tiles added since the last flush to the file."""
+        if self.path is None or not self._new:
+            self._new = []
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lines = [json.dumps([key, self._tiles[key]], separators=(",", ":")) + "\n"
+                 for key in self._new]
+        if self._torn:
+            lines.insert(0, "\n")
+            self._torn = False
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+        self._new = []
+
+    def stats(self) -> dict:
+        return {"tiles": len(self._tiles), "hits": self.hits, "misses": self.misses}
+
+
+class ProofSheet:
+    """Result of `render_sheet`."""
+
+    __slots__ = ("path", "tiles", "rendered", "cached", "warnings", "seconds", "workers")
+
+    def __init__(self, path, tiles, rendered, cached, warnings, seconds, workers):
+        self.path = path
+        self.tiles = tiles
+        self.rendered = rendered
+        self.cached = cached
+        # (caption, warning) of every label drawn in red.
+        self.warnings = warnings
+        self.seconds = seconds
+        self.workers = workers
+
+    @property
+    def tiles_per_second(self) -> float:
+        return self.tiles / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.tiles} labels ({self.rendered} drawn, {self.cached} cached, "
+                f"{len(self.warnings)} with warnings) in {self.seconds * 1000:.1f} ms "
+                f"({self.tiles_per_second:.0f} labels/s)")
+
+
+def _render_missing(params_list: list, workers: int) -> list:
+    if workers <= 1 or len(params_list) < PARALLEL_MIN_TILES:
+        return render_tiles(params_list)
+    chunks = [params_list[i:i + CHUNK_SIZE] for i in range(0, len(params_list), CHUNK_SIZE)]
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        return [tile for tiles in pool.map(render_tiles, chunks) for tile in tiles]
+
+
+def render_sheet(fp: pathlib.Path, labels: list, columns: int = 4, cache: TileCache = None,
+                 workers: int = 1) -> ProofSheet:
+    """Write a contact sheet of labels as SVG.
+
+    Args:
+        fp (pathlib.Path): SVG file to write.
+        labels (list): `(caption, params)` of every label, in sheet order.
+        columns (int): labels of one span per row.
+        cache (TileCache): cache of earlier drawn tiles, optional.
+        workers (int): processes drawing uncached tiles. Only worth it for
+            thousands of them, and only from a standalone Python; inside
+            Fusion 360 tiles are drawn in the calling process.
+    """
+    start = time.perf_counter()
+    cache = cache if cache is not None else TileCache()
+
+    keys = [tile_key(params) for _, params in labels]
+    tiles = [cache.get(key) for key in keys]
+    missing = [i for i, tile in enumerate(tiles) if tile is None]
+    with futil.span("render tiles", "proof", tiles=len(missing)):
+        rendered = _render_missing([labels[i][1] for i in missing], workers)
+    for i, tile in zip(missing, rendered):
+        tiles[i] = tile
+        cache.put(keys[i], tile)
+    cache.flush()
+
+    # Tiles flow left to right; a row holds `columns` labels of one span,
+    # fewer of wider ones.
+    row_width = columns * (label_geometry.label_size(1.0)[0] + TILE_GAP)
+    cell_height = label_geometry.LABEL_HEIGHT + CAPTION_SIZE * 1.5 + TILE_GAP
+    positions = []
+    x = y = 0.0
+    sheet_width = 0.0
+    for tile in tiles:
+        if x and x + tile["width"] > row_width:
+            x, y = 0.0, y + cell_height
+        positions.append((TILE_GAP + x, TILE_GAP + y))
+        x += tile["width"] + TILE_GAP
+        sheet_width = max(sheet_width, x)
+    sheet_width += TILE_GAP
+    sheet_height = y + cell_height + TILE_GAP if tiles else TILE_GAP
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{_n(sheet_width)}mm" '
+        f'height="{_n(sheet_height)}mm" viewBox="0 0 {_n(sheet_width)} {_n(sheet_height)}">'
+        '<rect width="100%" height="100%" fill="#fff"/>'
+    ]
+    warnings = []
+    for (caption, _), tile, (x, y) in zip(labels, tiles, positions):
+        color = _BAD if tile["warnings"] else "#777"
+        parts.append(
+            f'<g transform="translate({_n(x)},{_n(y)})">{tile["svg"]}'
+            f'<text y="{_n(label_geometry.LABEL_HEIGHT + CAPTION_SIZE * 1.2)}" '
+            f'font-size="{_n(CAPTION_SIZE)}" font-family="{_FONT}" fill="{color}">'
+            f'{escape(str(caption))}</text></g>')
+        warnings.extend((caption, w) for w in tile["warnings"])
+    parts.append("</svg>\n")
+
+    fp = pathlib.Path(fp)
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    with open(fp, "w", encoding="utf-8") as f:
+        f.write("".join(parts))
+
+    sheet = ProofSheet(fp, len(tiles), len(missing), len(tiles) - len(missing), warnings,
+                       time.perf_counter() - start,
+                       workers if len(missing) >= PARALLEL_MIN_TILES else 1)
+    logger.info("Proof sheet %s: %s", fp.name, sheet.summary())
+    return sheet
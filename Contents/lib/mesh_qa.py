@@ -0,0 +1,466 @@
+"""Quality checks of exported label meshes before they are printed.
+
+Every binary STL is memory-mapped as a NumPy record array, so the triangles
+are never unpacked one by one in Python. For each mesh the checks compute
+the bounding box, volume, surface area, degenerate triangles and the edge
+topology of the welded vertices:
+
+- an edge used by one triangle only is open, the mesh is not watertight;
+- an edge used by more than two triangles is not manifold;
+- an edge traversed twice in the same direction belongs to triangles of
+  opposite orientation.
+
+The outline of every mesh is compared against the one `bin_span` predicts
+(`label_geometry`). The design decides how thick the label body is and how
+far the text rises above it, so these are measured rather than assumed: the
+top of the body is the plane with the largest upward facing area, and the
+text is whatever rises above it. A label with text needs at least one raised
+glyph worth of triangles above the body. Across a batch, which comes from
+one design, the body thickness and text relief of every mesh are compared
+against their median (`LabelProfile`).
+
+NumPy is not part of the Python shipped with Fusion 360. It is imported on
+first use, so the add-in runs without it; only the checks need it. Meshes
+are checked in a thread pool, NumPy releases the GIL in the heavy parts and
+threads also work inside Fusion 360.
+"""
+
+import concurrent.futures
+import os
+import pathlib
+import statistics
+import time
+
+from ..lib import fusionAddInUtils as futil
+from . import label_geometry
+
+logger = futil.get_logger(__name__)
+
+# Allowed deviation of the mesh extents from the expected label size, in mm.
+DIMENSION_TOLERANCE = 0.1
+
+# Triangles with a smaller area, in mm², are degenerate.
+DEGENERATE_AREA = 1e-9
+
+# Triangles of the plainest label body (a box) and of the plainest raised
+# glyph (a triangular prism).
+BODY_TRIANGLES = 12
+GLYPH_TRIANGLES = 8
+
+# Planes closer than this, in mm, are one level when finding the body top.
+_LEVEL_STEP = 1e-4
+
+# Grid points per axis the corners are welded on; 3 x 21 bits make one key.
+_WELD_STEPS = 1 << 21
+
+_np = None
+
+
+def _numpy():
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError as e:
+            raise ImportError(
+                "Mesh QA needs NumPy, which is not part of the Fusion 360 Python. "
+                "Install it with `python -m pip install numpy` into the Python that "
+                "runs the checks.") from e
+        _np = numpy
+    return _np
+
+
+def available() -> bool:
+    """True if NumPy can be imported."""
+    try:
+        _numpy()
+    except ImportError:
+        return False
+    return True
+
+
+def map_triangles(fp: pathlib.Path):
+    """Memory-map the triangles of a binary STL file.
+
+    Returns:
+        numpy.ndarray: read-only `(n, 3, 3)` float32 corner coordinates.
+
+    Raises:
+        ValueError: the file is not a binary STL.
+    """
+    np = _numpy()
+    size = os.path.getsize(fp)
+    if size < 84:
+        raise ValueError("not a binary STL")
+    count = int(np.fromfile(fp, dtype="<u4", count=1, offset=80)[0])
+    if size != 84 + count * 50:
+        raise ValueError("not a binary STL")
+    if count == 0:
+        return np.zeros((0, 3, 3), dtype=np.float32)
+    record = np.dtype([("normal", "<f4", (3,)), ("corners", "<f4", (3, 3)), ("attribute", "<u2")])
+    return np.memmap(fp, dtype=record, mode="r", offset=84, shape=(count,))["corners"]
+
+
+def expected_size(params: dict) -> tuple:
+    """Expected (width, height) outline of a label mesh, in mm."""
+    return label_geometry.label_size(float(params.get("bin_span", 1.0)))
+
+
+def glyph_count(params: dict) -> int:
+    return sum(not c.isspace() for c in str(params.get("label_text", "")))
+
+
+class MeshMetrics:
+    """Geometry and topology of one mesh, in mm."""
+
+    __slots__ = ("triangles", "vertices", "bounds_min", "bounds_max", "volume", "area",
+                 "degenerate", "open_edges", "nonmanifold_edges", "misoriented_edges",
+                 "thickness", "relief")
+
+    def __init__(self, triangles=0, vertices=0, bounds_min=(0.0,) * 3, bounds_max=(0.0,) * 3,
+                 volume=0.0, area=0.0, degenerate=0, open_edges=0, nonmanifold_edges=0,
+                 misoriented_edges=0, thickness=0.0, relief=0.0):
+        self.triangles = triangles
+        self.vertices = vertices
+        self.bounds_min = bounds_min
+        self.bounds_max = bounds_max
+        self.volume = volume
+        self.area = area
+        self.degenerate = degenerate
+        self.open_edges = open_edges
+        self.nonmanifold_edges = nonmanifold_edges
+        self.misoriented_edges = misoriented_edges
+        # Body thickness and height of the text above it, along the
+        # smallest extent of the mesh.
+        self.thickness = thickness
+        self.relief = relief
+
+    @property
+    def size(self) -> tuple:
+        return tuple(hi - lo for lo, hi in zip(self.bounds_min, self.bounds_max))
+
+    @property
+    def watertight(self) -> bool:
+        return not (self.open_edges or self.nonmanifold_edges or self.misoriented_edges)
+
+    def to_dict(self) -> dict:
+        json_obj = {s: getattr(self, s) for s in self.__slots__}
+        json_obj.update(size=self.size, watertight=self.watertight)
+        return json_obj
+
+
+def _weld(corners, extent):
+    """Vertex id of every corner; corners on the same grid point share one.
+
+    `corners` are relative to the lower corner of the bounding box, which is
+    divided into `_WELD_STEPS` points per axis. The grid is fine enough
+    (below 0.2 µm for a 7-unit label) to only merge corners that are meant
+    to be one. Each corner becomes one integer key; sorting it is several
+    times faster than `numpy.unique` on coordinate rows.
+    """
+    np = _numpy()
+    scale = (_WELD_STEPS - 1) / np.maximum(extent, 1e-12)
+    grid = np.rint(corners * scale).astype(np.int64)
+    keys = (grid[:, 0] << 42) | (grid[:, 1] << 21) | grid[:, 2]
+    order = np.argsort(keys)
+    keys = keys[order]
+    new = np.empty(len(keys), dtype=np.int64)
+    new[0] = 0
+    np.not_equal(keys[1:], keys[:-1], out=new[1:], casting="unsafe")
+    ids = np.empty(len(keys), dtype=np.int64)
+    ids[order] = np.cumsum(new)
+    return ids
+
+
+def _run_lengths(values):
+    """How often each distinct value occurs, in sorted order of the values."""
+    np = _numpy()
+    values = np.sort(values)
+    bounds = np.flatnonzero(values[1:] != values[:-1]) + 1
+    return np.diff(np.concatenate(([0], bounds, [len(values)])))
+
+
+def _body_top(tri, cross, areas, axis: int) -> float:
+    """Level of the largest upward facing area along `axis`, relative to the bottom."""
+    np = _numpy()
+    up = cross[:, axis] >= 0.999 * 2.0 * areas
+    up &= areas >= DEGENERATE_AREA
+    if not up.any():
+        return 0.0
+    levels = np.rint(tri[up, 0, axis] / _LEVEL_STEP).astype(np.int64)
+    distinct, index = np.unique(levels, return_inverse=True)
+    return float(distinct[np.bincount(index, weights=areas[up]).argmax()] * _LEVEL_STEP)
+
+
+def mesh_metrics(corners) -> MeshMetrics:
+    """Measure a mesh given as an `(n, 3, 3)` array of triangle corners."""
+    np = _numpy()
+    n = len(corners)
+    if not n:
+        return MeshMetrics()
+    flat = np.ascontiguousarray(corners, dtype=np.float32).reshape(-1, 3)
+    # Column by column, a reduction over axis 0 of an (n, 3) array is slow.
+    low = np.array([flat[:, i].min() for i in range(3)])
+    high = np.array([flat[:, i].max() for i in range(3)])
+
+    # Relative to the lower corner the float64 sums keep their precision.
+    relative = flat.astype(np.float64) - low
+    tri = relative.reshape(-1, 3, 3)
+    cross = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    areas = 0.5 * np.sqrt(np.einsum("ij,ij->i", cross, cross))
+    volume = np.einsum("ij,ij->", tri[:, 0], np.cross(tri[:, 1], tri[:, 2])) / 6.0
+
+    ids = _weld(relative, high.astype(np.float64) - low)
+    vertices = int(ids.max()) + 1
+    start, end = ids, ids.reshape(-1, 3)[:, [1, 2, 0]].ravel()
+    keep = start != end
+    start, end = start[keep], end[keep]
+    uses = _run_lengths(np.minimum(start, end) * vertices + np.maximum(start, end))
+    misoriented = np.count_nonzero(_run_lengths(start * vertices + end) > 1)
+
+    extent = high.astype(np.float64) - low
+    axis = int(extent.argmin())
+    top = _body_top(tri, cross, areas, axis)
+
+    return MeshMetrics(
+        triangles=n,
+        vertices=vertices,
+        bounds_min=tuple(float(v) for v in low),
+        bounds_max=tuple(float(v) for v in high),
+        volume=float(volume),
+        area=float(areas.sum()),
+        degenerate=int(np.count_nonzero(areas < DEGENERATE_AREA)),
+        open_edges=int(np.count_nonzero(uses == 1)),
+        nonmanifold_edges=int(np.count_nonzero(uses > 2)),
+        misoriented_edges=int(misoriented),
+        thickness=top,
+        relief=float(extent[axis]) - top,
+    )
+
+
+class MeshCheck:
+    """QA result of one exported label."""
+
+    __slots__ = ("path", "caption", "metrics", "expected", "problems", "seconds")
+
+    def __init__(self, path: pathlib.Path, caption: str = ""):
+        self.path = path
+        self.caption = caption or pathlib.Path(path).name
+        self.metrics = None
+        self.expected = None
+        # Message per kind of problem, e.g. "open edges".
+        self.problems = {}
+        self.seconds = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    def to_dict(self) -> dict:
+        return {
+            "path": str(self.path),
+            "caption": self.caption,
+            "ok": self.ok,
+            "problems": self.problems,
+            "expected": self.expected,
+            "metrics": self.metrics.to_dict() if self.metrics is not None else None,
+            "seconds": self.seconds,
+        }
+
+
+def _mm(values) -> str:
+    return " x ".join(f"{v:.2f}" for v in values) + " mm"
+
+
+def check_mesh(fp: pathlib.Path, params: dict, caption: str = "") -> MeshCheck:
+    """Check one exported label against its parameters.
+
+    The body thickness and text relief are only checked by `check_profile`,
+    against the other labels of the batch.
+
+    Args:
+        fp (pathlib.Path): binary STL of the label.
+        params (dict): validated label parameters the mesh was exported with.
+        caption (str): name of the label in the report, defaults to the file name.
+    """
+    start = time.perf_counter()
+    check = MeshCheck(fp, caption)
+    problems = check.problems
+    try:
+        metrics = check.metrics = mesh_metrics(map_triangles(fp))
+    except (OSError, ValueError) as e:
+        problems["unreadable"] = str(e)
+        check.seconds = time.perf_counter() - start
+        return check
+
+    expected = check.expected = expected_size(params)
+    if not metrics.triangles:
+        problems["empty"] = "empty mesh"
+    else:
+        # The orientation of the label in the export is not fixed, the two
+        # largest extents are compared with the outline.
+        size = sorted(metrics.size, reverse=True)[:2]
+        if any(abs(a - b) > DIMENSION_TOLERANCE for a, b in zip(size, sorted(expected, reverse=True))):
+            problems["size"] = f"outline {_mm(size)}, expected {_mm(expected)}"
+    if metrics.open_edges:
+        problems["open edges"] = f"{metrics.open_edges} open edges"
+    if metrics.nonmanifold_edges:
+        problems["non-manifold edges"] = f"{metrics.nonmanifold_edges} non-manifold edges"
+    if metrics.misoriented_edges:
+        problems["flipped triangles"] = (
+            f"{metrics.misoriented_edges} edges between flipped triangles")
+    if metrics.triangles and metrics.volume <= 0:
+        problems["inverted"] = f"volume {metrics.volume:.2f} mm³, normals point inwards"
+    if metrics.degenerate:
+        problems["degenerate triangles"] = f"{metrics.degenerate} degenerate triangles"
+
+    if glyph_count(params) and metrics.triangles:
+        if metrics.triangles < BODY_TRIANGLES + GLYPH_TRIANGLES:
+            problems["text missing"] = f"text missing, {metrics.triangles} triangles"
+        elif metrics.relief <= DIMENSION_TOLERANCE:
+            problems["text missing"] = "text missing, nothing rises above the body"
+    check.seconds = time.perf_counter() - start
+    return check
+
+
+class LabelProfile:
+    """Body thickness and text relief of the labels of one design, in mm.
+
+    Attributes:
+        thickness (float): thickness of the label body.
+        relief (float): height of the text above the body, 0 if no label
+            had text.
+    """
+
+    __slots__ = ("thickness", "relief")
+
+    def __init__(self, thickness: float, relief: float = 0.0):
+        self.thickness = thickness
+        self.relief = relief
+
+    @classmethod
+    def measure(cls, checks: list) -> "LabelProfile":
+        """Median profile of the readable meshes of `checks`, or None."""
+        measured = [c.metrics for c in checks if c.metrics is not None and c.metrics.triangles]
+        if not measured:
+            return None
+        reliefs = [m.relief for m in measured if m.relief > DIMENSION_TOLERANCE]
+        return cls(statistics.median(m.thickness for m in measured),
+                   statistics.median(reliefs) if reliefs else 0.0)
+
+    def to_dict(self) -> dict:
+        return {"thickness": self.thickness, "relief": self.relief}
+
+    def __repr__(self):
+        return f"LabelProfile(thickness={self.thickness:.2f}, relief={self.relief:.2f})"
+
+
+def check_profile(check: MeshCheck, params: dict, profile: LabelProfile):
+    """Compare the body thickness and text relief of a checked mesh with `profile`."""
+    metrics = check.metrics
+    if metrics is None or not metrics.triangles:
+        return
+    text = glyph_count(params) > 0
+    thickness = profile.thickness + (profile.relief if text else 0.0)
+    check.expected = tuple(check.expected) + (thickness,)
+    if abs(metrics.thickness - profile.thickness) > DIMENSION_TOLERANCE:
+        check.problems["thickness"] = (
+            f"body {metrics.thickness:.2f} mm thick, expected {profile.thickness:.2f} mm")
+    if text and "text missing" not in check.problems \
+            and abs(metrics.relief - profile.relief) > DIMENSION_TOLERANCE:
+        check.problems["text relief"] = (
+            f"text {metrics.relief:.2f} mm high, expected {profile.relief:.2f} mm")
+
+
+class QAReport:
+    """Results of `check_meshes`."""
+
+    def __init__(self):
+        self.checks = []
+        self.profile = None
+        self.seconds = 0.0
+        self.workers = 1
+
+    @property
+    def passed(self) -> list:
+        return [c for c in self.checks if c.ok]
+
+    @property
+    def failed(self) -> list:
+        return [c for c in self.checks if not c.ok]
+
+    @property
+    def triangles(self) -> int:
+        return sum(c.metrics.triangles for c in self.checks if c.metrics is not None)
+
+    @property
+    def throughput(self) -> float:
+        """Triangles checked per second."""
+        return self.triangles / self.seconds if self.seconds else 0.0
+
+    def problem_counts(self) -> dict:
+        """Failed meshes per kind of problem, e.g. "open edges"."""
+        counts = {}
+        for check in self.failed:
+            for kind in check.problems:
+                counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+    def summary(self) -> str:
+        summary = (
+            f"{len(self.checks)} meshes checked, {len(self.passed)} passed, "
+            f"{len(self.failed)} failed, {self.triangles} triangles "
+            f"in {self.seconds:.2f}s ({self.throughput:.0f} triangles/s, "
+            f"{self.workers} workers)"
+        )
+        if self.profile is not None:
+            summary += (f", body {self.profile.thickness:.2f} mm, "
+                        f"text {self.profile.relief:.2f} mm")
+        counts = self.problem_counts()
+        if counts:
+            summary += "; " + ", ".join(f"{kind}: {n}" for kind, n in sorted(counts.items()))
+        return summary
+
+    def to_dict(self) -> dict:
+        return {
+            "seconds": self.seconds,
+            "workers": self.workers,
+            "passed": len(self.passed),
+            "failed": len(self.failed),
+            "triangles": self.triangles,
+            "profile": self.profile.to_dict() if self.profile is not None else None,
+            "problems": self.problem_counts(),
+            "checks": [c.to_dict() for c in self.checks],
+        }
+
+
+def check_meshes(labels: list, workers: int = None, profile: LabelProfile = None) -> QAReport:
+    """Check exported labels in a thread pool.
+
+    Args:
+        labels (list): `(path, params)` or `(path, params, caption)` of
+            every label.
+        workers (int): threads, defaults to the number of CPUs.
+        profile (LabelProfile): expected body thickness and text relief,
+            by default measured from the labels themselves.
+    """
+    _numpy()
+    start = time.perf_counter()
+    report = QAReport()
+    labels = [tuple(label) for label in labels]
+    report.workers = max(1, min(workers or os.cpu_count() or 1, len(labels) or 1))
+    with futil.span("mesh qa", "qa", meshes=len(labels), workers=report.workers):
+        if report.workers == 1:
+            report.checks = [check_mesh(*label) for label in labels]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(report.workers) as pool:
+                report.checks = list(pool.map(lambda label: check_mesh(*label), labels))
+        report.profile = profile or LabelProfile.measure(report.checks)
+        if report.profile is not None:
+            for check, label in zip(report.checks, labels):
+                check_profile(check, label[1], report.profile)
+    report.seconds = time.perf_counter() - start
+    logger.info("Mesh QA: %s", report.summary())
+    for check in report.failed:
+        logger.warning("Mesh QA %s: %s", check.caption, "; ".join(check.problems.values()))
+    return report
@@ -0,0 +1,808 @@
+"""Evaluate Fusion 360 parameter expressions without the design.
+
+A parameter expression such as `bin_span * 42 mm - 0.5 mm` is only evaluated
+by Fusion 360 when it is written into the design, which costs a recompute.
+This module parses and evaluates the same expressions locally:
+
+- numbers with units (`0.5 mm`, `2in`, `90 deg`), references to other
+  parameters, `+ - * / ^`, parentheses and the common functions;
+- text expressions in quotes, which may be joined with `+`;
+- units are tracked as dimensions (length, angle), so adding a length to an
+  angle or writing a length into a unitless parameter is an error.
+
+Values are in Fusion 360 internal units, cm for lengths and radians for
+angles, like `Parameter.value`. An expression without a unit written into a
+parameter with one takes the unit of the parameter, as in Fusion 360.
+
+`ParameterGraph` keeps the parsed expressions of the parameters of a design
+and which parameters reference which. A new expression is checked against
+it before it is written: references must exist, may not form a cycle, and
+the parameter and all its dependents must still evaluate. Only the
+dependents of a changed parameter are evaluated again.
+"""
+
+import functools
+import math
+import re
+
+from ..lib import fusionAddInUtils as futil
+
+logger = futil.get_logger(__name__)
+
+# Dimensions are (length, angle) exponents.
+NONE = (0, 0)
+LENGTH = (1, 0)
+ANGLE = (0, 1)
+
+# Unit name: (factor to internal units, dimensions).
+UNITS = {
+    "um": (1e-4, LENGTH),
+    "mm": (0.1, LENGTH),
+    "cm": (1.0, LENGTH),
+    "m": (100.0, LENGTH),
+    "in": (2.54, LENGTH),
+    "ft": (30.48, LENGTH),
+    "deg": (math.pi / 180.0, ANGLE),
+    "rad": (1.0, ANGLE),
+}
+
+CONSTANTS = {"PI": math.pi, "E": math.e}
+
+
+class ExpressionError(ValueError):
+    """An expression that Fusion 360 would reject or fail to compute.
+
+    Attributes:
+        parameter (str): parameter whose expression failed, if known.
+        expression (str): the expression.
+    """
+
+    def __init__(self, message: str, parameter: str = None, expression: str = None):
+        super().__init__(f"{parameter}: {message}" if parameter else message)
+        self.message = message
+        self.parameter = parameter
+        self.expression = expression
+
+    def at(self, parameter: str, expression: str = None) -> "ExpressionError":
+        """The same error, attributed to `parameter`."""
+        if self.parameter is not None:
+            return self
+        return type(self)(self.message, parameter, expression)
+
+
+class UnknownParameterError(ExpressionError):
+    """A reference to a parameter the design does not have."""
+
+
+class CycleError(ExpressionError):
+    """Parameters that reference themselves, directly or through others.
+
+    Attributes:
+        cycle (list): parameter names along the cycle, the first repeated
+            at the end.
+    """
+
+    def __init__(self, message: str, parameter: str = None, expression: str = None,
+                 cycle: list = None):
+        super().__init__(message, parameter, expression)
+        self.cycle = cycle or []
+
+
+class UnsupportedExpression(ExpressionError):
+    """Valid in Fusion 360 perhaps, but not evaluated here.
+
+    Not a reason to reject an expression; its value is unknown.
+    """
+
+
+class Quantity:
+    """A number with dimensions, in internal units."""
+
+    __slots__ = ("value", "dims")
+
+    def __init__(self, value: float, dims: tuple = NONE):
+        self.value = value
+        self.dims = dims
+
+    def __repr__(self):
+        return f"Quantity({self.value!r}, {dims_name(self.dims)})"
+
+
+def dims_name(dims: tuple) -> str:
+    if dims == NONE:
+        return "unitless"
+    parts = []
+    for name, exponent in zip(("length", "angle"), dims):
+        if exponent:
+            parts.append(name if exponent == 1 else f"{name}^{exponent:g}")
+    return " * ".join(parts)
+
+
+def parse_unit(unit: str) -> tuple:
+    """(factor, dimensions) of a parameter unit, "" being unitless."""
+    if not unit or unit == "unitless":
+        return 1.0, NONE
+    try:
+        return UNITS[unit]
+    except KeyError:
+        raise UnsupportedExpression(f"unit '{unit}' is not supported") from None
+
+
+# Parsing.
+
+_TOKEN_PATTERN = r"""\s*(?:
+    (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<string>'[^']*'|"[^"]*")
+  | (?P<op>\*\*|[-+*/^(),;])
+)"""
+
+
+@functools.lru_cache(maxsize=None)
+def _token_regex():
+    # Compiled on first use, the module is imported when the add-in starts.
+    return re.compile(_TOKEN_PATTERN, re.VERBOSE)
+
+
+def _tokenize(expression: str) -> list:
+    token = _token_regex()
+    tokens = []
+    pos = 0
+    end = len(expression.rstrip())
+    while pos < end:
+        match = token.match(expression, pos)
+        if match is None:
+            rest = expression[pos:].lstrip()
+            if rest[:1] in ("'", '"'):
+                whole = expression.strip()
+                if len(whole) > 1 and whole[0] == whole[-1] == rest[0]:
+                    raise ExpressionError(f"text may not contain {rest[0]}", expression=expression)
+                raise ExpressionError("text is not closed", expression=expression)
+            raise ExpressionError(f"unexpected '{rest[:1]}'", expression=expression)
+        kind = match.lastgroup
+        text = match.group(kind)
+        tokens.append((kind, "^" if text == "**" else text))
+        pos = match.end()
+    tokens.append(("end", ""))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the tokens of one expression.
+
+    Trees are tuples: `("num", Quantity)`, `("str", text)`, `("ref", name)`,
+    `("neg", tree)`, `("op", operator, left, right)` and
+    `("call", function, [trees])`.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+        self.refs = set()
+
+    def error(self, message: str) -> ExpressionError:
+        return ExpressionError(message, expression=self.expression)
+
+    def peek(self) -> tuple:
+        return self.tokens[self.pos]
+
+    def take(self) -> tuple:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, text: str):
+        kind, value = self.take()
+        if value != text or kind != "op":
+            raise self.error(f"expected '{text}'" + (f" before '{value}'" if value else ""))
+
+    def parse(self) -> tuple:
+        if self.peek()[0] == "end":
+            raise self.error("empty expression")
+        tree = self.sum()
+        kind, value = self.peek()
+        if kind != "end":
+            raise self.error(f"unexpected '{value}'")
+        return tree
+
+    def sum(self) -> tuple:
+        tree = self.product()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            op = self.take()[1]
+            tree = ("op", op, tree, self.product())
+        return tree
+
+    def product(self) -> tuple:
+        tree = self.unary()
+        while self.peek() in (("op", "*"), ("op", "/")):
+            op = self.take()[1]
+            tree = ("op", op, tree, self.unary())
+        return tree
+
+    def unary(self) -> tuple:
+        if self.peek() == ("op", "-"):
+            self.take()
+            return ("neg", self.unary())
+        if self.peek() == ("op", "+"):
+            self.take()
+            return self.unary()
+        return self.power()
+
+    def power(self) -> tuple:
+        tree = self.primary()
+        if self.peek() == ("op", "^"):
+            self.take()
+            # Right associative, binds tighter than a leading minus on its left.
+            tree = ("op", "^", tree, self.unary())
+        return tree
+
+    def primary(self) -> tuple:
+        kind, value = self.take()
+        if kind == "number":
+            number = Quantity(float(value))
+            unit_kind, unit = self.peek()
+            if unit_kind == "name" and unit in UNITS and self.tokens[self.pos + 1] != ("op", "("):
+                self.take()
+                factor, dims = UNITS[unit]
+                number = Quantity(number.value * factor, dims)
+            return ("num", number)
+        if kind == "string":
+            return ("str", value[1:-1])
+        if kind == "name":
+            if self.peek() == ("op", "("):
+                self.take()
+                args = []
+                if self.peek() != ("op", ")"):
+                    args.append(self.sum())
+                    while self.peek() in (("op", ","), ("op", ";")):
+                        self.take()
+                        args.append(self.sum())
+                self.expect(")")
+                return ("call", value, args)
+            if value in CONSTANTS:
+                return ("num", Quantity(CONSTANTS[value]))
+            if value in UNITS:
+                raise self.error(f"unit '{value}' without a number")
+            self.refs.add(value)
+            return ("ref", value)
+        if (kind, value) == ("op", "("):
+            tree = self.sum()
+            self.expect(")")
+            return tree
+        if kind == "end":
+            raise self.error("expression ends early")
+        raise self.error(f"unexpected '{value}'")
+
+
+@functools.lru_cache(maxsize=4096)
+def parse(expression: str) -> tuple:
+    """Parse an expression.
+
+    Returns:
+        tuple: the expression tree and the frozenset of referenced parameter
+        names.
+
+    Raises:
+        ExpressionError: the expression is not valid.
+    """
+    parser = _Parser(expression)
+    return parser.parse(), frozenset(parser.refs)
+
+
+# Evaluation.
+
+class _Unknown(Exception):
+    """A referenced value is not known, so neither is the result."""
+
+
+def _same_dims(name: str, args: list):
+    dims = args[0].dims
+    for a in args[1:]:
+        if a.dims != dims:
+            raise ExpressionError(f"{name}() of {dims_name(dims)} and {dims_name(a.dims)}")
+    return dims
+
+
+def _angle(name: str, a: Quantity) -> float:
+    if a.dims == ANGLE:
+        return a.value
+    if a.dims == NONE:
+        # Fusion 360 takes the default angle unit of the document here.
+        raise UnsupportedExpression(f"{name}() of a unitless value")
+    raise ExpressionError(f"{name}() of {dims_name(a.dims)}")
+
+
+def _unitless(name: str, a: Quantity) -> float:
+    if a.dims != NONE:
+        raise ExpressionError(f"{name}() of {dims_name(a.dims)}")
+    return a.value
+
+
+def _call(name: str, args: list) -> Quantity:
+    for a in args:
+        if isinstance(a, str):
+            raise ExpressionError(f"{name}() of text")
+    count = _ARITY.get(name)
+    if count is None:
+        raise UnsupportedExpression(f"unknown function '{name}'")
+    if (count >= 0 and len(args) != count) or (count < 0 and not args):
+        wanted = f"{count} argument{'s' if count > 1 else ''}" if count >= 0 else "arguments"
+        raise ExpressionError(f"{name}() takes {wanted}, not {len(args)}")
+    if name in ("abs", "floor", "ceil", "round", "sign"):
+        a = args[0]
+        fn = {"abs": abs, "floor": math.floor, "ceil": math.ceil,
+              "round": lambda v: math.copysign(math.floor(abs(v) + 0.5), v),
+              "sign": lambda v: (v > 0) - (v < 0)}[name]
+        return Quantity(float(fn(a.value)), NONE if name == "sign" else a.dims)
+    if name in ("min", "max"):
+        dims = _same_dims(name, args)
+        return Quantity((min if name == "min" else max)(a.value for a in args), dims)
+    if name == "sqrt":
+        a = args[0]
+        if any(d % 2 for d in a.dims):
+            raise ExpressionError(f"sqrt() of {dims_name(a.dims)}")
+        return Quantity(math.sqrt(a.value), tuple(d // 2 for d in a.dims))
+    if name == "pow":
+        return _power(args[0], args[1])
+    if name in ("sin", "cos", "tan"):
+        return Quantity(getattr(math, name)(_angle(name, args[0])))
+    if name in ("asin", "acos", "atan"):
+        return Quantity(getattr(math, name)(_unitless(name, args[0])), ANGLE)
+    if name in ("sinh", "cosh", "tanh", "exp"):
+        return Quantity(getattr(math, name)(_unitless(name, args[0])))
+    if name == "ln":
+        return Quantity(math.log(_unitless(name, args[0])))
+    if name == "log":
+        return Quantity(math.log10(_unitless(name, args[0])))
+    raise UnsupportedExpression(f"unknown function '{name}'")
+
+
+# Number of arguments per supported function, -1 for one or more.
+_ARITY = {
+    "abs": 1, "floor": 1, "ceil": 1, "round": 1, "sign": 1, "sqrt": 1, "pow": 2,
+    "sin": 1, "cos": 1, "tan": 1, "asin": 1, "acos": 1, "atan": 1,
+    "sinh": 1, "cosh": 1, "tanh": 1, "exp": 1, "ln": 1, "log": 1,
+    "min": -1, "max": -1,
+}
+
+
+def _power(base: Quantity, exponent: Quantity) -> Quantity:
+    if isinstance(base, str) or isinstance(exponent, str):
+        raise ExpressionError("power of text")
+    if exponent.dims != NONE:
+        raise ExpressionError(f"exponent is {dims_name(exponent.dims)}")
+    n = exponent.value
+    if base.dims != NONE and n != int(n):
+        raise ExpressionError(f"{dims_name(base.dims)} to the power of {n:g}")
+    value = base.value ** n
+    if isinstance(value, complex):
+        raise ExpressionError(f"negative number to the power of {n:g}")
+    return Quantity(value, tuple(int(d * n) for d in base.dims))
+
+
+def _operate(op: str, a, b):
+    if isinstance(a, str) or isinstance(b, str):
+        if not (isinstance(a, str) and isinstance(b, str)):
+            raise ExpressionError("cannot combine text and a number")
+        if op != "+":
+            raise ExpressionError(f"'{op}' of text")
+        return a + b
+    if op in ("+", "-"):
+        if a.dims != b.dims:
+            verb = "add" if op == "+" else "subtract"
+            raise ExpressionError(f"cannot {verb} {dims_name(a.dims)} and {dims_name(b.dims)}")
+        return Quantity(a.value + b.value if op == "+" else a.value - b.value, a.dims)
+    if op == "*":
+        return Quantity(a.value * b.value, (a.dims[0] + b.dims[0], a.dims[1] + b.dims[1]))
+    if op == "/":
+        if b.value == 0:
+            raise ExpressionError("division by zero")
+        return Quantity(a.value / b.value, (a.dims[0] - b.dims[0], a.dims[1] - b.dims[1]))
+    return _power(a, b)
+
+
+def evaluate(tree: tuple, lookup):
+    """Evaluate an expression tree.
+
+    Args:
+        tree (tuple): tree returned by `parse`.
+        lookup (Callable): value of a referenced parameter by name, a
+            `Quantity` or text; None if the value is not known.
+
+    Returns:
+        Quantity or str: the value, None if it depends on an unknown value.
+
+    Raises:
+        ExpressionError: the expression cannot be computed.
+    """
+    try:
+        return _evaluate(tree, lookup)
+    except _Unknown:
+        return None
+    except (ArithmeticError, ValueError) as e:
+        if isinstance(e, ExpressionError):
+            raise
+        raise ExpressionError(str(e)) from e
+
+
+def _evaluate(tree: tuple, lookup):
+    kind = tree[0]
+    if kind == "num" or kind == "str":
+        return tree[1]
+    if kind == "ref":
+        value = lookup(tree[1])
+        if value is None:
+            raise _Unknown()
+        return value
+    if kind == "neg":
+        value = _evaluate(tree[1], lookup)
+        if isinstance(value, str):
+            raise ExpressionError("negative text")
+        return Quantity(-value.value, value.dims)
+    if kind == "op":
+        return _operate(tree[1], _evaluate(tree[2], lookup), _evaluate(tree[3], lookup))
+    return _call(tree[1], [_evaluate(t, lookup) for t in tree[2]])
+
+
+def parameter_value(value, unit: str):
+    """Value of a parameter with `unit` whose expression evaluated to `value`.
+
+    Returns:
+        float or str: the value in internal units, or the text.
+
+    Raises:
+        ExpressionError: `value` does not fit the unit.
+    """
+    if isinstance(value, str):
+        if unit and unit != "unitless":
+            raise ExpressionError(f"text for a {unit} parameter")
+        return value
+    factor, dims = parse_unit(unit)
+    if value.dims == dims:
+        return value.value
+    if value.dims == NONE:
+        # A bare number is in the unit of the parameter.
+        return value.value * factor
+    raise ExpressionError(f"{dims_name(value.dims)} value for a {unit or 'unitless'} parameter")
+
+
+def quantity(value, unit: str):
+    """`Quantity` of a parameter value in internal units, text as is."""
+    if value is None or isinstance(value, str):
+        return value
+    return Quantity(value, parse_unit(unit)[1])
+
+
+def evaluate_expression(expression: str, unit: str = "", lookup=None):
+    """Value of `expression` written into a parameter with `unit`.
+
+    Args:
+        lookup (Callable): value of a referenced parameter in internal
+            units by name, None if unknown; references fail without it.
+    """
+    tree, _ = parse(expression)
+
+    def values(name):
+        if lookup is None:
+            raise UnknownParameterError(f"unknown parameter '{name}'")
+        return lookup(name)
+
+    value = evaluate(tree, values)
+    return None if value is None else parameter_value(value, unit)
+
+
+def same_expression(a: str, b: str, unit: str = "") -> bool:
+    """Whether writing expression `b` over `a` leaves a parameter with `unit` as it is.
+
+    Without references, expressions are the same if they evaluate to the same
+    value, e.g. `1` and `1.0`, `1 mm` and `1mm`, or `'text'` and `"text"`.
+    Expressions with references only equal themselves, as they follow other
+    parameters in different ways.
+    """
+    if a == b:
+        return True
+    try:
+        if parse(a)[1] or parse(b)[1]:
+            return False
+        value_a = evaluate_expression(a, unit)
+        value_b = evaluate_expression(b, unit)
+    except ExpressionError:
+        return False
+    if isinstance(value_a, str) or isinstance(value_b, str):
+        return value_a == value_b
+    return math.isclose(value_a, value_b, rel_tol=1e-12, abs_tol=1e-12)
+
+
+# Dependency graph.
+
+_UNSET = object()
+
+
+class _Node:
+    __slots__ = ("name", "expression", "unit", "tree", "refs", "value")
+
+    def __init__(self, name, expression, unit):
+        self.name = name
+        self.expression = expression
+        self.unit = unit
+        self.tree = None
+        self.refs = frozenset()
+        # Value in internal units, None if unknown, `_UNSET` before it is computed.
+        self.value = _UNSET
+
+
+class ParameterGraph:
+    """Expressions and values of design parameters, and their dependencies.
+
+    Parameters are read from `parameters` when first needed, with their
+    expression and unit; referenced parameters are read along. Expressions
+    of the design itself that cannot be evaluated here make their value and
+    those of their dependents unknown (None) instead of failing. Of one that
+    does not parse, every name in it is taken as a reference.
+
+    Args:
+        parameters: mapping of parameter name to a record with `expression`
+            and `unit`, such as `DesignParameters.parameters`. Iterating it
+            yields the parameters to know the dependents of.
+    """
+
+    def __init__(self, parameters):
+        self.parameters = parameters
+        self._nodes = {}
+        # Parameter name: names of the parameters whose expression references it.
+        self._dependents = {}
+        # Expressions and result of the last `predict`, reused by `update`.
+        self._prediction = None
+        self.evaluations = 0
+
+    def __contains__(self, name: str) -> bool:
+        return self._node(name) is not None
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _node(self, name: str) -> _Node:
+        node = self._nodes.get(name)
+        if node is not None:
+            return node
+        record = self.parameters.get(name)
+        if record is None:
+            return None
+        node = self._nodes[name] = _Node(name, str(record.expression), record.unit or "")
+        try:
+            node.tree, node.refs = parse(node.expression)
+        except ExpressionError as e:
+            logger.debug("Expression of %s not evaluated: %s", name, e)
+            node.value = None
+            # Still a dependent of whatever it may reference, so its value
+            # is read again when one of them changes.
+            node.refs = _names(node.expression)
+        self._link(node)
+        for ref in node.refs:
+            self._node(ref)
+        return node
+
+    def _link(self, node: _Node):
+        for ref in node.refs:
+            self._dependents.setdefault(ref, set()).add(node.name)
+
+    def _unlink(self, node: _Node):
+        for ref in node.refs:
+            self._dependents.get(ref, set()).discard(node.name)
+
+    def load(self):
+        """Read the parameters of `parameters` not known yet."""
+        nodes = self._nodes
+        for name in [n for n in self.parameters if n not in nodes]:
+            self._node(name)
+
+    def value(self, name: str):
+        """Value of a parameter in internal units, None if not known.
+
+        Raises:
+            UnknownParameterError: there is no parameter `name`.
+        """
+        node = self._node(name)
+        if node is None:
+            raise UnknownParameterError(f"unknown parameter '{name}'")
+        return self._value(node, [])
+
+    def _value(self, node: _Node, stack: list):
+        if node.value is not _UNSET:
+            return node.value
+        if node.name in stack:
+            logger.debug("Cycle in the design: %s", " -> ".join(stack + [node.name]))
+            return None
+        stack.append(node.name)
+
+        def lookup(ref):
+            ref_node = self._node(ref)
+            if ref_node is None:
+                return None
+            return quantity(self._value(ref_node, stack), ref_node.unit)
+
+        try:
+            self.evaluations += 1
+            value = evaluate(node.tree, lookup)
+            node.value = None if value is None else parameter_value(value, node.unit)
+        except ExpressionError as e:
+            logger.debug("Expression of %s not evaluated: %s", node.name, e)
+            node.value = None
+        stack.pop()
+        return node.value
+
+    def dependents(self, names) -> list:
+        """Parameters that reference any of `names`, directly or not.
+
+        Returns:
+            list: the names, each after the parameters it references.
+        """
+        if isinstance(names, str):
+            names = [names]
+        self.load()
+        return self._dependents_of(names)
+
+    def _dependents_of(self, names: list) -> list:
+        found = set()
+        todo = list(names)
+        while todo:
+            for dependent in self._dependents.get(todo.pop(), ()):
+                if dependent not in found:
+                    found.add(dependent)
+                    todo.append(dependent)
+        return [n for n in self._order(found, {}) if n not in names]
+
+    def _order(self, names: set, refs: dict) -> list:
+        """`names` sorted so that every parameter follows its references."""
+        order = []
+        done = set()
+
+        def visit(name):
+            done.add(name)
+            for ref in refs.get(name, self._nodes[name].refs if name in self._nodes else ()):
+                if ref in names and ref not in done:
+                    visit(ref)
+            order.append(name)
+
+        for name in sorted(names):
+            if name not in done:
+                visit(name)
+        return order
+
+    def predict(self, expressions: dict) -> dict:
+        """Values the parameters would take with new expressions.
+
+        The graph is not changed.
+
+        Args:
+            expressions (dict): new expression per parameter name.
+
+        Returns:
+            dict: value in internal units (text for text parameters, None if
+            not known here) of every changed parameter and every dependent.
+
+        Raises:
+            UnknownParameterError: a parameter or a reference does not exist.
+            CycleError: the new expressions make a parameter depend on itself.
+            ExpressionError: an expression is invalid, or a changed or
+                dependent parameter cannot be computed with the new values.
+        """
+        with futil.span("predict parameters", "expressions", count=len(expressions)):
+            prediction = self._predict(expressions)
+        self._prediction = (_key(expressions), prediction)
+        return dict(prediction[0])
+
+    def _predict(self, expressions: dict) -> tuple:
+        self.load()
+        trees, refs = {}, {}
+        for name, expression in expressions.items():
+            expression = str(expression)
+            if self._node(name) is None:
+                raise UnknownParameterError(f"unknown parameter '{name}'", name, expression)
+            try:
+                trees[name], refs[name] = parse(expression)
+            except ExpressionError as e:
+                raise e.at(name, expression) from None
+            for ref in refs[name]:
+                if self._node(ref) is None:
+                    raise UnknownParameterError(
+                        f"unknown parameter '{ref}'", name, expression)
+        for name in expressions:
+            cycle = self._find_cycle(name, refs)
+            if cycle:
+                raise CycleError(f"circular reference {' -> '.join(cycle)}", name,
+                                 str(expressions[name]), cycle)
+
+        affected = set(expressions)
+        affected.update(self._dependents_of(list(expressions)))
+        values = {}
+
+        def lookup(ref):
+            if ref in values:
+                return quantity(values[ref], self._nodes[ref].unit)
+            ref_node = self._node(ref)
+            if ref_node is None:
+                return None
+            return quantity(self._value(ref_node, []), ref_node.unit)
+
+        for name in self._order(affected, refs):
+            node = self._nodes[name]
+            tree = trees.get(name, node.tree)
+            if tree is None:
+                values[name] = None
+                continue
+            self.evaluations += 1
+            try:
+                value = evaluate(tree, lookup)
+                values[name] = None if value is None else parameter_value(value, node.unit)
+            except UnsupportedExpression as e:
+                logger.debug("Expression of %s not evaluated: %s", name, e)
+                values[name] = None
+            except ExpressionError as e:
+                expression = expressions.get(name, node.expression)
+                raise e.at(name, str(expression)) from None
+        return values, trees, refs
+
+    def _find_cycle(self, start: str, refs: dict) -> list:
+        """A path of references from `start` back to it, empty if none."""
+        path = [start]
+        seen = set()
+
+        def visit(name) -> bool:
+            for ref in sorted(refs.get(name, self._nodes[name].refs)):
+                if ref == start:
+                    path.append(ref)
+                    return True
+                if ref in seen or ref not in self._nodes:
+                    continue
+                seen.add(ref)
+                path.append(ref)
+                if visit(ref):
+                    return True
+                path.pop()
+            return False
+
+        return path if visit(start) else []
+
+    def update(self, expressions: dict) -> dict:
+        """Take new expressions, e.g. after they were written to the design.
+
+        Returns:
+            dict: the new values, as returned by `predict`.
+
+        Raises:
+            ExpressionError: as `predict`; the graph is then unchanged.
+        """
+        if self._prediction is not None and self._prediction[0] == _key(expressions):
+            values, trees, refs = self._prediction[1]
+        else:
+            with futil.span("update parameters", "expressions", count=len(expressions)):
+                values, trees, refs = self._predict(expressions)
+        self._prediction = None
+        for name, expression in expressions.items():
+            node = self._nodes[name]
+            self._unlink(node)
+            node.expression = str(expression)
+            node.tree, node.refs = trees[name], refs[name]
+            self._link(node)
+        for name, value in values.items():
+            self._nodes[name].value = value
+        return values
+
+    def forget(self):
+        """Drop everything read from `parameters`, e.g. after the design changed."""
+        self._nodes.clear()
+        self._dependents.clear()
+        self._prediction = None
+
+
+def _names(expression: str) -> frozenset:
+    """Identifiers of an expression that does not parse, outside of text."""
+    text = re.sub(r"'[^']*'|\"[^\"]*\"", " ", expression)
+    names = re.findall(r"(?<![\w.])[A-Za-z_]\w*", text)
+    return frozenset(n for n in names if n not in UNITS and n not in CONSTANTS and n not in _ARITY)
+
+
+def _key(expressions: dict) -> tuple:
+    return tuple((name, str(e)) for name, e in expressions.items())
@@ -0,0 +1,247 @@
+"""Arrange exported labels on printer build plates.
+
+Every label is a `label_geometry.LABEL_HEIGHT` deep rectangle whose length
+follows from `bin_span`, so a batch only contains a handful of distinct label
+sizes. A plate is filled with shelves (rows) of labels along X, and the strip
+right of the rows with columns of labels rotated by 90 degrees along Y. A
+label longer than the bed is wide can therefore still be placed rotated.
+
+Rows and columns are filled first-fit decreasing, but per size class instead
+of per label: a row pattern takes as many labels of each length as fit, and
+the same pattern is repeated for as many rows as the remaining counts allow.
+The work therefore grows with the number of distinct spans, not the number
+of labels. Each plate is filled once for every possible number of rotated
+columns, and the candidate covering the most area is kept.
+"""
+
+import collections
+import csv
+
+from . import label_geometry
+
+
+class BedProfile:
+    """Usable area of a printer bed, in mm.
+
+    Args:
+        name (str): name of the profile.
+        width (float): bed size along X.
+        depth (float): bed size along Y.
+        margin (float): distance kept free along the bed edges.
+        spacing (float): gap between neighbouring labels.
+    """
+
+    def __init__(self, name: str, width: float, depth: float,
+                 margin: float = 5.0, spacing: float = 3.0):
+        self.name = name
+        self.width = width
+        self.depth = depth
+        self.margin = margin
+        self.spacing = spacing
+
+    @property
+    def usable_width(self) -> float:
+        return self.width - 2 * self.margin
+
+    @property
+    def usable_depth(self) -> float:
+        return self.depth - 2 * self.margin
+
+    def __repr__(self):
+        return f"BedProfile({self.name!r}, {self.width:g} x {self.depth:g})"
+
+
+BED_PROFILES = {
+    p.name: p
+    for p in (
+        BedProfile("prusa_mk4", 250.0, 210.0),
+        BedProfile("prusa_mini", 180.0, 180.0),
+        BedProfile("bambu_x1", 256.0, 256.0),
+        BedProfile("bambu_a1_mini", 180.0, 180.0),
+        BedProfile("ender3", 220.0, 220.0),
+        BedProfile("voron_350", 350.0, 350.0),
+    )
+}
+
+
+class Placement:
+    """Position of one label; `x` and `y` are its lower left corner.
+
+    `width` and `height` are its extents along X and Y on the plate. A
+    `rotated` label is turned by 90 degrees, its length runs along Y.
+    """
+
+    __slots__ = ("label", "plate", "x", "y", "width", "height", "rotated")
+
+    def __init__(self, label: int, plate: int, x: float, y: float,
+                 width: float, height: float, rotated: bool = False):
+        self.label = label
+        self.plate = plate
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.rotated = rotated
+
+    def to_dict(self) -> dict:
+        return {s: getattr(self, s) for s in self.__slots__}
+
+    def __repr__(self):
+        turned = ", rotated" if self.rotated else ""
+        return f"Placement({self.label}, plate={self.plate}, x={self.x:g}, y={self.y:g}{turned})"
+
+
+class PackingResult:
+    """Placements of all labels of a batch.
+
+    Attributes:
+        bed (BedProfile): bed the labels were packed for.
+        placements (list): one `Placement` per label, in input order.
+        plates (int): number of plates used.
+    """
+
+    def __init__(self, bed: BedProfile, placements: list, plates: int):
+        self.bed = bed
+        self.placements = placements
+        self.plates = plates
+
+    def by_plate(self) -> list:
+        """Placements grouped per plate, for building one file per plate."""
+        plates = [[] for _ in range(self.plates)]
+        for p in self.placements:
+            plates[p.plate].append(p)
+        return plates
+
+    @property
+    def utilization(self) -> float:
+        """Share of the usable plate area covered by labels."""
+        if not self.plates:
+            return 0.0
+        covered = sum(p.width * p.height for p in self.placements)
+        return covered / (self.plates * self.bed.usable_width * self.bed.usable_depth)
+
+    def write_csv(self, fp):
+        with open(fp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=Placement.__slots__)
+            writer.writeheader()
+            writer.writerows(p.to_dict() for p in self.placements)
+
+
+def _fill_rows(counts: dict, row_length: float, rows: int, spacing: float) -> list:
+    """Fill up to `rows` rows from the label counts per length.
+
+    Takes the labels it places off `counts`.
+
+    Args:
+        counts (dict): number of labels per label length.
+
+    Returns:
+        list: `(pattern, repeat)` tuples, where `pattern` maps a label length
+            to the labels of that length in one row.
+    """
+    lengths = sorted((l for l in counts if l <= row_length), reverse=True)
+    filled = []
+    while rows > 0:
+        # An item takes its length plus one gap; the last gap is free.
+        remaining = row_length + spacing
+        pattern = {}
+        for length in lengths:
+            if counts[length] and remaining >= length + spacing:
+                k = min(counts[length], int(remaining // (length + spacing)))
+                pattern[length] = k
+                remaining -= k * (length + spacing)
+        if not pattern:
+            break
+        repeat = min(rows, *(counts[length] // k for length, k in pattern.items()))
+        for length, k in pattern.items():
+            counts[length] -= k * repeat
+        filled.append((pattern, repeat))
+        rows -= repeat
+    return filled
+
+
+def _row_length(pattern: dict, spacing: float) -> float:
+    return sum(k * (length + spacing) for length, k in pattern.items()) - spacing
+
+
+def _fill_plate(counts: dict, bed: BedProfile, height: float, rows_per_plate: int) -> tuple:
+    """Rows and rotated columns of the next plate, the best of all column counts.
+
+    Takes the labels it places off `counts`.
+
+    Returns:
+        tuple: `(rows, columns, columns_x)`, the rows and columns as
+            `(pattern, repeat)` tuples and the X offset of the first column
+            from the bed margin.
+    """
+    spacing = bed.spacing
+    pitch = height + spacing
+    max_columns = int((bed.usable_width + spacing) // pitch)
+    best = None
+    for reserved in range(max_columns + 1):
+        left = dict(counts)
+        row_length = bed.usable_width - reserved * pitch
+        rows = _fill_rows(left, row_length, rows_per_plate, spacing) if row_length > 0 else []
+        # The columns take all of the width the rows leave free.
+        used = max((_row_length(p, spacing) for p, _ in rows), default=-spacing)
+        columns_x = used + spacing
+        columns = _fill_rows(
+            left, bed.usable_depth, int((bed.usable_width - columns_x + spacing) // pitch),
+            spacing)
+        covered = sum(length * (n - left[length]) for length, n in counts.items())
+        if best is None or covered > best[0]:
+            best = (covered, left, rows, columns, columns_x)
+    covered, left, rows, columns, columns_x = best
+    counts.update(left)
+    return rows, columns, columns_x
+
+
+def pack_labels(labels: list, bed: BedProfile) -> PackingResult:
+    """Assign every label to a position on as few plates as possible.
+
+    Args:
+        labels (list): validated label parameter sets, each with a `bin_span`.
+        bed (BedProfile): bed to pack for, see `BED_PROFILES`.
+
+    Raises:
+        ValueError: a label fits the bed in neither direction.
+    """
+    height = label_geometry.LABEL_HEIGHT
+    spacing = bed.spacing
+    rows_per_plate = int((bed.usable_depth + spacing) // (height + spacing))
+
+    # Label indices per label length, in input order.
+    queues = collections.defaultdict(collections.deque)
+    for i, params in enumerate(labels):
+        queues[label_geometry.label_width(params["bin_span"])].append(i)
+    counts = {length: len(q) for length, q in queues.items()}
+
+    placements = [None] * len(labels)
+    plate = 0
+    while any(counts.values()):
+        rows, columns, columns_x = _fill_plate(counts, bed, height, rows_per_plate)
+        if not rows and not columns:
+            length = max(l for l, n in counts.items() if n)
+            raise ValueError(f"A label of length {length:g} mm does not fit {bed}")
+        y = bed.margin
+        for pattern, repeat in rows:
+            for _ in range(repeat):
+                x = bed.margin
+                for length, k in pattern.items():
+                    for _ in range(k):
+                        i = queues[length].popleft()
+                        placements[i] = Placement(i, plate, x, y, length, height)
+                        x += length + spacing
+                y += height + spacing
+        x = bed.margin + columns_x
+        for pattern, repeat in columns:
+            for _ in range(repeat):
+                y = bed.margin
+                for length, k in pattern.items():
+                    for _ in range(k):
+                        i = queues[length].popleft()
+                        placements[i] = Placement(i, plate, x, y, height, length, True)
+                        y += length + spacing
+                x += height + spacing
+        plate += 1
+    return PackingResult(bed, placements, plate)
@@ -0,0 +1,82 @@
+"""Command previews that only write what differs from the design.
+
+Fusion 360 rolls back the changes of the previous preview before every
+executePreview event, so each preview has to apply its parameters again,
+even when they equal the ones previewed last: a preview that is skipped
+shows the unmodified design. What can be saved is within one preview cycle.
+`PreviewPipeline` hands the previewed parameter set to `apply`, which writes
+only the parameters whose expression differs from the design (see
+`DesignParameters.update_parameter_expressions`), and a preview that leaves
+every parameter as it is costs no recompute.
+
+A preview that succeeded sets `isValidResult`, so clicking OK keeps its
+result: Fusion 360 then fires no execute event, which would roll the preview
+back and write the same parameters again.
+"""
+
+from typing import Callable
+
+
+class PreviewPipeline:
+    """Apply the parameter set of every preview and count the work it took.
+
+    Args:
+        apply (Callable): called with the parameter set (parameter name to
+            expression) that should be previewed, returns the names of the
+            parameters it wrote.
+
+    Attributes:
+        valid (bool): the last preview was applied, its result can be reused
+            when the command completes.
+    """
+
+    def __init__(self, apply: Callable):
+        self.apply = apply
+        self.valid = False
+        self.computed = 0
+        self.unchanged = 0
+        self.writes = 0
+        self.skipped_writes = 0
+        self.executed = 0
+        self.reused = 0
+
+    def preview(self, params: dict) -> bool:
+        """Preview `params` on the rolled back design.
+
+        Returns:
+            bool: True if a parameter was written and the design recomputed.
+        """
+        self.valid = False
+        written = self.apply(params) or []
+        self.valid = True
+        self.writes += len(written)
+        self.skipped_writes += len(params) - len(written)
+        if not written:
+            self.unchanged += 1
+            return False
+        self.computed += 1
+        return True
+
+    def execute(self, params: dict) -> list:
+        """Apply `params` in the execute event, as no preview result was reused."""
+        self.executed += 1
+        return self.apply(params) or []
+
+    def finish(self, completed: bool):
+        """Record the end of the command.
+
+        A completed command without an execute event kept the result of the
+        last preview.
+        """
+        if completed and self.valid and not self.executed:
+            self.reused += 1
+
+    def stats(self) -> dict:
+        return {
+            "computed": self.computed,
+            "unchanged": self.unchanged,
+            "writes": self.writes,
+            "skipped_writes": self.skipped_writes,
+            "executed": self.executed,
+            "reused": self.reused,
+        }
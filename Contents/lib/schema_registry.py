@@ -0,0 +1,301 @@
+"""Registry of the document parameter schemas in `res/schema`.
+
+Two schema layouts ship with the add-in:
+
+- JSON Schema documents (`label_document_parameters_schema.json`) with
+  `properties`, `required` and a `const` for `gla_id`.
+- Field maps (`bin_document_parameters_schema.json`) with a `schema` object
+  whose entries name their `document_parameter_name` and `accepted-values`.
+
+Both are normalized into `DocumentSchema` objects. Every schema is parsed once
+when the add-in starts and indexed by the `gla_id` values it accepts, so the
+schema of an open document is found with one dictionary lookup. A schema file
+is parsed again only when its modification time changes. A file that cannot
+be parsed is logged and skipped, the other schemas stay available.
+"""
+
+import json
+import os
+import pathlib
+import time
+
+from ..lib import fusionAddInUtils as futil
+from . import design_parameters
+from . import R
+from . import schema_validator
+
+logger = futil.get_logger(__name__)
+
+# Schema type names as used in the files, mapped to the normalized type.
+_TYPES = {
+    "number": "number",
+    "double": "number",
+    "integer": "integer",
+    "string": "string",
+    "boolean": "boolean",
+}
+
+# Fusion 360 reports parameter values in internal units (cm for lengths).
+_INTERNAL_UNIT_SCALE = {"mm": 0.1, "cm": 1.0, "m": 100.0, "in": 2.54, "ft": 30.48}
+
+
+class SchemaField:
+    """One parameter of a document schema."""
+
+    __slots__ = (
+        "name",
+        "document_parameter_name",
+        "type",
+        "description",
+        "default",
+        "unit",
+        "const",
+        "accepted_values",
+        "minimum",
+        "exclusive_minimum",
+        "required",
+    )
+
+    def __init__(self, name: str, prop: dict, required: bool):
+        self.name = name
+        self.document_parameter_name = prop.get("document_parameter_name", name)
+        self.type = _TYPES.get(prop.get("type"), prop.get("type"))
+        self.description = prop.get("description", "")
+        self.default = prop.get("default")
+        self.unit = prop.get("unit", "")
+        self.const = prop.get("const")
+        self.accepted_values = prop.get("accepted-values", prop.get("enum"))
+        self.minimum = prop.get("minimum")
+        self.exclusive_minimum = prop.get("exclusiveMinimum")
+        self.required = required
+
+    def __repr__(self):
+        return f"SchemaField({self.name!r}, type={self.type!r})"
+
+
+class DocumentSchema:
+    """Normalized schema of one kind of GLA document.
+
+    Attributes:
+        path (pathlib.Path): schema file the schema was loaded from.
+        mtime (int): modification time of `path` when it was loaded, in ns.
+        title (str): human readable name of the schema.
+        fields (dict): `SchemaField` per schema field name.
+        gla_ids (tuple): values of the `gla_id` parameter that identify a
+            document of this kind.
+        validator (CompiledValidator): validator compiled from `fields`.
+    """
+
+    def __init__(self, path: pathlib.Path, mtime: int, title: str, fields: dict):
+        self.path = path
+        self.mtime = mtime
+        self.title = title
+        self.fields = fields
+        gla_id = fields.get("gla_id")
+        if gla_id is None:
+            self.gla_ids = ()
+        elif gla_id.const is not None:
+            self.gla_ids = (gla_id.const,)
+        else:
+            self.gla_ids = tuple(gla_id.accepted_values or ())
+        self.validator = schema_validator.compile_schema(self)
+
+    @property
+    def required(self) -> list:
+        return [f.name for f in self.fields.values() if f.required]
+
+    def design_values(self, parameters) -> dict:
+        """Schema field values of a design, in the units and types of the schema.
+
+        Fusion 360 has no boolean or integer parameters: booleans are read
+        from a unitless number as `value != 0`, integers are rounded.
+
+        Args:
+            parameters: mapping of parameter name to `ParameterRecord`, as
+                held by `DesignParameters.parameters`.
+        """
+        values = {}
+        for field in self.fields.values():
+            param = parameters.get(field.document_parameter_name)
+            if not param:
+                continue
+            if field.name == "gla_id":
+                values[field.name] = document_gla_id(parameters)
+            elif field.type == "string":
+                values[field.name] = str(param.expression).strip("'\"")
+            elif field.type == "boolean":
+                values[field.name] = param.value != 0
+            elif field.type == "integer":
+                values[field.name] = round(param.value)
+            else:
+                values[field.name] = \
+                    param.value / _INTERNAL_UNIT_SCALE.get(field.unit, 1.0)
+        return values
+
+    def expressions(self, values: dict) -> dict:
+        """Parameter expressions that write schema field `values` to a design."""
+        expressions = {}
+        for name, value in values.items():
+            field = self.fields[name]
+            expressions[field.document_parameter_name] = \
+                design_parameters.format_expression(value, field.unit)
+        return expressions
+
+    def validate(self, parameters) -> schema_validator.ValidationResult:
+        """Validate the parameters of a design against this schema."""
+        with futil.span("validate design", "schema", schema=self.title):
+            return self.validator.validate(self.design_values(parameters))
+
+    def __repr__(self):
+        return f"DocumentSchema({self.path.name!r}, gla_ids={self.gla_ids!r})"
+
+
+def parse_schema(path: pathlib.Path, json_obj: dict, mtime: int = 0) -> DocumentSchema:
+    """Normalize a parsed schema file of either layout."""
+    if "properties" in json_obj:
+        required = set(json_obj.get("required", ()))
+        fields = {
+            name: SchemaField(name, prop, name in required)
+            for name, prop in json_obj["properties"].items()
+        }
+    elif "schema" in json_obj:
+        # Field maps have no required list, fields without a default are required.
+        fields = {
+            name: SchemaField(name, prop, "default" not in prop)
+            for name, prop in json_obj["schema"].items()
+        }
+    else:
+        raise ValueError(f"{path.name} is not a document parameters schema.")
+    return DocumentSchema(path, mtime, json_obj.get("title", path.stem), fields)
+
+
+def document_gla_id(parameters) -> str:
+    """The `gla_id` of a design, taken from the parameter comment or its text value.
+
+    Args:
+        parameters: mapping of parameter name to `ParameterRecord`, as held
+            by `DesignParameters.parameters`.
+    """
+    param = parameters.get("gla_id")
+    if not param:
+        return None
+    return param.comment or str(param.expression).strip("'\"")
+
+
+class SchemaRegistry:
+    """Load every schema of a directory once and look schemas up by `gla_id`.
+
+    Args:
+        schema_dir (pathlib.Path): directory holding the `*.json` schema files.
+    """
+
+    def __init__(self, schema_dir: pathlib.Path = R.SCHEMA_DIR):
+        self.schema_dir = pathlib.Path(schema_dir)
+        self._schemas = {}
+        self._by_gla_id = {}
+        # Modification time and error per schema file that failed to load.
+        self.errors = {}
+        self.load_count = 0
+        self.load_seconds = 0.0
+        self.lookup_count = 0
+        self.lookup_seconds = 0.0
+
+    def __len__(self):
+        return len(self._schemas)
+
+    def __iter__(self):
+        return iter(self._schemas.values())
+
+    def load_all(self):
+        """Load all schema files, parsing only new or modified ones.
+
+        Files that fail to load are logged and listed in `errors`.
+        """
+        paths = sorted(self.schema_dir.glob("*.json"))
+        for path in set(self._schemas) - set(paths):
+            self._drop(path)
+        for path in set(self.errors) - set(paths):
+            del self.errors[path]
+        for path in paths:
+            self._refresh(path)
+
+    def get(self, gla_id: str, check_mtime: bool = True) -> DocumentSchema:
+        """The schema accepting `gla_id`, or None.
+
+        Args:
+            gla_id (str): `gla_id` of the document.
+            check_mtime (bool): reload the schema file first if it was modified.
+        """
+        start = time.perf_counter()
+        schema = self._by_gla_id.get(gla_id)
+        if schema is not None and check_mtime:
+            schema = self._refresh(schema.path)
+            if schema is None or gla_id not in schema.gla_ids:
+                schema = self._by_gla_id.get(gla_id)
+        self.lookup_count += 1
+        self.lookup_seconds += time.perf_counter() - start
+        return schema
+
+    def for_parameters(self, parameters) -> DocumentSchema:
+        """The schema of a design, given its `DesignParameters.parameters`."""
+        gla_id = document_gla_id(parameters)
+        return self.get(gla_id) if gla_id else None
+
+    def stats(self) -> dict:
+        return {
+            "schemas": len(self._schemas),
+            "errors": len(self.errors),
+            "loads": self.load_count,
+            "load_seconds": self.load_seconds,
+            "lookups": self.lookup_count,
+            "lookup_seconds": self.lookup_seconds,
+        }
+
+    def _refresh(self, path: pathlib.Path) -> DocumentSchema:
+        schema = self._schemas.get(path)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self._drop(path)
+            self.errors.pop(path, None)
+            return None
+        if schema is not None and schema.mtime == mtime:
+            return schema
+        if path in self.errors and self.errors[path][0] == mtime:
+            return None
+
+        start = time.perf_counter()
+        self._drop(path)
+        try:
+            with futil.span("load schema", "schema", file=path.name):
+                with path.open(encoding="utf-8") as f:
+                    schema = parse_schema(path, json.load(f), mtime)
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.error("Skipping schema %s: %s", path.name, e)
+            self.errors[path] = (mtime, str(e))
+            return None
+        finally:
+            self.load_count += 1
+            self.load_seconds += time.perf_counter() - start
+        self.errors.pop(path, None)
+
+        self._schemas[path] = schema
+        for gla_id in schema.gla_ids:
+            if gla_id in self._by_gla_id:
+                logger.warning(
+                    "Schema %s redefines gla_id '%s' of %s",
+                    path.name, gla_id, self._by_gla_id[gla_id].path.name)
+            self._by_gla_id[gla_id] = schema
+        return schema
+
+    def _drop(self, path: pathlib.Path):
+        schema = self._schemas.pop(path, None)
+        if schema is None:
+            return
+        for gla_id in schema.gla_ids:
+            if self._by_gla_id.get(gla_id) is schema:
+                del self._by_gla_id[gla_id]
+
+
+# Registry shared by all commands, loaded when the add-in starts.
+registry = SchemaRegistry()
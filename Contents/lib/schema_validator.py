@@ -0,0 +1,198 @@
+"""Validators compiled from document schemas.
+
+`compile_schema` turns the fields of a `DocumentSchema` into a flat list of
+precomputed checks, so validating a parameter set is a single loop without any
+schema lookups. The same validator checks one design or a whole batch of
+manifest rows, and reports every problem as a `FieldError`.
+"""
+
+_TRUE = ("true", "yes", "1")
+_FALSE = ("false", "no", "0")
+
+
+class FieldError:
+    """A single validation problem.
+
+    Attributes:
+        field (str): schema field name.
+        code (str): one of `required`, `unknown`, `type`, `const`, `enum`,
+            `minimum` or `exclusiveMinimum`.
+        message (str): human readable description.
+    """
+
+    __slots__ = ("field", "code", "message")
+
+    def __init__(self, field: str, code: str, message: str):
+        self.field = field
+        self.code = code
+        self.message = message
+
+    def to_dict(self) -> dict:
+        return {"field": self.field, "code": self.code, "message": self.message}
+
+    def __repr__(self):
+        return f"FieldError({self.field!r}, {self.code!r})"
+
+    def __str__(self):
+        return f"{self.field}: {self.message}"
+
+
+class ValidationResult:
+    """Outcome of validating one parameter set.
+
+    Attributes:
+        values (dict): validated (and possibly converted) value per field.
+        errors (list): `FieldError` objects, empty if the set is valid.
+    """
+
+    __slots__ = ("values", "errors")
+
+    def __init__(self, values: dict, errors: list):
+        self.values = values
+        self.errors = errors
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def errors_by_field(self) -> dict:
+        by_field = {}
+        for e in self.errors:
+            by_field.setdefault(e.field, []).append(e)
+        return by_field
+
+    def __str__(self):
+        return "; ".join(str(e) for e in self.errors) if self.errors else "valid"
+
+
+def _convert(kind: str, coerce: bool):
+    """Return a function converting a value to `kind`, raising on mismatch."""
+    if kind == "number":
+        def convert(v):
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                return v
+            if coerce and isinstance(v, str):
+                return float(v)
+            raise TypeError
+    elif kind == "integer":
+        def convert(v):
+            if coerce and isinstance(v, str):
+                v = float(v)
+            if isinstance(v, int) and not isinstance(v, bool):
+                return v
+            if isinstance(v, float) and v.is_integer():
+                return int(v)
+            raise TypeError
+    elif kind == "string":
+        def convert(v):
+            if isinstance(v, str):
+                return v
+            if coerce and isinstance(v, (int, float)):
+                return str(v)
+            raise TypeError
+    elif kind == "boolean":
+        def convert(v):
+            if isinstance(v, bool):
+                return v
+            if coerce and str(v).lower() in _TRUE:
+                return True
+            if coerce and str(v).lower() in _FALSE:
+                return False
+            raise TypeError
+    else:
+        def convert(v):
+            return v
+    return convert
+
+
+def _checks(field) -> tuple:
+    """Precompute the constraint checks of a field as (code, test, message)."""
+    checks = []
+    if field.const is not None:
+        const = field.const
+        checks.append(("const", lambda v: v == const, f"must be {const!r}"))
+    if field.accepted_values:
+        accepted = frozenset(field.accepted_values)
+        checks.append(("enum", lambda v: v in accepted,
+                       f"must be one of {sorted(accepted, key=str)}"))
+    if field.minimum is not None:
+        minimum = field.minimum
+        checks.append(("minimum", lambda v: v >= minimum, f"must be >= {minimum}"))
+    if field.exclusive_minimum is not None:
+        ex_minimum = field.exclusive_minimum
+        checks.append(("exclusiveMinimum", lambda v: v > ex_minimum,
+                       f"must be > {ex_minimum}"))
+    return tuple(checks)
+
+
+class CompiledValidator:
+    """Validate parameter sets against a document schema.
+
+    Args:
+        schema (DocumentSchema): schema to compile.
+        exclude (tuple): field names that are not validated, e.g. `gla_id` for
+            manifest rows.
+        coerce (bool): convert strings to the field type, as read from a CSV.
+        defaults (bool): fill missing fields with their schema default.
+        allow_unknown (bool): ignore keys that are not schema fields instead of
+            reporting them.
+    """
+
+    def __init__(
+            self,
+            schema,
+            exclude: tuple = (),
+            coerce: bool = False,
+            defaults: bool = False,
+            allow_unknown: bool = True,
+    ):
+        self.schema = schema
+        self.allow_unknown = allow_unknown
+        self._fields = tuple(
+            (
+                f.name,
+                f.required,
+                f.default if defaults else None,
+                _convert(f.type, coerce),
+                f.type,
+                _checks(f),
+            )
+            for f in schema.fields.values()
+            if f.name not in exclude
+        )
+        self._names = frozenset(f[0] for f in self._fields)
+
+    def validate(self, props: dict) -> ValidationResult:
+        values = {}
+        errors = []
+        for name, required, default, convert, kind, checks in self._fields:
+            v = props.get(name, default)
+            if v is None:
+                if required:
+                    errors.append(FieldError(name, "required", "is required"))
+                continue
+            try:
+                v = convert(v)
+            except (TypeError, ValueError):
+                errors.append(FieldError(name, "type", f"must be a {kind}, got {v!r}"))
+                continue
+            for code, test, message in checks:
+                if not test(v):
+                    errors.append(FieldError(name, code, message))
+            values[name] = v
+
+        if not self.allow_unknown:
+            for name in props:
+                if name not in self._names:
+                    errors.append(FieldError(name, "unknown", "is not a schema field"))
+        return ValidationResult(values, errors)
+
+    def validate_many(self, rows) -> list:
+        """Validate an iterable of parameter sets, one result per row."""
+        validate = self.validate
+        return [validate(row) for row in rows]
+
+
+def compile_schema(schema, **options) -> CompiledValidator:
+    """Compile `schema`; see `CompiledValidator` for the options."""
+    return CompiledValidator(schema, **options)
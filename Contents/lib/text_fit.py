@@ -0,0 +1,144 @@
+"""Offline fitting of `label_text` into the label text area.
+
+Rendered text width is predicted from a table of glyph advance widths of the
+label font (Arial, metric compatible with Helvetica), so text that does not
+fit a given `bin_span` is found before any parameter is written to the design.
+Kerning is ignored, which slightly overestimates the width of most strings.
+"""
+
+import functools
+
+from . import label_geometry
+
+# Advance widths in 1/1000 em.
+_ADVANCES = {
+    " ": 278, "!": 278, '"': 355, "#": 556, "$": 556, "%": 889, "&": 667,
+    "'": 191, "(": 333, ")": 333, "*": 389, "+": 584, ",": 278, "-": 333,
+    ".": 278, "/": 278, ":": 278, ";": 278, "<": 584, "=": 584, ">": 584,
+    "?": 556, "@": 1015, "[": 278, "\\": 278, "]": 278, "^": 469, "_": 556,
+    "`": 333, "{": 334, "|": 260, "}": 334, "~": 584,
+    "A": 667, "B": 667, "C": 722, "D": 722, "E": 667, "F": 611, "G": 778,
+    "H": 722, "I": 278, "J": 500, "K": 667, "L": 556, "M": 833, "N": 722,
+    "O": 778, "P": 667, "Q": 778, "R": 722, "S": 667, "T": 611, "U": 722,
+    "V": 667, "W": 944, "X": 667, "Y": 667, "Z": 611,
+    "a": 556, "b": 556, "c": 500, "d": 556, "e": 556, "f": 278, "g": 556,
+    "h": 556, "i": 222, "j": 222, "k": 500, "l": 222, "m": 833, "n": 556,
+    "o": 556, "p": 556, "q": 556, "r": 333, "s": 500, "t": 278, "u": 556,
+    "v": 500, "w": 722, "x": 500, "y": 500, "z": 500,
+    "°": 400, "±": 584, "×": 584, "µ": 556, "ø": 611, "Ø": 778, "Ω": 768,
+}
+_ADVANCES.update({str(d): 556 for d in range(10)})
+
+# Used for glyphs missing from the table; the width of a digit.
+DEFAULT_ADVANCE = 556
+
+# Distance between baselines of consecutive lines, in em.
+LINE_SPACING = 1.2
+
+# Text height limits in mm. Text smaller than MIN_SIZE is not legible once
+# printed, MAX_SIZE keeps short strings from filling the whole label.
+MIN_SIZE = 3.0
+MAX_SIZE = 7.0
+
+# Sizes are rounded down to this step, in mm.
+SIZE_STEP = 0.25
+
+# Most lines a label holds.
+MAX_LINES = 2
+
+
+def text_width_em(text: str) -> float:
+    """Width of `text` in em."""
+    get = _ADVANCES.get
+    return sum(get(c, DEFAULT_ADVANCE) for c in text) / 1000.0
+
+
+def text_width(text: str, size: float) -> float:
+    """Rendered width of `text` in mm at a text height of `size` mm."""
+    return text_width_em(text) * size
+
+
+class TextFit:
+    """Best layout of a text on a label.
+
+    Attributes:
+        text (str): the text.
+        bin_span (float): span of the label.
+        lines (tuple): text of each line.
+        size (float): largest text height in mm at which `lines` fit, rounded
+            down to `SIZE_STEP` and capped at `MAX_SIZE`.
+        width (float): rendered width of the widest line at `size`, in mm.
+        fits (bool): False if the text is not legible at any layout.
+    """
+
+    __slots__ = ("text", "bin_span", "lines", "size", "width", "fits")
+
+    def __init__(self, text, bin_span, lines, size, width):
+        self.text = text
+        self.bin_span = bin_span
+        self.lines = lines
+        self.size = size
+        self.width = width
+        self.fits = size >= MIN_SIZE
+
+    @property
+    def reason(self) -> str:
+        if self.fits:
+            return ""
+        return (f"'{self.text}' needs a text height of {self.size:g} mm on a "
+                f"span of {self.bin_span:g}, less than the minimum of {MIN_SIZE:g} mm")
+
+    def __repr__(self):
+        return f"TextFit({self.lines!r}, size={self.size:g}, fits={self.fits})"
+
+
+def _largest_size(widths_em: list, area_width: float, area_height: float) -> float:
+    by_width = area_width / max(widths_em) if max(widths_em) else MAX_SIZE
+    by_height = area_height / (len(widths_em) * LINE_SPACING)
+    size = min(by_width, by_height, MAX_SIZE)
+    return int(size / SIZE_STEP) * SIZE_STEP
+
+
+def _line_breaks(words: list, line_count: int):
+    """Yield every split of `words` into `line_count` non-empty lines."""
+    if line_count == 1:
+        yield (" ".join(words),)
+        return
+    for i in range(1, len(words) - line_count + 2):
+        head = " ".join(words[:i])
+        for rest in _line_breaks(words[i:], line_count - 1):
+            yield (head,) + rest
+
+
+@functools.lru_cache(maxsize=65536)
+def fit_text(text: str, bin_span: float) -> TextFit:
+    """Pick the line breaks that allow the largest text height.
+
+    Args:
+        text (str): label text. Explicit line breaks (`\\n`) are kept as is.
+        bin_span (float): span of the label the text is written on.
+    """
+    area_width, area_height = label_geometry.text_area(bin_span)
+
+    if "\n" in text:
+        candidates = [tuple(text.split("\n"))]
+    else:
+        words = text.split()
+        candidates = [(text,)]
+        for line_count in range(2, min(MAX_LINES, len(words)) + 1):
+            candidates.extend(_line_breaks(words, line_count))
+
+    best = None
+    for lines in candidates:
+        widths = [text_width_em(line) for line in lines]
+        size = _largest_size(widths, area_width, area_height)
+        # Prefer fewer lines when the size is the same.
+        if best is None or size > best[0]:
+            best = (size, lines, max(widths) * size)
+    size, lines, width = best
+    return TextFit(text, bin_span, lines, size, width)
+
+
+def fit_many(texts, bin_span: float) -> list:
+    """Fit several texts on labels of the same span."""
+    return [fit_text(t, bin_span) for t in texts]